@@ -0,0 +1,419 @@
+"""
+
+Benchmark for the database builders.
+
+Runs every builder in DATABASE_BUILDERS against the local Notion stand-in (src/api/stub_server.py)
+and records, per database, the wall time, pages per second, API requests per page, bytes sent
+and peak Python memory. The stand-in runs in its own process so its memory and CPU are not
+counted. Results are written as JSON so two commits can be compared.
+
+Peak memory is measured with tracemalloc, which slows rendering down, so wall times are only
+comparable between runs of this benchmark and not with a normal build.
+
+EXAMPLES:
+
+Benchmark the first 5 records of every database with 100ms of latency per request
+    py -m benchmarks.build_benchmark --latency 0.1 -e 5
+
+Compare against a previous run
+    py -m benchmarks.build_benchmark -e 5 --compare logs/benchmark-2024-10-01.12.00.00.json
+
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from typing import Union
+
+from src.api.client import NotionClient
+from src.api.uploader import enable_adaptive_uploads
+from src.builds.registry import DATABASE_BUILDERS, load_builder
+from src.utils.page_index import PageIndex
+from main import DATA_DIRECTORY, LOGGING_DIRECTORY, build_parser
+
+# == Stand-in endpoints counted as each kind of request
+REQUEST_KINDS = {
+    "creates": "POST /pages",
+    "appends": "PATCH /blocks/{id}/children",
+    "searches": "POST /search",
+    "lists": "GET /blocks/{id}/children",
+    "databases": "POST /databases",
+}
+
+
+def start_stand_in(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """Start the stand-in server in a separate process
+
+    Args:
+        args (argparse.Namespace): The parsed benchmark arguments
+
+    Returns:
+        tuple[subprocess.Popen, str]: The server process and its base URL
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "src.api.stub_server",
+            "--port",
+            str(port),
+            "--latency",
+            str(args.latency),
+            "--latency_jitter",
+            str(args.latency_jitter),
+            "--rate_limit",
+            str(args.rate_limit),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    # == Wait for the server to accept connections
+    for _ in range(100):
+        try:
+            get_stats(base_url)
+            return process, base_url
+        except OSError:
+            time.sleep(0.05)
+
+    process.kill()
+    raise RuntimeError("The Notion stand-in did not start")
+
+
+def get_stats(base_url: str) -> dict:
+    """Fetch the request counters from the stand-in
+
+    Args:
+        base_url (str): Base URL of the stand-in
+
+    Returns:
+        dict: The counters reported by /__stub/stats
+    """
+    with urllib.request.urlopen(f"{base_url}/__stub/stats") as response:
+        return json.load(response)
+
+
+def diff_stats(before: dict, after: dict) -> dict:
+    """Work out the requests and bytes between two stats snapshots
+
+    Args:
+        before (dict): Stats taken before the builder ran
+        after (dict): Stats taken after the builder ran
+
+    Returns:
+        dict: Request counts by kind plus bytes sent, rate limited responses and connections opened
+    """
+    requests = {
+        kind: after["endpoints"].get(endpoint, 0) - before["endpoints"].get(endpoint, 0)
+        for kind, endpoint in REQUEST_KINDS.items()
+    }
+    requests["total"] = after["requests"] - before["requests"]
+    return {
+        "requests": requests,
+        "bytes_sent": after["bytes_received"] - before["bytes_received"],
+        "bytes_received": after["bytes_sent"] - before["bytes_sent"],
+        "rate_limited": after["rate_limited"] - before["rate_limited"],
+        # == The stats request made after the builder opens a connection of its own
+        "connections": after["connections"] - before["connections"] - 1,
+    }
+
+
+def run_builder(
+    logger: logging.Logger,
+    notion: NotionClient,
+    base_url: str,
+    name: str,
+    build_args: argparse.Namespace,
+) -> dict:
+    """Run a single builder and measure it
+
+    Args:
+        logger (logging.Logger): Logging object handed to the builder
+        notion (NotionClient): Notion client pointed at the stand-in
+        base_url (str): Base URL of the stand-in
+        name (str): Key of the builder in DATABASE_BUILDERS
+        build_args (argparse.Namespace): Arguments handed to the builder
+
+    Returns:
+        dict: The measurements for this database
+    """
+    builder, json_file = load_builder(name)
+    notion.metrics.set_context(name)
+
+    before = get_stats(base_url)
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    builder(logger, notion, DATA_DIRECTORY, json_file, build_args)
+    notion.uploader.drain()
+
+    wall_time = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = get_stats(base_url)
+
+    result = diff_stats(before, after)
+    result["client_retries"] = notion.metrics.totals(name)["retries"]
+    pages = result["requests"]["creates"]
+    result["wall_time_s"] = round(wall_time, 3)
+    result["pages"] = pages
+    result["pages_per_sec"] = round(pages / wall_time, 3) if wall_time else 0
+    result["requests_per_page"] = {
+        kind: round(count / pages, 3) if pages else 0
+        for kind, count in result["requests"].items()
+    }
+    result["peak_memory_bytes"] = peak_memory
+
+    return result
+
+
+def summarise(databases: dict) -> dict:
+    """Total the per-database results
+
+    Args:
+        databases (dict): Results keyed by database name
+
+    Returns:
+        dict: Totals across every database
+    """
+    wall_time = sum(r["wall_time_s"] for r in databases.values())
+    pages = sum(r["pages"] for r in databases.values())
+    requests = {
+        kind: sum(r["requests"][kind] for r in databases.values())
+        for kind in list(REQUEST_KINDS) + ["total"]
+    }
+    return {
+        "wall_time_s": round(wall_time, 3),
+        "pages": pages,
+        "pages_per_sec": round(pages / wall_time, 3) if wall_time else 0,
+        "requests": requests,
+        "requests_per_page": {
+            kind: round(count / pages, 3) if pages else 0
+            for kind, count in requests.items()
+        },
+        "bytes_sent": sum(r["bytes_sent"] for r in databases.values()),
+        "peak_memory_bytes": max(
+            (r["peak_memory_bytes"] for r in databases.values()), default=0
+        ),
+    }
+
+
+def print_report(results: dict, baseline: Union[None, dict] = None) -> None:
+    """Print a table of the results, with the change from a baseline if given
+
+    Args:
+        results (dict): The results from this run
+        baseline (Union[None, dict], optional): Results loaded from a previous run. Defaults to None.
+    """
+    header = f"{'Database':<20}{'Wall s':>10}{'Pages':>8}{'Pages/s':>10}{'Req/page':>10}{'KB sent':>10}{'Peak MB':>10}"
+    if baseline:
+        header += f"{'Wall Δ':>10}{'Pages/s Δ':>12}"
+    print(header)
+    print("-" * len(header))
+
+    rows = list(results["databases"].items()) + [("TOTAL", results["total"])]
+    for name, r in rows:
+        line = (
+            f"{name:<20}{r['wall_time_s']:>10.2f}{r['pages']:>8}{r['pages_per_sec']:>10.2f}"
+            f"{r['requests_per_page']['total']:>10.2f}{r['bytes_sent'] / 1024:>10.1f}{r['peak_memory_bytes'] / 2**20:>10.1f}"
+        )
+        if baseline:
+            old = (
+                baseline["total"]
+                if name == "TOTAL"
+                else baseline["databases"].get(name)
+            )
+            if old:
+                line += f"{_percent(old['wall_time_s'], r['wall_time_s']):>10}"
+                line += f"{_percent(old['pages_per_sec'], r['pages_per_sec']):>12}"
+        print(line)
+
+
+def _percent(old: float, new: float) -> str:
+    if not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(args: argparse.Namespace) -> None:
+    """Run the benchmark and write the results
+
+    Args:
+        args (argparse.Namespace): The parsed benchmark arguments
+    """
+    # == Builders log every page, keep that off the console so it does not skew the timings
+    logger = logging.getLogger("benchmark")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    names = args.build or list(DATABASE_BUILDERS)
+
+    process, base_url = start_stand_in(args)
+    try:
+        notion = NotionClient(auth="secret_benchmark", base_url=base_url)
+        notion.page_index = PageIndex(logger, notion, "benchmark-parent")
+        enable_adaptive_uploads(notion, args.min_concurrency, args.max_concurrency)
+
+        databases = {}
+        for name in names:
+            build_argv = [
+                "--build",
+                name,
+                "--database_id",
+                "benchmark-parent",
+                "--auth_key",
+                "secret_benchmark",
+                "--base_url",
+                base_url,
+                "--start_range",
+                str(args.start_range),
+            ]
+            if args.end_range is not None:
+                build_argv += ["--end_range", str(args.end_range)]
+            if not args.render_cache:
+                build_argv.append("--no-render-cache")
+            build_args = build_parser().parse_args(build_argv)
+
+            print(f"Benchmarking {name}...", file=sys.stderr)
+            databases[name] = run_builder(logger, notion, base_url, name, build_args)
+    finally:
+        process.terminate()
+        process.wait()
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "latency": args.latency,
+            "latency_jitter": args.latency_jitter,
+            "rate_limit": args.rate_limit,
+            "start_range": args.start_range,
+            "end_range": args.end_range,
+            "render_cache": args.render_cache,
+            "min_concurrency": args.min_concurrency,
+            "max_concurrency": args.max_concurrency,
+        },
+        "concurrency": notion.metrics.concurrency(),
+        "databases": databases,
+        "total": summarise(databases),
+    }
+
+    output = args.output or os.path.join(
+        LOGGING_DIRECTORY,
+        f"benchmark-{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    print_report(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="""Benchmark the database builders against the local Notion stand-in."""
+    )
+    parser.add_argument(
+        "-b",
+        "--build",
+        nargs="+",
+        type=str,
+        choices=list(DATABASE_BUILDERS),
+        help="""Databases to benchmark, in DATABASE_BUILDERS order by default.""",
+    )
+    parser.add_argument(
+        "-s",
+        "--start_range",
+        type=int,
+        default=0,
+        help="""The start of the range built for every database.""",
+    )
+    parser.add_argument(
+        "-e",
+        "--end_range",
+        type=int,
+        default=None,
+        help="""The end of the range built for every database, all records by default.""",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.1,
+        help="""Seconds the stand-in adds to every response. Defaults to 0.1.""",
+    )
+    parser.add_argument(
+        "--latency_jitter",
+        type=float,
+        default=0,
+        help="""Random extra seconds the stand-in adds on top of --latency. Defaults to 0.""",
+    )
+    parser.add_argument(
+        "--rate_limit",
+        type=float,
+        default=0,
+        help="""Requests per second before the stand-in returns 429s, 0 disables. Defaults to 0.""",
+    )
+    parser.add_argument(
+        "--min_concurrency",
+        type=int,
+        default=1,
+        help="""The fewest API calls the builders keep in flight. Defaults to 1.""",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=4,
+        help="""The most API calls the builders keep in flight. Defaults to 4.""",
+    )
+    parser.add_argument(
+        "--render_cache",
+        action="store_true",
+        default=False,
+        help="""Let the builders use the render cache, it is disabled by default so rendering is measured.""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="""Where to write the JSON results. Defaults to logs/benchmark-<datetime>.json.""",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        help="""A previous results file to compare this run against.""",
+    )
+
+    main(parser.parse_args())
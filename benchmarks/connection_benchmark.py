@@ -0,0 +1,174 @@
+"""
+
+Connection reuse benchmark for the Notion client.
+
+Sends the same calls to the local Notion stand-in (src/api/stub_server.py) from several threads,
+once through the shared keep-alive pool NotionClient uses and once with keep-alive turned off so
+every call opens its own connection. For each it records the calls per second, latency
+percentiles and the connections the stand-in accepted. The stand-in speaks plain HTTP, so only
+the TCP connect is saved here, against api.notion.com each new connection also costs a TLS
+handshake.
+
+EXAMPLES:
+
+Compare both clients over 200 calls from 4 threads with 50ms of latency per request
+    py -m benchmarks.connection_benchmark --calls 200 --threads 4 --latency 0.05
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks.build_benchmark import get_stats, start_stand_in
+from main import LOGGING_DIRECTORY
+from src.api.client import NotionClient
+from src.api.transport import build_http_client, request_timeout
+
+# == Each scenario builds the httpx client handed to NotionClient for a pool of the given size
+SCENARIOS = {
+    "pooled": lambda pool_size: build_http_client(pool_size),
+    "no-keep-alive": lambda pool_size: httpx.Client(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=0),
+        timeout=request_timeout(60.0),
+    ),
+}
+
+
+def run_scenario(base_url: str, name: str, calls: int, threads: int) -> dict:
+    """Send the calls through one client and measure them
+
+    Args:
+        base_url (str): Base URL of the stand-in
+        name (str): Key of the scenario in SCENARIOS
+        calls (int): Number of search calls to send
+        threads (int): Threads sending calls, also the size of the pool
+
+    Returns:
+        dict: Wall time, calls per second, latency percentiles and connections opened
+    """
+    notion = NotionClient(
+        auth="secret_benchmark",
+        base_url=base_url,
+        client=SCENARIOS[name](threads),
+    )
+
+    def timed_call(_: int) -> float:
+        start = time.perf_counter()
+        notion.search(query="", page_size=1)
+        return time.perf_counter() - start
+
+    before = get_stats(base_url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(timed_call, range(calls)))
+    wall_time = time.perf_counter() - start
+    after = get_stats(base_url)
+    notion.close()
+
+    return {
+        "wall_time_s": round(wall_time, 3),
+        "calls_per_sec": round(calls / wall_time, 2) if wall_time else 0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        # == The stats request made after the run opens a connection of its own
+        "connections": after["connections"] - before["connections"] - 1,
+        "client_connections": notion.metrics.connections()["opened"],
+    }
+
+
+def print_report(results: dict) -> None:
+    """Print a table of the results
+
+    Args:
+        results (dict): The results from this run
+    """
+    header = f"{'Scenario':<16}{'Wall s':>10}{'Calls/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'Conns':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results["scenarios"].items():
+        print(
+            f"{name:<16}{r['wall_time_s']:>10.2f}{r['calls_per_sec']:>10.2f}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['connections']:>8}"
+        )
+
+
+def main(args: argparse.Namespace) -> None:
+    """Run the benchmark and write the results
+
+    Args:
+        args (argparse.Namespace): The parsed benchmark arguments
+    """
+    process, base_url = start_stand_in(args)
+    try:
+        scenarios = {}
+        for name in SCENARIOS:
+            print(f"Measuring {name}...", file=sys.stderr)
+            scenarios[name] = run_scenario(base_url, name, args.calls, args.threads)
+    finally:
+        process.terminate()
+        process.wait()
+
+    results = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "calls": args.calls,
+            "threads": args.threads,
+            "latency": args.latency,
+        },
+        "scenarios": scenarios,
+    }
+
+    output = args.output or os.path.join(
+        LOGGING_DIRECTORY,
+        f"connection-benchmark-{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print_report(results)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="""Benchmark connection reuse of the Notion client against the local Notion stand-in."""
+    )
+    parser.add_argument(
+        "--calls",
+        type=int,
+        default=200,
+        help="""Calls sent per scenario. Defaults to 200.""",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=4,
+        help="""Threads sending calls, also the size of the connection pool. Defaults to 4.""",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="""Seconds the stand-in adds to every response. Defaults to 0.05.""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="""Where to write the JSON results. Defaults to logs/connection-benchmark-<datetime>.json.""",
+    )
+
+    # == start_stand_in reads these, the calls are not meant to be rate limited
+    parser.set_defaults(latency_jitter=0, rate_limit=0)
+
+    main(parser.parse_args())
@@ -0,0 +1,206 @@
+"""
+
+Import-time benchmark for the command line tool.
+
+Starts a fresh interpreter for each scenario and records how long it takes before any work is
+done, using `python -X importtime`. The scenarios are `main.py --help`, importing the CLI module
+as a scheduler wrapper would, and loading a single builder through the registry. Each is run
+several times and the median is reported along with the slowest top level imports, so a new
+module level import shows up as a regression.
+
+EXAMPLES:
+
+Measure the start-up time with 10 runs per scenario
+    py -m benchmarks.import_benchmark --runs 10
+
+Compare against a previous run
+    py -m benchmarks.import_benchmark --compare logs/import-benchmark-2024-10-01.12.00.00.json
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Union
+
+from main import LOGGING_DIRECTORY
+
+# == Each scenario is the arguments handed to a fresh interpreter
+SCENARIOS = {
+    "help": ["main.py", "--help"],
+    "import-cli": ["-c", "import main"],
+    "load-conditions": [
+        "-c",
+        "from src.builds.registry import load_builder; load_builder('conditions')",
+    ],
+    "load-all": [
+        "-c",
+        "from src.builds.registry import DATABASE_BUILDERS, load_builder; "
+        "[load_builder(name) for name in DATABASE_BUILDERS]",
+    ],
+}
+
+
+def run_scenario(argv: list) -> tuple[float, dict]:
+    """Run one scenario in a fresh interpreter
+
+    Args:
+        argv (list): Arguments after the interpreter
+
+    Returns:
+        tuple[float, dict]: Wall time in seconds and the cumulative import time in
+            microseconds of each top level module
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_time = time.perf_counter() - start
+
+    # == Lines look like "import time:       797 |       4768 |     re", top level modules have one space
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith(" ") and not name.startswith("  "):
+            modules[name.strip()] = int(cumulative)
+    return wall_time, modules
+
+
+def measure(argv: list, runs: int, top_n: int) -> dict:
+    """Run a scenario several times and summarise it
+
+    Args:
+        argv (list): Arguments after the interpreter
+        runs (int): Number of fresh interpreters to start
+        top_n (int): Number of top level imports to report
+
+    Returns:
+        dict: Median and minimum wall time and the slowest top level imports of the median run
+    """
+    samples = [run_scenario(argv) for _ in range(runs)]
+    samples.sort(key=lambda sample: sample[0])
+    wall_times = [wall_time for wall_time, _ in samples]
+    _, modules = samples[len(samples) // 2]
+    return {
+        "median_s": round(statistics.median(wall_times), 4),
+        "min_s": round(min(wall_times), 4),
+        "modules_loaded": len(modules),
+        "slowest_imports_ms": {
+            name: round(cumulative / 1000, 2)
+            for name, cumulative in sorted(
+                modules.items(), key=lambda item: item[1], reverse=True
+            )[:top_n]
+        },
+    }
+
+
+def print_report(results: dict, baseline: Union[None, dict] = None) -> None:
+    """Print a table of the results, with the change from a baseline if given
+
+    Args:
+        results (dict): The results from this run
+        baseline (Union[None, dict], optional): Results loaded from a previous run. Defaults to None.
+    """
+    header = f"{'Scenario':<20}{'Median ms':>12}{'Min ms':>10}"
+    if baseline:
+        header += f"{'Median Δ':>12}"
+    print(header)
+    print("-" * len(header))
+
+    for name, r in results["scenarios"].items():
+        line = f"{name:<20}{r['median_s'] * 1000:>12.1f}{r['min_s'] * 1000:>10.1f}"
+        old = baseline["scenarios"].get(name) if baseline else None
+        if old and old["median_s"]:
+            change = (r["median_s"] - old["median_s"]) / old["median_s"] * 100
+            line += f"{change:>+11.1f}%"
+        print(line)
+
+    for name, r in results["scenarios"].items():
+        print(f"\nSlowest top level imports for {name}:")
+        for module, cumulative in r["slowest_imports_ms"].items():
+            print(f"    {cumulative:>8.1f} ms  {module}")
+
+
+def main(args: argparse.Namespace) -> None:
+    """Run the benchmark and write the results
+
+    Args:
+        args (argparse.Namespace): The parsed benchmark arguments
+    """
+    scenarios = {}
+    for name in args.scenario or list(SCENARIOS):
+        print(f"Measuring {name}...", file=sys.stderr)
+        scenarios[name] = measure(SCENARIOS[name], args.runs, args.top)
+
+    results = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "scenarios": scenarios,
+    }
+
+    output = args.output or os.path.join(
+        LOGGING_DIRECTORY,
+        f"import-benchmark-{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    print_report(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="""Benchmark the start-up and import time of the command line tool."""
+    )
+    parser.add_argument(
+        "--scenario",
+        nargs="+",
+        type=str,
+        choices=list(SCENARIOS),
+        help="""Scenarios to measure, all of them by default.""",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=7,
+        help="""Fresh interpreters started per scenario. Defaults to 7.""",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="""Number of slowest top level imports to list. Defaults to 10.""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="""Where to write the JSON results. Defaults to logs/import-benchmark-<datetime>.json.""",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        help="""A previous results file to compare this run against.""",
+    )
+
+    main(parser.parse_args())
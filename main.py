@@ -45,32 +45,38 @@ This will build a creatures database
 This wil build all databases
     py .\\main.py --build all --database_id a674063b72a04deb8da26650db7294a5 -k secret_**********************
 
+This will build the conditions database against the local stand-in server
+    py -m src.api.stub_server --port 8765
+    py .\\main.py --build conditions --database_id stub-parent -k secret_stub --base_url http://127.0.0.1:8765
+
+This will list the spells pages created since October 1st, then archive them
+    py .\\main.py cleanup --database_id a674063b72a04deb8da26650db7294a5 -k secret_*** --databases Spells --created_after 2024-10-01
+    py .\\main.py cleanup --database_id a674063b72a04deb8da26650db7294a5 -k secret_*** --databases Spells --created_after 2024-10-01 --apply
+
+This will search the SRD offline, then build only the spells about fire
+    py .\\main.py search "fire damage" --type Spells
+    py .\\main.py --build spells --where fire --database_id a674063b72a04deb8da26650db7294a5 -k secret_***
+
 """
 
-from notion_client import Client
-from src.utils.logger import configure_logging
-from src.builds.creature import build_creature_database
-from src.builds.weapons import build_weapons_database
-from src.builds.armors import build_armors_database
-from src.builds.items import build_items_database
-from src.builds.magic_items import build_magic_items_database
-from src.builds.spells import build_spells_database
-from src.builds.weapons_properties import build_weapon_properties_database
-from src.builds.skills import build_skills_database
-from src.builds.magic_schools import build_magic_schools_database
-from src.builds.rules_section import build_rules_database
-from src.builds.languages import build_languages_database
-from src.builds.damage_types import build_damage_types_database
-from src.builds.conditions import build_conditions_database
-from src.builds.alignments import build_alignments_database
-from src.builds.ability_scores import build_ability_scores_database
-from src.builds.proficiencies import build_proficiencies_database
-from src.builds.classes import build_classes_database
-from src.builds.races import build_races_database
-from src.builds.backgrounds import build_backgrounds_database
-from src.builds.feats import build_feats_database
+from src.api.progress import PROGRESS_MODES
+from src.builds.registry import DATABASE_BUILDERS, load_builder
+from src.utils.load_json import select_records
+from src.utils.logger import (
+    LOG_FORMATS,
+    configure_logging,
+    mask_secret,
+    set_log_context,
+)
+from typing import TYPE_CHECKING
 import logging
 import argparse
+import datetime
+import sys
+
+if TYPE_CHECKING:
+    from src.api.client import NotionClient
+    from src.utils.search_index import SearchIndex
 
 
 NAME = "D&D 5E Notion Database Builder"
@@ -109,55 +115,322 @@ def main(args: argparse.Namespace) -> None:
     """
 
     # == Configure the logger
-    logger = configure_logging(LOGGING_DIRECTORY)
+    logger = configure_logging(LOGGING_DIRECTORY, args.log_format)
 
     # == Display the initial information
     log_initial_info(logger, args)
 
-    # == Create the Notion client
-    notion = Client(auth=args.auth_key)
-
-    # == Define a mapping of database names to their corresponding build functions and JSON files
-    # == Some of these are order dependent for example, you need to build the weapon properties before the weapons
-    database_builders = {
-        "weapon-properties": (
-            build_weapon_properties_database,
-            "5e-SRD-Weapon-Properties.json",
-        ),
-        "backgrounds": (build_backgrounds_database, "5e-SRD-Backgrounds.json"),
-        "feats": (build_feats_database, "5e-SRD-Feats.json"),
-        "magic-schools": (build_magic_schools_database, "5e-SRD-Magic-Schools.json"),
-        "rules": (build_rules_database, "5e-SRD-Rule-Sections.json"),
-        "languages": (build_languages_database, "5e-SRD-Languages.json"),
-        "damage-types": (build_damage_types_database, "5e-SRD-Damage-Types.json"),
-        "conditions": (build_conditions_database, "5e-SRD-Conditions.json"),
-        "alignments": (build_alignments_database, "5e-SRD-Alignments.json"),
-        "proficiencies": (build_proficiencies_database, "5e-SRD-Proficiencies.json"),
-        "skills": (build_skills_database, "5e-SRD-Skills.json"),
-        "ability-scores": (build_ability_scores_database, "5e-SRD-Ability-Scores.json"),
-        "creatures": (build_creature_database, "5e-SRD-Monsters.json"),
-        "races": (build_races_database, "5e-SRD-Races.json"),
-        "classes": (build_classes_database, "5e-SRD-Classes.json"),
-        "weapons": (build_weapons_database, "5e-SRD-Equipment.json"),
-        "armors": (build_armors_database, "5e-SRD-Equipment.json"),
-        "items": (build_items_database, "5e-SRD-Equipment.json"),
-        "magic-items": (build_magic_items_database, "5e-SRD-Magic-Items.json"),
-        "spells": (build_spells_database, "5e-SRD-Spells.json"),
-    }
-
-    # == Iterate over the database_builders dict and call the corresponding function to build the database
-    for item in args.build:
-        item_lower = item.lower()
-        if item_lower == "all":
-            for builder, json_file in database_builders.values():
-                log_db_build(logger, item, json_file)
-                builder(logger, notion, DATA_DIRECTORY, json_file, args)
-            break
-        # == Builds each item in the database args
-        if item_lower in database_builders:
-            builder, json_file = database_builders[item_lower]
-            log_db_build(logger, item, json_file)
-            builder(logger, notion, DATA_DIRECTORY, json_file, args)
+    # == Create the Notion client, imported here so --help does not load the HTTP stack
+    from src.api.client import NotionClient
+    from src.api.uploader import enable_adaptive_uploads
+    from src.utils.page_index import PageIndex
+    from src.utils.search_index import SearchIndex
+
+    offline = args.export or args.site or args.plan
+    if offline:
+        # == Built into an in-process stand-in, written out as files or counted for --plan
+        from src.api.export import EXPORT_AUTH_KEY, EXPORT_PARENT_ID, export_client
+        from src.api.stub_server import NotionStub
+
+        stub = NotionStub()
+        args.database_id = args.database_id or EXPORT_PARENT_ID
+        notion = NotionClient(auth=EXPORT_AUTH_KEY, client=export_client(stub))
+    else:
+        notion = NotionClient(
+            auth=args.auth_key[0],
+            base_url=args.base_url,
+            pool_size=args.max_concurrency * len(args.auth_key),
+        )
+    notion.page_index = PageIndex(logger, notion, args.database_id)
+    notion.search_index = SearchIndex(logger, DATA_DIRECTORY)
+    if args.site:
+        from src.api.site import SiteWriter
+
+        notion.site = SiteWriter(logger, stub, args.database_id, args.site, args.force)
+    if args.auth_key and len(args.auth_key) > 1 and not offline:
+        # == Notion rate limits each integration, several tokens each get their own share
+        from src.api.token_pool import enable_token_pool
+
+        enable_token_pool(
+            logger, notion, args.auth_key, args.min_concurrency, args.max_concurrency
+        )
+        if not notion.tokens.verify(notion, args.database_id):
+            logger.error("None of the --auth_key tokens can read %s", args.database_id)
+            sys.exit(1)
+    else:
+        enable_adaptive_uploads(notion, args.min_concurrency, args.max_concurrency)
+
+    # == Reject a --where query FTS5 cannot parse before anything is built
+    if args.where:
+        try:
+            notion.search_index.search(args.where, limit=1)
+        except ValueError as e:
+            logger.error("Invalid --where query: %s", e)
+            sys.exit(1)
+
+    # == Log every mutating call so a killed build can be resumed without duplicate pages
+    if not args.no_wal and not offline:
+        from src.utils.wal import WriteAheadLog, wal_path
+
+        notion.wal = WriteAheadLog(logger, wal_path(args.database_id))
+        notion.wal.recover(notion)
+    notion.update_pages = args.update
+    notion.auto_link = args.auto_link
+
+    if args.progress != "off":
+        from src.api.progress import BuildProgress
+
+        live = args.progress == "live" or (
+            args.progress == "auto" and sys.stderr.isatty()
+        )
+        notion.progress = BuildProgress(logger, notion, live)
+
+    try:
+        # == Each page is rendered once and copied to the other workspaces, see src/api/replicas.py
+        notion.replicas = [
+            open_replica(logger, args, target, notion.search_index)
+            for target in args.replicate_to or []
+        ]
+
+        # == Iterate over the DATABASE_BUILDERS dict and call the corresponding function to build the database
+        for item in args.build:
+            item_lower = item.lower()
+            if item_lower == "all":
+                for name in DATABASE_BUILDERS:
+                    run_builder(logger, notion, name, args)
+                break
+            # == Builds each item in the database args
+            if item_lower in DATABASE_BUILDERS:
+                run_builder(logger, notion, item_lower, args)
+    finally:
+        # == The console is given back even when a builder raises or exits
+        if notion.progress:
+            notion.progress.close()
+
+    # == Summarise where the time went on the API
+    notion.uploader.shutdown()
+    notion.close()
+    for replica in notion.replicas:
+        replica.uploader.shutdown()
+        replica.close()
+    notion.search_index.close()
+    set_log_context(database=None)
+    if args.export:
+        from src.api.export import write_bundle
+
+        write_bundle(logger, stub, args.database_id, args.export, args.force)
+    if args.site:
+        notion.site.finish()
+    if args.plan:
+        log_plan(logger, notion, args)
+        return
+    # == An export or site only called the in-process stand-in, there is no API traffic to report
+    if args.export or args.site:
+        return
+    notion.metrics.log_summary(logger)
+    if notion.tokens:
+        notion.tokens.log_summary(logger)
+    for replica in notion.replicas:
+        logger.info("==  Replica under %s", replica.page_index.parent_id)
+        replica.metrics.log_summary(logger)
+    metrics_file = f"{LOGGING_DIRECTORY}/{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}-metrics.json"
+    notion.metrics.write(metrics_file)
+    logger.info("API metrics written to %s", metrics_file)
+
+
+def log_plan(
+    logger: logging.Logger, notion: "NotionClient", args: argparse.Namespace
+) -> None:
+    """Log and write the estimate of a --plan build, in place of the API metrics
+
+    The metrics of the offline build only time the in-process stand-in, so they are not written.
+
+    Args:
+        logger (logging.Logger): The logger object
+        notion (NotionClient): The client the offline build ran on
+        args (argparse.Namespace): The parsed command-line arguments
+    """
+    from src.api.plan import BuildPlan, load_latencies
+
+    plan = BuildPlan(
+        notion.metrics,
+        len(args.auth_key or [None]),
+        args.max_concurrency,
+        load_latencies(args.plan_latencies) if args.plan_latencies else None,
+    )
+    plan.log(logger)
+    plan_file = f"{LOGGING_DIRECTORY}/{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}-plan.json"
+    plan.write(plan_file)
+    logger.info("Build plan written to %s", plan_file)
+
+
+def open_replica(
+    logger: logging.Logger,
+    args: argparse.Namespace,
+    target: str,
+    search_index: "SearchIndex",
+) -> "NotionClient":
+    """Connect to a workspace the build is copied to
+
+    Every replica has its own client, page index and write-ahead log, and its own concurrency
+    controller and upload threads, so a slow or rate limited workspace does not hold back the
+    others beyond the uploads queued for it.
+
+    Args:
+        logger (logging.Logger): The logger object
+        args (argparse.Namespace): The parsed command-line arguments
+        target (str): PARENT_ID:AUTH_KEY from --replicate_to
+        search_index (SearchIndex): The offline SRD index, shared by every workspace
+
+    Returns:
+        NotionClient: The client for the workspace
+    """
+    from src.api.client import NotionClient
+    from src.api.uploader import enable_adaptive_uploads
+    from src.utils.page_index import PageIndex
+
+    parent_id, auth_key = target.split(":", 1)
+    replica = NotionClient(
+        auth=auth_key, base_url=args.base_url, pool_size=args.max_concurrency
+    )
+    replica.page_index = PageIndex(logger, replica, parent_id)
+    replica.search_index = search_index
+    enable_adaptive_uploads(replica, args.min_concurrency, args.max_concurrency)
+
+    if not args.no_wal:
+        from src.utils.wal import WriteAheadLog, wal_path
+
+        replica.wal = WriteAheadLog(logger, wal_path(parent_id))
+        replica.wal.recover(replica)
+    replica.update_pages = args.update
+    replica.auto_link = args.auto_link
+    return replica
+
+
+def cleanup_main(args: argparse.Namespace) -> None:
+    """The cleanup command, archives the pages or databases a build left behind
+    Args:
+        args (argparse.Namespace): The parsed cleanup arguments
+    """
+    logger = configure_logging(LOGGING_DIRECTORY, args.log_format)
+
+    from src.api.client import NotionClient
+    from src.api.cleanup import cleanup
+    from src.api.rate_limit import TokenBucket
+    from src.utils.wal import WriteAheadLog, wal_path
+
+    logger.info("=========================================================")
+    logger.info("==  Cleanup under %s", args.database_id)
+    logger.info("==  Databases           : %s", args.databases or "all")
+    logger.info("==  Target              : %s", args.target)
+    logger.info("==  Category            : %s", args.category)
+    logger.info("==  Created After       : %s", args.created_after)
+    logger.info("==  Created Before      : %s", args.created_before)
+    logger.info("==  Mode                : %s", "apply" if args.apply else "dry run")
+    logger.info("=========================================================")
+
+    notion = NotionClient(
+        auth=args.auth_key,
+        base_url=args.base_url,
+        rate_limiter=TokenBucket(args.rate),
+        pool_size=args.workers,
+    )
+    notion.wal = WriteAheadLog(logger, wal_path(args.database_id))
+    notion.metrics.set_context("cleanup")
+    cleanup(logger, notion, args)
+    notion.metrics.log_summary(logger)
+
+
+def search_main(args: argparse.Namespace) -> None:
+    """The search command, prints the SRD records matching a query from the offline index
+    Args:
+        args (argparse.Namespace): The parsed search arguments
+    """
+    import time
+
+    from src.utils.search_index import SearchIndex
+
+    # == Only building the index logs anything, to stderr so the hits can be piped
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    search_index = SearchIndex(logging.getLogger(NAME), DATA_DIRECTORY)
+
+    start = time.perf_counter()
+    try:
+        hits = search_index.search(args.query, entity=args.type, limit=args.limit)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    search_index.close()
+
+    for hit in hits:
+        print(
+            f"{hit['rank']:>8.2f}  {hit['entity']:<18} {hit['name']} ({hit['index']})"
+        )
+        if hit["snippet"]:
+            print(f"{'':<10}{' '.join(hit['snippet'].split())}")
+    print(f"\n{len(hits)} hits in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+
+def run_builder(
+    logger: logging.Logger,
+    notion: "NotionClient",
+    name: str,
+    args: argparse.Namespace,
+) -> None:
+    """Run a single database builder, profiling it when --profile is set
+    Args:
+        logger (logging.Logger): The logger object
+        notion (NotionClient): The Notion client
+        name (str): The database being built, a key of DATABASE_BUILDERS
+        args (argparse.Namespace): The parsed command-line arguments
+    """
+    builder, json_file = load_builder(name)
+    set_log_context(database=name)
+    log_db_build(logger, name, json_file)
+    notion.metrics.set_context(name)
+    for replica in notion.replicas:
+        replica.metrics.set_context(name)
+    select_records(notion.search_index, args.where, json_file)
+    if notion.progress:
+        from src.api.progress import record_total
+
+        notion.progress.start(
+            name,
+            record_total(
+                notion.search_index,
+                json_file,
+                args.where,
+                args.start_range,
+                args.end_range,
+            ),
+        )
+
+    # == Pages are uploaded on worker threads, wait for them before the next database
+    if not args.profile:
+        builder(logger, notion, DATA_DIRECTORY, json_file, args)
+        notion.uploader.drain()
+        for replica in notion.replicas:
+            replica.uploader.drain()
+        if notion.progress:
+            notion.progress.finish()
+        if notion.site:
+            notion.site.flush()
+        return
+
+    from src.utils.profiler import profile_builder
+
+    with profile_builder(
+        logger, name, notion.metrics, LOGGING_DIRECTORY, args.profile_top
+    ):
+        builder(logger, notion, DATA_DIRECTORY, json_file, args)
+        notion.uploader.drain()
+        for replica in notion.replicas:
+            replica.uploader.drain()
+    if notion.progress:
+        notion.progress.finish()
+    if notion.site:
+        notion.site.flush()
 
 
 def log_db_build(logger: logging.Logger, item: str, json_file: str) -> None:
@@ -168,8 +441,8 @@ def log_db_build(logger: logging.Logger, item: str, json_file: str) -> None:
         json_file (str): The JSON file being used as the source
     """
     logger.info("=========================================================")
-    logger.info(f"==  Building {item} database")
-    logger.info(f"==  Using {json_file} as the source file")
+    logger.info("==  Building %s database", item)
+    logger.info("==  Using %s as the source file", json_file)
     logger.info("=========================================================")
 
 
@@ -179,23 +452,55 @@ def log_initial_info(logger: "logging.Logger", args: argparse.Namespace) -> None
         logger (logging.Logger): The logger object
         args (argparse.Namespace): The parsed command-line arguments
     """
+    from src.api.transport import http2_available
+
     logger.info("=========================================================")
     logger.info("==             D&D 5E Notion Database Builder          ==")
-    logger.info(f"==                   Version {VERSION}                     ==")
+    logger.info("==                   Version %s                     ==", VERSION)
     logger.info("=========================================================")
     logger.info("==")
-    logger.info(f"==  Database ID         : {args.database_id}")
-    logger.info(f"==  Authentication Key  : {args.auth_key}")
-    logger.info(f"==  Build Database      : {args.build}")
-    logger.info(f"==  Start Range         : {args.start_range}")
-    logger.info(f"==  End Range           : {args.end_range}")
+    logger.info("==  Database ID         : %s", args.database_id)
+    logger.info(
+        "==  Authentication Key  : %s",
+        ", ".join(mask_secret(auth_key) for auth_key in args.auth_key or [None]),
+    )
+    logger.info("==  Build Database      : %s", args.build)
+    logger.info("==  Start Range         : %s", args.start_range)
+    logger.info("==  End Range           : %s", args.end_range)
+    logger.info("==  Where               : %s", args.where)
+    logger.info("==  Render Cache        : %s", not args.no_render_cache)
+    logger.info("==  Write-Ahead Log     : %s", not args.no_wal)
+    logger.info("==  Update Pages        : %s", args.update)
+    logger.info("==  API Base URL        : %s", args.base_url)
+    logger.info(
+        "==  Concurrency         : %s-%s", args.min_concurrency, args.max_concurrency
+    )
+    logger.info("==  HTTP/2              : %s", http2_available())
+    logger.info("==  Profile             : %s", args.profile)
+    logger.info("==  Relations           : %s", args.relations)
+    logger.info("==  Auto Link           : %s", args.auto_link)
+    logger.info("==  Export              : %s", args.export)
+    logger.info("==  Site                : %s", args.site)
+    logger.info("==  Plan                : %s", args.plan)
+    logger.info("==  Progress            : %s", args.progress)
+    logger.info(
+        "==  Replicate To        : %s",
+        [target.split(":", 1)[0] for target in args.replicate_to or []],
+    )
+    logger.info("==  Log Format          : %s", args.log_format)
     logger.info("==")
     logger.info("=========================================================")
 
 
-if __name__ == "__main__":
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser for the builder
+
+    Returns:
+        argparse.ArgumentParser: The configured parser
+    """
     parser = argparse.ArgumentParser(
-        description="""A tool for building a D&D 5E Notion Database from a JSON source file."""
+        description="""A tool for building a D&D 5E Notion Database from a JSON source file. 
+        Run "main.py cleanup --help" to archive the pages of a previous build."""
     )
 
     parser.add_argument(
@@ -218,8 +523,9 @@ if __name__ == "__main__":
         "-db",
         "--database_id",
         type=str,
-        required=True,
-        help="""The Notion database ID where data will be stored. 
+        required=False,
+        default=None,
+        help="""The Notion database ID where data will be stored, not needed with --export, --site or --plan. 
         
         Example: 
             --database_id "a674063b72a04deb8da26650db7294a5".""",
@@ -228,12 +534,14 @@ if __name__ == "__main__":
     parser.add_argument(
         "-k",
         "--auth_key",
+        nargs="+",
         type=str,
-        required=True,
-        help="""Your Notion API authentication key. 
+        required=False,
+        default=None,
+        help="""Your Notion API authentication key, not needed with --export, --site or --plan. Give the tokens of several integrations shared on the same parent page to spread the build over their rate limits. 
         
         Example: 
-            --auth_key "secret_**********************".""",
+            --auth_key "secret_**********************" "secret_**********************".""",
     )
 
     parser.add_argument(
@@ -260,19 +568,520 @@ if __name__ == "__main__":
             --end_range 5""",
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--where",
+        type=str,
+        required=False,
+        default=None,
+        help="""Only build the records matching a search of the offline SRD index, words must all appear in the name or description, FTS5 syntax such as OR, NOT and prefix* is accepted. --start_range and --end_range then count the selected records. 
+        
+        Example: 
+            --build spells --where 'fire OR lightning' """,
+    )
+
+    parser.add_argument(
+        "--base_url",
+        type=str,
+        required=False,
+        default="https://api.notion.com",
+        help="""The root URL of the Notion API, point this at src/api/stub_server.py for offline runs. 
+        
+        Example: 
+            --base_url http://127.0.0.1:8765""",
+    )
+
+    parser.add_argument(
+        "--min_concurrency",
+        type=int,
+        required=False,
+        default=1,
+        help="""The fewest API calls kept in flight. The number in flight grows while Notion answers quickly 
+        and is halved on rate limits, timeouts and latency spikes, staying between the two bounds. 
+        
+        Example: 
+            --min_concurrency 1""",
+    )
+
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        required=False,
+        default=4,
+        help="""The most API calls kept in flight, see --min_concurrency. 
+        
+        Example: 
+            --max_concurrency 8""",
+    )
+
+    parser.add_argument(
+        "--no-render-cache",
+        action="store_true",
+        default=False,
+        help="""Re-render every page instead of reusing rendered pages cached from previous runs.
+        
+        Example: 
+            --no-render-cache""",
+    )
+
+    parser.add_argument(
+        "--no-wal",
+        action="store_true",
+        default=False,
+        help="""Do not keep the write-ahead log in cache/wal. With the log, pages are created with an idempotency key in a Build Key property
+        and pages the log already has are skipped, so a killed build can be restarted with --start_range without duplicating pages.
+        
+        Example: 
+            --no-wal""",
+    )
+
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        default=False,
+        help="""Update pages an earlier run built instead of skipping them. Pages are matched by title, only the 
+        properties and the blocks that changed are sent.
+        
+        Example: 
+            --build spells --update""",
+    )
+
+    parser.add_argument(
+        "--relations",
+        action="store_true",
+        default=False,
+        help="""Link spells to classes, races to languages, weapons to weapon properties and creatures to conditions with relation properties. 
+        The linked databases must be built first, in the same run or an earlier one.
+        
+        Example: 
+            --build conditions creatures --relations""",
+    )
+
+    parser.add_argument(
+        "--auto_link",
+        action="store_true",
+        default=False,
+        help="""Turn the names of conditions, damage types, spells, weapon properties and skills in page text into 
+        mentions of their pages, found in the local page index without extra API calls. Names are matched as 
+        whole words regardless of case, so common words that are also spell names are linked too. 
+        
+        Example: 
+            --build conditions damage-types spells --auto_link""",
+    )
+
+    parser.add_argument(
+        "--replicate_to",
+        nargs="+",
+        type=str,
+        required=False,
+        default=None,
+        help="""Copy the build to more workspaces, each as PARENT_ID:AUTH_KEY. Every page is rendered once and uploaded to all workspaces at the same time, each at its own pace, with mentions and relations pointing at that workspace's pages. 
+        
+        Example: 
+            --replicate_to b1c2d3e4f5a64b7c8d9e0f1a2b3c4d5e:secret_*** c2d3e4f5a6b74c8d9e0f1a2b3c4d5e6f:secret_***""",
+    )
+
+    parser.add_argument(
+        "--export",
+        type=str,
+        required=False,
+        default=None,
+        help="""Build offline and write the databases to this directory for Notion's importer instead of calling the API, a CSV of properties and a folder of Markdown pages per database, zipped to <directory>.zip. Mentions become links between the pages. The directory is emptied first, a directory holding other files is refused unless --force is given. 
+        
+        Example: 
+            --build all --export export/srd""",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        required=False,
+        default=False,
+        help="""Empty the --export or --site directory even though it holds files an earlier build did not write. 
+        
+        Example: 
+            --export export/srd --force""",
+    )
+
+    parser.add_argument(
+        "--site",
+        type=str,
+        required=False,
+        default=None,
+        help="""Build offline and write a static HTML site to this directory instead of calling the API, one page per record, an index page per database and mentions as links. Each page is written as soon as it is made and then dropped from memory. The directory is emptied first, a directory holding other files is refused unless --force is given. 
+        
+        Example: 
+            --build all --site export/site""",
+    )
+
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        required=False,
+        default=False,
+        help="""Build offline without calling the API and log the creates, appends, searches, lists and queries each database would make, the bytes sent and an estimate of the wall time from Notion's rate limit, the number of --auth_key tokens and --max_concurrency. 
+        
+        Example: 
+            --build all --plan""",
+    )
+
+    parser.add_argument(
+        "--plan_latencies",
+        type=str,
+        required=False,
+        default=None,
+        help="""Metrics JSON of an earlier build against Notion, its average latency per endpoint is used by --plan instead of a typical value. 
+        
+        Example: 
+            --plan --plan_latencies logs/2024-05-01.10.00.00-metrics.json""",
+    )
+
+    parser.add_argument(
+        "--progress",
+        type=str,
+        required=False,
+        default="auto",
+        choices=PROGRESS_MODES,
+        help="""How to show progress: live redraws a line per database with pages done, pages per second, calls in flight, retries and an ETA, and keeps only warnings on the console, plain logs that status every 10 seconds, auto is live on a terminal and plain otherwise. Defaults to auto. 
+        
+        Example: 
+            --progress plain""",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="""Profile each builder with cProfile and tracemalloc, reports are written to logs/profile. 
+        
+        Example: 
+            --profile""",
+    )
+
+    parser.add_argument(
+        "--profile_top",
+        type=int,
+        required=False,
+        default=25,
+        help="""How many functions and allocations to list in each profile report. 
+        
+        Example: 
+            --profile_top 40""",
+    )
+
+    parser.add_argument(
+        "--log_format",
+        type=str,
+        required=False,
+        default="text",
+        choices=LOG_FORMATS,
+        help="""Format of the log file, json writes one object per line with database, index, page_id and latency_ms fields. 
+        
+        Example: 
+            --log_format json""",
+    )
+
+    return parser
+
+
+def build_cleanup_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser for the cleanup command
+
+    Returns:
+        argparse.ArgumentParser: The configured parser
+    """
+    from src.api.rate_limit import NOTION_REQUESTS_PER_SECOND
+
+    parser = argparse.ArgumentParser(
+        prog="main.py cleanup",
+        description="""Archive the pages or databases a failed or duplicate build left under the parent page. 
+        Nothing is archived without --apply, the matching pages are listed instead.""",
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database_id",
+        type=str,
+        required=True,
+        help="""The Notion page the databases were built under. 
+        
+        Example: 
+            --database_id "a674063b72a04deb8da26650db7294a5".""",
+    )
+
+    parser.add_argument(
+        "-k",
+        "--auth_key",
+        type=str,
+        required=True,
+        help="""Your Notion API authentication key. 
+        
+        Example: 
+            --auth_key "secret_**********************".""",
+    )
+
+    parser.add_argument(
+        "--databases",
+        nargs="+",
+        type=str,
+        default=None,
+        help="""Titles of the databases to clean up, every database under the page by default. 
+        
+        Example: 
+            --databases Spells Conditions""",
+    )
+
+    parser.add_argument(
+        "--target",
+        type=str,
+        default="pages",
+        choices=["pages", "databases"],
+        help="""Archive the pages inside the databases, or the databases themselves. Defaults to pages. 
+        
+        Example: 
+            --target databases""",
+    )
+
+    parser.add_argument(
+        "--category",
+        type=str,
+        default=None,
+        help="""Only archive pages with this 5E Category. 
+        
+        Example: 
+            --category Conditions""",
+    )
+
+    parser.add_argument(
+        "--created_after",
+        type=str,
+        default=None,
+        help="""Only archive what was created on or after this ISO date or time. 
+        
+        Example: 
+            --created_after 2024-10-01T18:00:00Z""",
+    )
+
+    parser.add_argument(
+        "--created_before",
+        type=str,
+        default=None,
+        help="""Only archive what was created before this ISO date or time. 
+        
+        Example: 
+            --created_before 2024-10-02""",
+    )
+
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        default=False,
+        help="""Archive the matching pages, without it the cleanup is a dry run. 
+        
+        Example: 
+            --apply""",
+    )
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="""Threads sending archive requests, they share the --rate limit. Defaults to 4. 
+        
+        Example: 
+            --workers 8""",
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=NOTION_REQUESTS_PER_SECOND,
+        help=f"""Requests per second across all workers. Defaults to {NOTION_REQUESTS_PER_SECOND}, Notion's average limit. 
+        
+        Example: 
+            --rate 2.5""",
+    )
+
+    parser.add_argument(
+        "--base_url",
+        type=str,
+        required=False,
+        default="https://api.notion.com",
+        help="""The root URL of the Notion API. 
+        
+        Example: 
+            --base_url http://127.0.0.1:8765""",
+    )
+
+    parser.add_argument(
+        "--log_format",
+        type=str,
+        required=False,
+        default="text",
+        choices=LOG_FORMATS,
+        help="""Format of the log file. 
+        
+        Example: 
+            --log_format json""",
+    )
+
+    return parser
+
+
+def build_search_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser for the search command
+
+    Returns:
+        argparse.ArgumentParser: The configured parser
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py search",
+        description="""Search the names and descriptions of the SRD records offline, best match first. 
+        The index is built from the data directory on first use and whenever a file changes.""",
+    )
+
+    parser.add_argument(
+        "query",
+        type=str,
+        help="""Words that must all appear, or an FTS5 query using OR, NOT, "phrases" and prefix*. 
+        
+        Example: 
+            "fire damage" """,
+    )
+
+    parser.add_argument(
+        "-t",
+        "--type",
+        type=str,
+        required=False,
+        default=None,
+        help="""Only records of this entity type, the SRD file name without its 5e-SRD- prefix such as Spells, Monsters or Magic Items. 
+        
+        Example: 
+            --type Spells""",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--limit",
+        type=int,
+        required=False,
+        default=10,
+        help="""Most hits listed. Defaults to 10. 
+        
+        Example: 
+            --limit 25""",
+    )
+
+    return parser
+
+
+def validate_cleanup_args(args: argparse.Namespace) -> None:
+    """Check the parsed cleanup options
+
+    Args:
+        args (argparse.Namespace): The parsed cleanup arguments
+
+    Raises:
+        argparse.ArgumentTypeError: If the cleanup options are invalid
+    """
+    for name in ("created_after", "created_before"):
+        value = getattr(args, name)
+        if value is None:
+            continue
+        try:
+            datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"--{name} must be an ISO date or time, for example 2024-10-01 or 2024-10-01T18:00:00Z"
+            )
+
+    if args.category and args.target == "databases":
+        raise argparse.ArgumentTypeError(
+            "--category filters pages, it cannot be used with --target databases."
+        )
+
+    if args.workers < 1 or args.rate <= 0:
+        raise argparse.ArgumentTypeError("--workers and --rate must be positive.")
+
+
+def validate_args(args: argparse.Namespace) -> None:
+    """Check the parsed build options
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments
+
+    Raises:
+        argparse.ArgumentTypeError: If the build options are invalid
+    """
     # == Check if "All" is by itself or with other options
     if "all" in args.build and len(args.build) > 1:
         raise argparse.ArgumentTypeError(
             'If "all" is specified, it must be the only build option.'
         )
 
+    if args.min_concurrency < 1 or args.max_concurrency < args.min_concurrency:
+        raise argparse.ArgumentTypeError(
+            "--min_concurrency must be at least 1 and no more than --max_concurrency."
+        )
+
+    if args.export and args.site:
+        raise argparse.ArgumentTypeError("Use either --export or --site, not both.")
+
+    if args.replicate_to and (args.export or args.site):
+        raise argparse.ArgumentTypeError(
+            "--replicate_to copies to workspaces, it cannot be used with --export or --site."
+        )
+
+    if args.plan and (args.export or args.site or args.replicate_to):
+        raise argparse.ArgumentTypeError(
+            "--plan only estimates a build, it cannot be used with --export, --site or --replicate_to."
+        )
+
+    from src.api.export import replaceable_directory
+
+    for option, directory in (("--export", args.export), ("--site", args.site)):
+        if directory and not args.force and not replaceable_directory(directory):
+            raise argparse.ArgumentTypeError(
+                f"{option} {directory} holds files an earlier build did not write, choose another directory or pass --force to empty it."
+            )
+
+    if args.plan_latencies and not args.plan:
+        raise argparse.ArgumentTypeError("--plan_latencies is only used with --plan.")
+
+    if any(target.count(":") < 1 for target in args.replicate_to or []):
+        raise argparse.ArgumentTypeError(
+            "Each --replicate_to target must be PARENT_ID:AUTH_KEY."
+        )
+
+    if not (args.export or args.site or args.plan) and not (
+        args.database_id and args.auth_key
+    ):
+        raise argparse.ArgumentTypeError(
+            "--database_id and --auth_key are required unless --export, --site or --plan is given."
+        )
+
     # == Check if the build options are valid
     if any(build not in VALID_BUILD_SET_1 + VALID_BUILD_SET_2 for build in args.build):
         raise argparse.ArgumentTypeError(
             f"\n\nInvalid build option(s):\n\nValid Set 1:\n\n{', '.join(VALID_BUILD_SET_1)}\n\nValid Set 2:\n\n{', '.join(VALID_BUILD_SET_2)}\n"
         )
 
+
+if __name__ == "__main__":
+    # == "main.py cleanup ..." archives a previous build instead of building
+    if sys.argv[1:2] == ["cleanup"]:
+        args = build_cleanup_parser().parse_args(sys.argv[2:])
+        validate_cleanup_args(args)
+        cleanup_main(args)
+        sys.exit(0)
+
+    # == "main.py search ..." queries the offline SRD index without touching Notion
+    if sys.argv[1:2] == ["search"]:
+        search_main(build_search_parser().parse_args(sys.argv[2:]))
+        sys.exit(0)
+
+    args = build_parser().parse_args()
+    validate_args(args)
+
     # == Call main() with the parsed arguments
     main(args)
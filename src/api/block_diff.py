@@ -0,0 +1,251 @@
+import json
+import logging
+from difflib import SequenceMatcher
+from typing import Union
+
+from notion_client import Client
+
+# == Notion accepts at most 100 blocks per blocks.children.append
+APPEND_BATCH_SIZE = 100
+
+# == Fields the API adds to block content and rich text that a rendered block never carries,
+# == the "id" of a mentioned page or database is kept as it is the target of the mention
+RESPONSE_ONLY_KEYS = {
+    "object",
+    "parent",
+    "created_time",
+    "last_edited_time",
+    "created_by",
+    "last_edited_by",
+    "has_children",
+    "archived",
+    "in_trash",
+    "request_id",
+    "plain_text",
+    "href",
+    "children",
+    "type",
+}
+
+# == Block fields that can only be set when the block is created
+CREATE_ONLY_KEYS = {"table": {"table_width"}}
+
+
+def sync_children(
+    logger: logging.Logger,
+    notion: Client,
+    block_id: str,
+    rendered: list,
+    counts: Union[None, dict] = None,
+) -> dict:
+    """Bring the children of a page or block in line with a newly rendered block tree
+
+    The existing children are fetched with blocks.children.list and compared with the rendered
+    blocks from build_*_markdown. Matching blocks are left alone, a changed block of the same type
+    is edited with blocks.update, removed blocks are deleted and new blocks are appended after the
+    block they follow, so a text correction costs a couple of requests rather than a new page.
+    Nested children such as table rows and toggle content are compared the same way.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        block_id (str): The page or block whose children are updated
+        rendered (list): The children the page is built with
+        counts (Union[None, dict], optional): Running totals to add to. Defaults to None.
+
+    Returns:
+        dict: Number of blocks unchanged, updated, deleted and added
+
+    Example:
+        counts = sync_children(logger, notion, page_id, build_spell_markdown(spell))
+    """
+    counts = counts or {"unchanged": 0, "updated": 0, "deleted": 0, "added": 0}
+    existing = list_children(notion, block_id)
+    existing_signatures = [block_signature(block) for block in existing]
+    rendered_signatures = [block_signature(block) for block in rendered]
+
+    matcher = SequenceMatcher(
+        None, existing_signatures, rendered_signatures, autojunk=False
+    )
+
+    previous_id = None
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        old_blocks = existing[i1:i2]
+        new_blocks = rendered[j1:j2]
+
+        if tag == "equal":
+            for old, new in zip(old_blocks, new_blocks):
+                counts["unchanged"] += 1
+                _sync_nested(logger, notion, old, new, counts)
+                previous_id = old["id"]
+            continue
+
+        # == Pair up changed blocks, same type blocks are edited in place
+        paired = 0
+        if tag == "replace":
+            for old, new in zip(old_blocks, new_blocks):
+                if not can_update(old, new):
+                    break
+                notion.blocks.update(
+                    block_id=old["id"], **{new["type"]: update_content(new)}
+                )
+                counts["updated"] += 1
+                _sync_nested(logger, notion, old, new, counts)
+                previous_id = old["id"]
+                paired += 1
+
+        for old in old_blocks[paired:]:
+            notion.blocks.delete(block_id=old["id"])
+            counts["deleted"] += 1
+
+        # == The API can only insert after a block, new blocks ahead of every kept block mean
+        # == the rest of the list is replaced
+        if new_blocks[paired:] and previous_id is None and i2 < len(existing):
+            logger.debug("Blocks were added at the top of %s, replacing them", block_id)
+            for old in existing[i2:]:
+                notion.blocks.delete(block_id=old["id"])
+            counts["deleted"] += len(existing) - i2
+            append_blocks(notion, block_id, rendered[j1 + paired :], None)
+            counts["added"] += len(rendered) - j1 - paired
+            return counts
+
+        if new_blocks[paired:]:
+            created = append_blocks(notion, block_id, new_blocks[paired:], previous_id)
+            counts["added"] += len(new_blocks[paired:])
+            previous_id = created[-1] if created else previous_id
+
+    return counts
+
+
+def list_children(notion: Client, block_id: str) -> list:
+    """Fetch the children of a page or block, with their own children nested under "children"
+
+    Args:
+        notion (Client): Notion Client object
+        block_id (str): The page or block
+
+    Returns:
+        list: The child blocks in page order
+    """
+    children = []
+    start_cursor = None
+    while True:
+        response = notion.blocks.children.list(
+            block_id=block_id, start_cursor=start_cursor, page_size=100
+        )
+        children.extend(response["results"])
+        start_cursor = response.get("next_cursor")
+        if not response.get("has_more") or not start_cursor:
+            break
+
+    for child in children:
+        if child.get("has_children"):
+            child["children"] = list_children(notion, child["id"])
+    return children
+
+
+def append_blocks(
+    notion: Client, block_id: str, blocks: list, after: Union[None, str]
+) -> list:
+    """Append blocks in batches the API accepts, keeping them in order
+
+    Args:
+        notion (Client): Notion Client object
+        block_id (str): The page or block to append to
+        blocks (list): The blocks to append
+        after (Union[None, str]): The child to insert after, the end of the list when None
+
+    Returns:
+        list: IDs of the top level blocks that were created
+    """
+    created = []
+    for start in range(0, len(blocks), APPEND_BATCH_SIZE):
+        request = {
+            "block_id": block_id,
+            "children": blocks[start : start + APPEND_BATCH_SIZE],
+        }
+        if after:
+            request["after"] = after
+        response = notion.blocks.children.append(**request)
+        ids = [block["id"] for block in response["results"]]
+        created.extend(ids)
+        after = ids[-1] if ids and after else after
+    return created
+
+
+def block_signature(block: dict) -> str:
+    """A comparable form of a block's own content, ignoring its children and API metadata
+
+    Args:
+        block (dict): A block from the API or from build_*_markdown
+
+    Returns:
+        str: The block type and normalised content as JSON
+    """
+    content = _normalise(block.get(block["type"]) or {})
+    return json.dumps([block["type"], content], sort_keys=True, ensure_ascii=False)
+
+
+def can_update(old: dict, new: dict) -> bool:
+    """Whether an existing block can be edited into a rendered one with blocks.update
+
+    Args:
+        old (dict): The existing block
+        new (dict): The rendered block
+
+    Returns:
+        bool: False when the type or a field that is only set at creation differs
+    """
+    if old["type"] != new["type"]:
+        return False
+    old_content = old.get(old["type"]) or {}
+    new_content = new.get(new["type"]) or {}
+    return all(
+        old_content.get(key) == new_content.get(key)
+        for key in CREATE_ONLY_KEYS.get(new["type"], ())
+    )
+
+
+def update_content(block: dict) -> dict:
+    """The content of a rendered block as blocks.update expects it
+
+    Args:
+        block (dict): The rendered block
+
+    Returns:
+        dict: The block content without children and creation only fields
+    """
+    skip = {"children"} | CREATE_ONLY_KEYS.get(block["type"], set())
+    return {
+        key: value
+        for key, value in (block.get(block["type"]) or {}).items()
+        if key not in skip
+    }
+
+
+def _sync_nested(
+    logger: logging.Logger, notion: Client, old: dict, new: dict, counts: dict
+) -> None:
+    rendered = (new.get(new["type"]) or {}).get("children") or []
+    if rendered or old.get("children"):
+        sync_children(logger, notion, old["id"], rendered, counts)
+
+
+def _normalise(value: Union[dict, list, str, int, float, bool, None]):
+    # == Drop API metadata and default values, so a block reads the same whichever side it came from
+    if isinstance(value, dict):
+        normalised = {}
+        for key, item in value.items():
+            if key in RESPONSE_ONLY_KEYS:
+                continue
+            item = _normalise(item)
+            if key == "id" and isinstance(item, str):
+                # == The API returns IDs with dashes, a rendered mention may carry them without
+                item = item.replace("-", "").lower()
+            if item in (None, False, "default", {}, [], ""):
+                continue
+            normalised[key] = item
+        return normalised
+    if isinstance(value, list):
+        return [_normalise(item) for item in value]
+    return value
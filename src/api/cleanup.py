@@ -0,0 +1,313 @@
+import argparse
+import datetime
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Union
+
+import httpx
+from notion_client import Client
+from notion_client.errors import (
+    APIResponseError,
+    HTTPResponseError,
+    RequestTimeoutError,
+)
+
+from src.api.notion_api import list_child_databases
+from src.utils.page_index import page_title
+
+CATEGORY_PROPERTY = "5E Category"
+# == Errors one archive call can end with once the client's retries are used up
+ARCHIVE_ERRORS = (HTTPResponseError, RequestTimeoutError, httpx.HTTPError)
+
+
+def cleanup(logger: logging.Logger, notion: Client, args: argparse.Namespace) -> None:
+    """Archive the pages or databases a build left under the parent page
+
+    Without --apply nothing is changed, everything that would be archived is listed instead.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object, with a rate limiter when archiving concurrently
+        args (argparse.Namespace): The parsed cleanup arguments
+
+    Example:
+        py .\\main.py cleanup --database_id a674063b72a04deb8da26650db7294a5 -k secret_*** --databases Spells --apply
+    """
+    databases = select_databases(logger, notion, args.database_id, args.databases)
+
+    try:
+        if args.target == "databases":
+            targets = [
+                {
+                    "object": "database",
+                    "id": database["id"],
+                    "title": database["child_database"]["title"],
+                    "created_time": database["created_time"],
+                }
+                for database in databases
+                if in_time_range(
+                    database["created_time"], args.created_after, args.created_before
+                )
+            ]
+        else:
+            targets = []
+            for database in databases:
+                targets.extend(
+                    database_pages(
+                        logger,
+                        notion,
+                        database["id"],
+                        database["child_database"]["title"],
+                        args.category,
+                        args.created_after,
+                        args.created_before,
+                    )
+                )
+
+    except APIResponseError as e:
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
+        sys.exit(1)
+
+    if not args.apply:
+        for target in targets:
+            logger.info(
+                "Would archive %s %s -- created %s",
+                target["object"],
+                target["title"],
+                target["created_time"],
+                extra={"page_id": target["id"]},
+            )
+        logger.info(
+            "Dry run -- %s %ss would be archived from %s databases, rerun with --apply to archive them",
+            len(targets),
+            args.target[:-1],
+            len(databases),
+        )
+        return
+
+    archived, failed = archive(logger, notion, targets, args.workers)
+    logger.info("Archived %s %ss", len(archived), args.target[:-1])
+
+    # == Archived pages have to be created again by the next build rather than skipped
+    wal = getattr(notion, "wal", None)
+    if wal:
+        archived_ids = {target["id"] for target in archived}
+        wal.forget(
+            page_ids=archived_ids if args.target == "pages" else (),
+            database_ids=archived_ids if args.target == "databases" else (),
+        )
+
+    if failed:
+        logger.error("%s archives failed, run the cleanup again to retry them", failed)
+        sys.exit(1)
+
+
+def select_databases(
+    logger: logging.Logger,
+    notion: Client,
+    parent_id: str,
+    titles: Union[None, list],
+) -> list:
+    """The databases under the parent page to clean up
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        parent_id (str): The parent page, --database_id
+        titles (Union[None, list]): Titles of the databases, every database when None
+
+    Returns:
+        list: The child_database blocks
+    """
+    try:
+        databases = list_child_databases(notion, parent_id)
+    except APIResponseError as e:
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
+        sys.exit(1)
+
+    if not titles:
+        return databases
+
+    selected = [
+        database
+        for database in databases
+        if database["child_database"]["title"] in titles
+    ]
+    found = {database["child_database"]["title"] for database in selected}
+    for title in titles:
+        if title not in found:
+            logger.warning("No %s database under the parent page", title)
+    return selected
+
+
+def database_pages(
+    logger: logging.Logger,
+    notion: Client,
+    database_id: str,
+    database_title: str,
+    category: Union[None, str] = None,
+    created_after: Union[None, str] = None,
+    created_before: Union[None, str] = None,
+) -> list:
+    """List the pages of a database matching the cleanup filters, paging through databases.query
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        database_id (str): ID of the database
+        database_title (str): Title of the database, for logging
+        category (Union[None, str], optional): Only pages with this 5E Category. Defaults to None.
+        created_after (Union[None, str], optional): Only pages created on or after this ISO date. Defaults to None.
+        created_before (Union[None, str], optional): Only pages created before this ISO date. Defaults to None.
+
+    Returns:
+        list: The pages to archive
+    """
+    conditions = []
+    if category:
+        properties = notion.databases.retrieve(database_id=database_id)["properties"]
+        if CATEGORY_PROPERTY not in properties:
+            logger.warning(
+                "%s has no %s property, skipping it",
+                database_title,
+                CATEGORY_PROPERTY,
+            )
+            return []
+        conditions.append(
+            {"property": CATEGORY_PROPERTY, "select": {"equals": category}}
+        )
+    if created_after:
+        conditions.append(
+            {
+                "timestamp": "created_time",
+                "created_time": {"on_or_after": created_after},
+            }
+        )
+    if created_before:
+        conditions.append(
+            {"timestamp": "created_time", "created_time": {"before": created_before}}
+        )
+
+    pages = []
+    start_cursor = None
+    while True:
+        query = {"database_id": database_id, "page_size": 100}
+        if conditions:
+            query["filter"] = (
+                conditions[0] if len(conditions) == 1 else {"and": conditions}
+            )
+        if start_cursor:
+            query["start_cursor"] = start_cursor
+        response = notion.databases.query(**query)
+        pages.extend(
+            {
+                "object": "page",
+                "id": page["id"],
+                "title": f"{database_title} / {page_title(page['properties'])}",
+                "created_time": page["created_time"],
+            }
+            for page in response["results"]
+        )
+
+        start_cursor = response.get("next_cursor")
+        if not response.get("has_more") or not start_cursor:
+            break
+
+    logger.info(
+        "%s pages in %s match the cleanup filters",
+        len(pages),
+        database_title,
+        extra={"database_id": database_id},
+    )
+    return pages
+
+
+def archive(
+    logger: logging.Logger, notion: Client, targets: list, workers: int
+) -> tuple[list, int]:
+    """Archive pages and databases concurrently
+
+    Pages are archived with pages.update and databases by deleting their child_database block,
+    which is how the API moves them to the trash. The client's rate limiter keeps the threads
+    under Notion's request limit.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        targets (list): Pages and databases from database_pages or select_databases
+        workers (int): Number of threads sending archive requests
+
+    Returns:
+        tuple[list, int]: The targets that were archived and the number that failed, a target
+            that errors or times out is counted as failed and the others are still archived
+    """
+
+    def archive_one(target: dict) -> dict:
+        if target["object"] == "database":
+            notion.blocks.delete(block_id=target["id"])
+        else:
+            notion.pages.update(page_id=target["id"], archived=True)
+        return target
+
+    archived = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(archive_one, target): target for target in targets}
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                future.result()
+            except ARCHIVE_ERRORS as e:
+                failed += 1
+                logger.error(
+                    "Could not archive %s %s -- %s: %s",
+                    target["object"],
+                    target["title"],
+                    getattr(e, "status", type(e).__name__),
+                    e,
+                    extra={"page_id": target["id"]},
+                )
+                continue
+
+            archived.append(target)
+            logger.info(
+                "Archived %s %s",
+                target["object"],
+                target["title"],
+                extra={"page_id": target["id"]},
+            )
+
+    return archived, failed
+
+
+def in_time_range(
+    created_time: str,
+    created_after: Union[None, str] = None,
+    created_before: Union[None, str] = None,
+) -> bool:
+    """Whether a creation time falls in the cleanup range, for databases which cannot be queried
+
+    Args:
+        created_time (str): ISO 8601 creation time from the API
+        created_after (Union[None, str], optional): ISO date the object must be created on or after. Defaults to None.
+        created_before (Union[None, str], optional): ISO date the object must be created before. Defaults to None.
+
+    Returns:
+        bool: True when the object is in the range
+    """
+
+    def parse(value: str) -> datetime.datetime:
+        parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed
+
+    created = parse(created_time)
+    if created_after and created < parse(created_after):
+        return False
+    if created_before and created >= parse(created_before):
+        return False
+    return True
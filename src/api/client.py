@@ -0,0 +1,297 @@
+import random
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+
+import httpx
+from notion_client import Client
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+from src.api.metrics import ApiMetrics
+from src.api.token_pool import REJECTED_STATUS_CODES
+from src.api.transport import build_http_client, request_timeout
+
+if TYPE_CHECKING:
+    from src.api.rate_limit import TokenBucket
+    from src.api.uploader import AimdController
+
+# == Status codes worth retrying, everything else is returned to the caller straight away
+RETRY_STATUS_CODES = {409, 429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 30
+# == Pooled connections when the caller does not size the pool to its concurrency
+DEFAULT_POOL_SIZE = 4
+
+
+class NotionClient(Client):
+    """Notion client that measures and retries every API call.
+
+    All endpoints (pages, databases, blocks, search) go through request(), so calls made directly
+    from the builders are covered as well as the helpers in notion_api.py. Each HTTP attempt is
+    recorded in metrics, and rate limited or failed attempts are retried after the Retry-After
+    header or an exponential backoff. Calls share one pooled httpx client with keep-alive, and
+    every new connection is counted in metrics so connection reuse can be checked. With a
+    TokenPool in tokens, each attempt is sent with one of several integration tokens and paced by
+    that token's own controller.
+
+    Args:
+        metrics (ApiMetrics, optional): Where calls are recorded. Defaults to a new ApiMetrics.
+        max_retries (int, optional): Retries per call before the error is raised. Defaults to MAX_RETRIES.
+        rate_limiter (TokenBucket, optional): Paces every attempt, for callers sending from several threads. Defaults to None.
+        concurrency (AimdController, optional): Adapts the number of calls in flight to 429s and latency. Defaults to None.
+        pool_size (int, optional): Connections kept alive, match it to the calls in flight. Defaults to DEFAULT_POOL_SIZE.
+        http2 (Union[None, bool], optional): Force HTTP/2 on or off, used when h2 is installed by default. Defaults to None.
+        **kwargs: Passed to notion_client.Client, for example auth and base_url
+
+    Example:
+        notion = NotionClient(auth=args.auth_key, base_url=args.base_url)
+        notion.metrics.set_context("creatures")
+        ...
+        notion.metrics.log_summary(logger)
+    """
+
+    def __init__(
+        self,
+        metrics: ApiMetrics = None,
+        max_retries: int = MAX_RETRIES,
+        rate_limiter: "TokenBucket" = None,
+        concurrency: "AimdController" = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        http2: Union[None, bool] = None,
+        **kwargs: Any,
+    ) -> None:
+        if kwargs.get("client") is None:
+            kwargs["client"] = build_http_client(pool_size, http2)
+        super().__init__(**kwargs)
+        # == notion_client replaces the timeouts with a single value, keep the per phase ones
+        self.client.timeout = request_timeout(self.options.timeout_ms / 1000)
+        self.metrics = metrics or ApiMetrics()
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        # == Set by main to a PageUploader so builders can create pages on worker threads
+        self.uploader = None
+        # == Set by main to a PageIndex so builders can link pages without searching
+        self.page_index = None
+        # == Set by main to a WriteAheadLog so mutating calls survive a crash
+        self.wal = None
+        # == Set by main with --update, pages from an earlier run are updated instead of skipped
+        self.update_pages = False
+        # == Set by main to a SearchIndex so mentions resolve from the SRD files, not a search
+        self.search_index = None
+        # == Set by main to a SiteWriter with --site, pages are written out after each builder
+        self.site = None
+        # == Set by main to a BuildProgress, create_page counts the pages it finishes
+        self.progress = None
+        # == Set by main to a TokenPool when several --auth_key tokens are given
+        self.tokens = None
+        # == Set by main with --replicate_to, clients of the workspaces every page is copied to
+        self.replicas = []
+        # == Set by main with --auto_link, entity names in page text become mentions
+        self.auto_link = False
+
+    def request(
+        self,
+        path: str,
+        method: str,
+        query: Optional[Dict[Any, Any]] = None,
+        body: Optional[Dict[Any, Any]] = None,
+        auth: Optional[str] = None,
+    ) -> Any:
+        """Send an HTTP request, recording and retrying each attempt"""
+        endpoint = endpoint_name(method, path)
+        wal_seq = (
+            self.wal.begin(endpoint, body)
+            if self.wal and is_mutation(method, path)
+            else None
+        )
+
+        for attempt in range(self.max_retries + 1):
+            # == A token passed by the caller is kept, otherwise the pool picks one per attempt
+            token = self.tokens.pick() if self.tokens and auth is None else None
+            concurrency = token.concurrency if token else self.concurrency
+            request = self._build_request(
+                method, path, query, body, token.auth if token else auth
+            )
+            request.extensions["trace"] = self._trace_connection
+            payload_bytes = len(request.content)
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            if concurrency:
+                concurrency.acquire()
+
+            start = perf_counter()
+            status = None
+            try:
+                response = self.client.send(request)
+                status = response.status_code
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                # == The connection failed before an answer, the call is resolved so recover() skips it
+                if wal_seq:
+                    self.wal.fail(wal_seq, type(e).__name__)
+                raise
+            finally:
+                if concurrency:
+                    concurrency.release(endpoint, status, perf_counter() - start)
+
+            if status == "timeout":
+                self.metrics.record(
+                    endpoint,
+                    perf_counter() - start,
+                    payload_bytes,
+                    "timeout",
+                    attempt > 0,
+                )
+                created = self._created_page(endpoint, wal_seq)
+                if created:
+                    return created
+                if attempt < self.max_retries:
+                    sleep(backoff_delay(attempt))
+                    continue
+                if wal_seq:
+                    self.wal.fail(wal_seq, "timeout")
+                raise RequestTimeoutError()
+
+            self.metrics.record(
+                endpoint,
+                perf_counter() - start,
+                payload_bytes,
+                response.status_code,
+                attempt > 0,
+            )
+
+            if (
+                token
+                and response.status_code in REJECTED_STATUS_CODES
+                and attempt < self.max_retries
+                and self.tokens.reject(token, response.status_code)
+            ):
+                continue
+
+            if (
+                response.status_code in RETRY_STATUS_CODES
+                and response.status_code != 429
+            ):
+                created = self._created_page(endpoint, wal_seq)
+                if created:
+                    return created
+
+            if (
+                response.status_code in RETRY_STATUS_CODES
+                and attempt < self.max_retries
+            ):
+                delay = retry_delay(response, attempt)
+                if concurrency and response.status_code == 429:
+                    # == A 429 applies to the whole integration, every thread waits it out
+                    concurrency.pause(delay)
+                # == With a pool the retry goes to a token that is not paused, or waits in acquire
+                if not (token and response.status_code == 429):
+                    sleep(delay)
+                continue
+
+            try:
+                result = self._parse_response(response)
+            except HTTPResponseError as e:
+                if wal_seq:
+                    self.wal.fail(wal_seq, str(e.status))
+                raise
+
+            if wal_seq:
+                self.wal.commit(
+                    wal_seq,
+                    result.get("id"),
+                    (result.get("parent") or {}).get("database_id"),
+                )
+
+            # == Later calls are tagged with the database they are creating or reusing
+            if path.startswith("databases") and result.get("object") == "database":
+                self.metrics.set_database(
+                    "".join(t.get("plain_text", "") for t in result.get("title", []))
+                )
+
+            return result
+
+    def _created_page(
+        self, endpoint: str, wal_seq: Union[None, int]
+    ) -> Union[None, dict]:
+        # == A create that timed out or got a 409 or 5xx may still have been applied, its key is looked up before it is sent again
+        if not wal_seq or endpoint != "POST /pages":
+            return None
+        try:
+            page = self.wal.find_page(self, wal_seq)
+        except (HTTPResponseError, RequestTimeoutError, httpx.HTTPError):
+            return None
+        if page:
+            self.wal.commit(wal_seq, page["id"])
+        return page
+
+    def _trace_connection(self, event: str, info: dict) -> None:
+        # == httpcore reports each phase of a call, a connect only happens when no pooled one is free
+        if event == "connection.connect_tcp.complete":
+            self.metrics.record_connection("opened")
+        elif event == "connection.start_tls.complete":
+            self.metrics.record_connection("tls_handshakes")
+
+
+def is_mutation(method: str, path: str) -> bool:
+    """Whether a request changes the workspace, database queries and search are POSTs that do not
+
+    Args:
+        method (str): HTTP method
+        path (str): Path relative to /v1/
+
+    Returns:
+        bool: True for calls that create, update or delete something
+    """
+    if method == "GET":
+        return False
+    path = path.strip("/")
+    return not (method == "POST" and (path == "search" or path.endswith("/query")))
+
+
+def endpoint_name(method: str, path: str) -> str:
+    """Normalise a request into an endpoint name with object IDs removed
+
+    Args:
+        method (str): HTTP method
+        path (str): Path relative to /v1/, for example "blocks/<id>/children"
+
+    Returns:
+        str: The endpoint, for example "PATCH /blocks/{id}/children"
+    """
+    parts = path.strip("/").split("/")
+    if len(parts) > 1:
+        parts[1] = "{id}"
+    return f"{method} /{'/'.join(parts)}"
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """How long to wait before retrying a response
+
+    Args:
+        response (httpx.Response): The failed response
+        attempt (int): Zero based attempt number
+
+    Returns:
+        float: Seconds to wait, taken from Retry-After when the API sends it
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        except ValueError:
+            pass
+    return backoff_delay(attempt)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter
+
+    Args:
+        attempt (int): Zero based attempt number
+
+    Returns:
+        float: Seconds to wait
+    """
+    return min(MAX_BACKOFF_SECONDS, 2**attempt) * random.uniform(0.5, 1.0)
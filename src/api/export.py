@@ -0,0 +1,486 @@
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import zipfile
+from urllib.parse import quote
+
+import httpx
+
+from src.api.stub_server import NotionStub
+from src.utils.wal import WAL_PROPERTY
+
+EXPORT_PARENT_ID = "export-parent"
+EXPORT_AUTH_KEY = "secret_export"
+# == Left in every directory an export writes, only such a directory is emptied without --force
+OUTPUT_MARKER = ".dnd-notion-output"
+
+# == Characters Windows, macOS or the Notion importer will not take in a file name
+UNSAFE_FILE_CHARACTERS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+LIST_PREFIXES = {
+    "bulleted_list_item": "- ",
+    "numbered_list_item": "1. ",
+    "toggle": "- ",
+}
+
+
+class StubTransport(httpx.BaseTransport):
+    """httpx transport answering every request from an in-process NotionStub
+
+    NotionClient sends its calls through this transport during an export, so the builders, the
+    mention lookups and the relations run unchanged and the payloads they would upload, payload
+    limits included, end up in the stub's memory instead of a workspace.
+
+    Args:
+        stub (NotionStub): The in-memory workspace
+    """
+
+    def __init__(self, stub: NotionStub) -> None:
+        self.stub = stub
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        content = request.read()
+        query = {key: value for key, value in request.url.params.items()}
+        status, headers, payload = self.stub.handle(
+            request.method,
+            request.url.path,
+            query,
+            json.loads(content) if content else None,
+            {"Authorization": request.headers.get("Authorization", "")},
+            len(content),
+        )
+        return httpx.Response(status, headers=headers, json=payload)
+
+
+def export_client(stub: NotionStub) -> httpx.Client:
+    """The httpx client to hand to NotionClient so a build fills the stub
+
+    Args:
+        stub (NotionStub): The in-memory workspace
+
+    Returns:
+        httpx.Client: The client
+
+    Example:
+        stub = NotionStub()
+        notion = NotionClient(auth=EXPORT_AUTH_KEY, client=export_client(stub))
+    """
+    return httpx.Client(
+        transport=StubTransport(stub), base_url="https://api.notion.com"
+    )
+
+
+def write_bundle(
+    logger: logging.Logger,
+    stub: NotionStub,
+    parent_id: str,
+    output_directory: str,
+    force: bool = False,
+) -> str:
+    """Write the databases a build left in the stub as a bundle for Notion's importer
+
+    Each database becomes <Title>.csv, one row per page with the properties as text, and a
+    <Title>/ folder with one Markdown file per page holding its content. Page mentions become
+    relative links between the files, which Notion turns back into links between the imported
+    pages. The directory is zipped next to itself, the zip is what Notion's Import takes.
+
+    Args:
+        logger (logging.Logger): Logging object
+        stub (NotionStub): The workspace the build filled
+        parent_id (str): The parent page the databases were built under
+        output_directory (str): Where to write the bundle, emptied first, see reset_output_directory
+        force (bool, optional): Empty the directory even if an earlier export did not write it. Defaults to False.
+
+    Returns:
+        str: Path of the zip
+    """
+    with stub.lock:
+        databases = [
+            stub.databases[block_key]
+            for block_key in stub.children.get(object_key(parent_id), [])
+            if block_key in stub.databases
+        ]
+
+        # == Every page gets its path first so mentions can link pages of later databases
+        paths = {}
+        rows = {}
+        for database in databases:
+            folder = file_name(item_title(database))
+            paths[object_key(database["id"])] = f"{folder}.csv"
+            used = set()
+            rows[database["id"]] = []
+            for page in stub.pages.values():
+                parent = page["parent"].get("database_id")
+                if (
+                    page["archived"]
+                    or not parent
+                    or object_key(parent) != object_key(database["id"])
+                ):
+                    continue
+                name = unique_name(file_name(item_title(page)), used)
+                paths[object_key(page["id"])] = f"{folder}/{name}.md"
+                rows[database["id"]].append(page)
+
+        reset_output_directory(output_directory, force)
+
+        page_count = 0
+        for database in databases:
+            columns = [
+                name
+                for name, prop in sorted(
+                    database["properties"].items(),
+                    key=lambda item: item[1]["type"] != "title",
+                )
+                if name != WAL_PROPERTY
+            ]
+            csv_path = os.path.join(output_directory, paths[object_key(database["id"])])
+            with open(csv_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for page in rows[database["id"]]:
+                    writer.writerow(
+                        property_text(stub, page["properties"].get(name))
+                        for name in columns
+                    )
+
+            for page in rows[database["id"]]:
+                page_path = paths[object_key(page["id"])]
+                markdown = MarkdownWriter(stub, paths, page_path).page(page)
+                full_path = os.path.join(output_directory, page_path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "w", encoding="utf-8") as f:
+                    f.write(markdown)
+                page_count += 1
+
+    archive = zip_bundle(output_directory)
+    logger.info(
+        "Exported %s pages in %s databases to %s, import %s into Notion",
+        page_count,
+        len(databases),
+        output_directory,
+        archive,
+    )
+    return archive
+
+
+def replaceable_directory(output_directory: str) -> bool:
+    """Whether an output directory can be emptied without --force
+
+    Args:
+        output_directory (str): The --export directory
+
+    Returns:
+        bool: True when it does not exist, is empty or holds OUTPUT_MARKER from an earlier build
+    """
+    if not os.path.exists(output_directory):
+        return True
+    if not os.path.isdir(output_directory):
+        return False
+    entries = os.listdir(output_directory)
+    return not entries or OUTPUT_MARKER in entries
+
+
+def reset_output_directory(output_directory: str, force: bool = False) -> None:
+    """Empty an output directory and mark it as written by a build
+
+    Args:
+        output_directory (str): The directory
+        force (bool, optional): Empty it even when replaceable_directory says no. Defaults to False.
+
+    Raises:
+        ValueError: If the directory holds files an earlier build did not write and force is not set
+    """
+    if not force and not replaceable_directory(output_directory):
+        raise ValueError(
+            f"{output_directory} is not empty and was not written by an earlier build"
+        )
+    if os.path.isdir(output_directory):
+        shutil.rmtree(output_directory)
+    elif os.path.exists(output_directory):
+        os.remove(output_directory)
+    os.makedirs(output_directory)
+    with open(os.path.join(output_directory, OUTPUT_MARKER), "w") as f:
+        f.write("Written by D&D Notion, emptied by the next build writing here\n")
+
+
+def zip_bundle(output_directory: str) -> str:
+    """Zip a bundle next to its directory, leaving OUTPUT_MARKER out of the import
+
+    Args:
+        output_directory (str): The bundle
+
+    Returns:
+        str: Path of the zip
+    """
+    archive = f"{output_directory.rstrip(os.sep)}.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for folder, _, files in os.walk(output_directory):
+            for name in sorted(files):
+                path = os.path.join(folder, name)
+                if name != OUTPUT_MARKER:
+                    bundle.write(path, os.path.relpath(path, output_directory))
+    return archive
+
+
+class MarkdownWriter:
+    """Renders the blocks of a stub page as Markdown
+
+    Args:
+        stub (NotionStub): The workspace holding the blocks
+        paths (dict): Page or database key -> path in the bundle, for links
+        page_path (str): Path of the page being written, links are relative to it
+    """
+
+    def __init__(self, stub: NotionStub, paths: dict, page_path: str) -> None:
+        self.stub = stub
+        self.paths = paths
+        self.folder = os.path.dirname(page_path)
+
+    def page(self, page: dict) -> str:
+        """The Markdown file of a page, its title as the heading
+
+        Args:
+            page (dict): The stub page
+
+        Returns:
+            str: The Markdown
+        """
+        lines = [f"# {item_title(page)}", ""]
+        lines.extend(self.blocks(object_key(page["id"]), 0))
+        # == Empty paragraphs are spacing in Notion, one blank line is enough in Markdown
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip() + "\n"
+
+    def blocks(self, parent_key: str, depth: int) -> list:
+        """The Markdown lines of a block's children
+
+        Args:
+            parent_key (str): Key of the page or block
+            depth (int): Nesting of list items, indents the lines
+
+        Returns:
+            list: The lines
+        """
+        lines = []
+        indent = "    " * depth
+        for block_key in self.stub.children.get(parent_key, []):
+            block = self.stub.blocks[block_key]
+            block_type = block["type"]
+            content = block.get(block_type) or {}
+            text = self.rich_text(content.get("rich_text") or [])
+
+            if block_type in LIST_PREFIXES:
+                lines.append(f"{indent}{LIST_PREFIXES[block_type]}{text}")
+                lines.extend(self.blocks(block_key, depth + 1))
+                continue
+
+            if block_type in ("table_of_contents", "child_database"):
+                continue
+            # == A blank line ends a list, and keeps "---" from turning the line above into a heading
+            if lines and lines[-1]:
+                lines.append("")
+
+            if block_type.startswith("heading_"):
+                lines.append(f"{'#' * (int(block_type[-1]) + 1)} {text}")
+            elif block_type == "paragraph":
+                lines.append(f"{indent}{text}")
+            elif block_type in ("quote", "callout"):
+                icon = (content.get("icon") or {}).get("emoji")
+                lines.append(f"{indent}> {icon + ' ' if icon else ''}{text}")
+            elif block_type == "divider":
+                lines.append(f"{indent}---")
+            elif block_type == "code":
+                language = content.get("language", "")
+                lines.extend([f"{indent}```{language}", text, f"{indent}```"])
+            elif block_type == "table":
+                lines.extend(f"{indent}{line}" for line in self.table(block_key))
+                lines.append("")
+                continue
+            else:
+                lines.append(f"{indent}{text}")
+            lines.append("")
+            lines.extend(self.blocks(block_key, depth))
+        return lines
+
+    def table(self, table_key: str) -> list:
+        """The lines of a pipe table, the first row is the header as Markdown needs one
+
+        Args:
+            table_key (str): Key of the table block
+
+        Returns:
+            list: The lines
+        """
+        rows = [
+            [
+                self.rich_text(cell).replace("|", "\\|").replace("\n", " ")
+                for cell in self.stub.blocks[row_key]["table_row"]["cells"]
+            ]
+            for row_key in self.stub.children.get(table_key, [])
+        ]
+        if not rows:
+            return []
+        lines = [
+            "| " + " | ".join(rows[0]) + " |",
+            "|" + "---|" * len(rows[0]),
+        ]
+        lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+        return lines
+
+    def rich_text(self, runs: list) -> str:
+        """Markdown for a rich text array, mentions of bundle pages become relative links
+
+        Args:
+            runs (list): The rich text runs
+
+        Returns:
+            str: The Markdown
+        """
+        parts = []
+        for run in runs:
+            if run.get("type") == "mention":
+                parts.append(self.mention(run["mention"]))
+                continue
+
+            text = (run.get("text") or {}).get("content") or run.get("plain_text", "")
+            annotations = run.get("annotations") or {}
+            core = text.strip()
+            if core:
+                # == Markers only work against the text, surrounding spaces stay outside them
+                for name, marker in (
+                    ("code", "`"),
+                    ("bold", "**"),
+                    ("italic", "*"),
+                    ("strikethrough", "~~"),
+                ):
+                    if annotations.get(name):
+                        core = f"{marker}{core}{marker}"
+                link = (run.get("text") or {}).get("link")
+                if link and link.get("url"):
+                    core = f"[{core}]({link['url']})"
+                start = len(text) - len(text.lstrip())
+                text = f"{text[:start]}{core}{text[start + len(text.strip()) :]}"
+            parts.append(text)
+        return "".join(parts)
+
+    def mention(self, mention: dict) -> str:
+        """A relative link for a mention of a bundle page or database, plain text otherwise
+
+        Args:
+            mention (dict): The mention object of a rich text run
+
+        Returns:
+            str: The Markdown
+        """
+        target = (mention.get("page") or mention.get("database") or {}).get("id", "")
+        item = self.stub.pages.get(object_key(target)) or self.stub.databases.get(
+            object_key(target)
+        )
+        title = item_title(item) if item else ""
+        path = self.paths.get(object_key(target))
+        if not path:
+            return title
+        relative = os.path.relpath(path, self.folder or ".").replace(os.sep, "/")
+        return f"[{title}]({quote(relative)})"
+
+
+def property_text(stub: NotionStub, value: dict) -> str:
+    """A page property as CSV text, the way Notion's CSV importer reads it back
+
+    Args:
+        stub (NotionStub): The workspace, relations are written as the titles of their pages
+        value (dict): The property value of a stub page
+
+    Returns:
+        str: The text
+    """
+    if not value:
+        return ""
+    kind = value["type"]
+    content = value.get(kind)
+    if kind in ("title", "rich_text"):
+        return "".join(run.get("plain_text", "") for run in content or [])
+    if kind == "select":
+        return (content or {}).get("name", "")
+    if kind == "multi_select":
+        return ", ".join(option["name"] for option in content or [])
+    if kind == "relation":
+        titles = [
+            item_title(stub.pages[object_key(item["id"])])
+            for item in content or []
+            if object_key(item["id"]) in stub.pages
+        ]
+        return ", ".join(titles)
+    if kind == "checkbox":
+        return "Yes" if content else "No"
+    if content is None:
+        return ""
+    return str(content)
+
+
+def file_name(title: str) -> str:
+    """A title made safe to use as a file name
+
+    Args:
+        title (str): The page or database title
+
+    Returns:
+        str: The file name without extension
+    """
+    return UNSAFE_FILE_CHARACTERS.sub("-", title).strip(" .") or "Untitled"
+
+
+def unique_name(name: str, used: set) -> str:
+    """A file name not used yet in a folder, numbered when two pages share a title
+
+    Args:
+        name (str): The wanted name
+        used (set): Lower-cased names already taken, the result is added
+
+    Returns:
+        str: The name
+    """
+    candidate = name
+    number = 2
+    while candidate.lower() in used:
+        candidate = f"{name} {number}"
+        number += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def object_key(object_id: str) -> str:
+    """An ID without dashes, the form the stub keys its objects by
+
+    Args:
+        object_id (str): A page, database or block ID
+
+    Returns:
+        str: The key
+    """
+    return object_id.replace("-", "")
+
+
+def item_title(item: dict) -> str:
+    """The plain text title of a stub page or database
+
+    Args:
+        item (dict): The page or database
+
+    Returns:
+        str: The title
+    """
+    if item["object"] == "database":
+        runs = item["title"]
+    else:
+        runs = next(
+            (
+                value["title"]
+                for value in item["properties"].values()
+                if "title" in value
+            ),
+            [],
+        )
+    return "".join(run.get("plain_text", "") for run in runs)
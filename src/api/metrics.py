@@ -0,0 +1,342 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Union
+
+# == Upper bounds in milliseconds of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS_MS = [25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class ApiMetrics:
+    """Thread safe counters for every Notion API call made during a run.
+
+    Calls are grouped by the builder and database being built and by endpoint. For each group
+    the number of calls, a latency histogram, bytes sent, retries and status codes are kept.
+
+    Example:
+        metrics = ApiMetrics()
+        metrics.set_context("creatures")
+        metrics.record("POST /pages", 0.182, 5120, 200)
+        metrics.log_summary(logger)
+        metrics.write("logs/metrics.json")
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.builder = None
+        self.database = None
+        self._groups = {}
+        # == (seconds since start, concurrency limit, reason, token) for every change of the limit
+        self._concurrency = []
+        # == New connections and TLS handshakes, calls over a kept alive connection add neither
+        self._connections = {"opened": 0, "tls_handshakes": 0}
+
+    def set_context(self, builder: Union[None, str], database: str = None) -> None:
+        """Tag the following calls with the builder and database being built
+
+        Args:
+            builder (Union[None, str]): Name of the builder, for example "creatures"
+            database (str, optional): Title of the Notion database being filled. Defaults to None.
+        """
+        with self.lock:
+            self.builder = builder
+            self.database = database
+
+    def set_database(self, database: str) -> None:
+        """Tag the following calls with the database being filled, keeping the builder
+
+        Args:
+            database (str): Title of the Notion database
+        """
+        with self.lock:
+            self.database = database
+
+    def record(
+        self,
+        endpoint: str,
+        latency: float,
+        payload_bytes: int,
+        status: Union[int, str],
+        retry: bool = False,
+    ) -> None:
+        """Record a single HTTP attempt
+
+        Args:
+            endpoint (str): Method and normalised path, for example "PATCH /blocks/{id}/children"
+            latency (float): Seconds the attempt took
+            payload_bytes (int): Size of the request body
+            status (Union[int, str]): HTTP status code, or "timeout"
+            retry (bool, optional): Whether this attempt was a retry. Defaults to False.
+        """
+        latency_ms = latency * 1000
+        with self.lock:
+            key = (self.builder, self.database, endpoint)
+            group = self._groups.get(key)
+            if group is None:
+                group = {
+                    "builder": self.builder,
+                    "database": self.database,
+                    "endpoint": endpoint,
+                    "calls": 0,
+                    "retries": 0,
+                    "errors": 0,
+                    "bytes_sent": 0,
+                    "status_codes": {},
+                    "latency_ms": {
+                        "total": 0.0,
+                        "min": None,
+                        "max": 0.0,
+                        "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    },
+                }
+                self._groups[key] = group
+
+            group["calls"] += 1
+            group["bytes_sent"] += payload_bytes
+            if retry:
+                group["retries"] += 1
+            if status == "timeout" or status >= 400:
+                group["errors"] += 1
+            group["status_codes"][str(status)] = (
+                group["status_codes"].get(str(status), 0) + 1
+            )
+
+            latency_stats = group["latency_ms"]
+            latency_stats["total"] += latency_ms
+            latency_stats["max"] = max(latency_stats["max"], latency_ms)
+            if latency_stats["min"] is None or latency_ms < latency_stats["min"]:
+                latency_stats["min"] = latency_ms
+            latency_stats["buckets"][_bucket_index(latency_ms)] += 1
+
+    def record_concurrency(
+        self, limit: float, reason: str, token: Union[None, str] = None
+    ) -> None:
+        """Record a change of the adaptive concurrency limit
+
+        Args:
+            limit (float): The new limit, calls in flight is its integer part
+            reason (str): Why it changed, for example "increase" or "rate limited"
+            token (Union[None, str], optional): The masked token whose controller changed, with a TokenPool. Defaults to None.
+        """
+        with self.lock:
+            self._concurrency.append(
+                (round(time.time() - self.started, 3), round(limit, 2), reason, token)
+            )
+
+    def record_connection(self, kind: str) -> None:
+        """Count a new connection to the API
+
+        Args:
+            kind (str): "opened" for a TCP connection or "tls_handshakes" for its handshake
+        """
+        with self.lock:
+            self._connections[kind] += 1
+
+    def connections(self) -> dict:
+        """Connections opened over the run and how many calls each one served
+
+        Returns:
+            dict: Connections opened, TLS handshakes and calls per connection
+        """
+        with self.lock:
+            connections = dict(self._connections)
+        calls = self.totals()["calls"]
+        connections["calls_per_connection"] = (
+            round(calls / connections["opened"], 2) if connections["opened"] else 0
+        )
+        return connections
+
+    def concurrency(self) -> dict:
+        """Summarise the concurrency limit over the run
+
+        With a TokenPool every token has its own limit, the current, lowest and highest limit are
+        then of the sum over the tokens and each token is summarised under "tokens".
+
+        Returns:
+            dict: Current, lowest and highest limit, the number of cuts by reason and every change
+        """
+        with self.lock:
+            samples = list(self._concurrency)
+        if not samples:
+            return {}
+
+        cuts = {}
+        tokens = {}
+        limits = {}
+        summed = []
+        sources = len({token for _, _, _, token in samples})
+        for _, limit, reason, token in samples:
+            stats = tokens.setdefault(
+                token, {"current": limit, "min": limit, "max": limit, "cuts": 0}
+            )
+            stats["current"] = limit
+            stats["min"] = min(stats["min"], limit)
+            stats["max"] = max(stats["max"], limit)
+            if reason not in ("start", "increase"):
+                cuts[reason] = cuts.get(reason, 0) + 1
+                stats["cuts"] += 1
+            # == Summed once every token has started, a partial sum is not a limit the build ran at
+            limits[token] = int(limit) if sources > 1 else limit
+            if len(limits) == sources:
+                summed.append(round(sum(limits.values()), 2))
+
+        summary = {
+            "current": summed[-1],
+            "min": min(summed),
+            "max": max(summed),
+            "cuts": cuts,
+            "samples": [
+                {
+                    "elapsed_s": elapsed,
+                    "limit": limit,
+                    "reason": reason,
+                    **({"token": token} if token else {}),
+                }
+                for elapsed, limit, reason, token in samples
+            ],
+        }
+        if None not in tokens:
+            summary["tokens"] = tokens
+        return summary
+
+    def snapshot(self) -> list:
+        """Return a copy of every call group
+
+        Returns:
+            list: One dict per builder, database and endpoint
+        """
+        with self.lock:
+            return json.loads(json.dumps(list(self._groups.values())))
+
+    def totals(self, builder: str = None) -> dict:
+        """Sum the counters, optionally for a single builder
+
+        Args:
+            builder (str, optional): Only count calls made by this builder. Defaults to None.
+
+        Returns:
+            dict: Calls, retries, errors, bytes sent and total latency in seconds
+        """
+        totals = {
+            "calls": 0,
+            "retries": 0,
+            "errors": 0,
+            "bytes_sent": 0,
+            "latency_s": 0.0,
+        }
+        for group in self.snapshot():
+            if builder is not None and group["builder"] != builder:
+                continue
+            totals["calls"] += group["calls"]
+            totals["retries"] += group["retries"]
+            totals["errors"] += group["errors"]
+            totals["bytes_sent"] += group["bytes_sent"]
+            totals["latency_s"] += group["latency_ms"]["total"] / 1000
+        return totals
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log a table of calls, latency and bytes per builder and endpoint
+
+        Args:
+            logger (logging.Logger): Logging object
+        """
+        groups = self.snapshot()
+        if not groups:
+            return
+
+        logger.info("=========================================================")
+        logger.info("==  Notion API calls")
+        logger.info("=========================================================")
+        logger.info(
+            f"{'Builder':<18} {'Database':<18} {'Endpoint':<30} {'Calls':>6} {'Retry':>6} "
+            f"{'Err':>5} {'Avg ms':>8} {'p95 ms':>8} {'Max ms':>8} {'KB sent':>9} {'Total s':>8}"
+        )
+        for group in sorted(
+            groups, key=lambda g: (str(g["builder"]), str(g["database"]), g["endpoint"])
+        ):
+            latency_stats = group["latency_ms"]
+            logger.info(
+                f"{str(group['builder']):<18.18} {str(group['database']):<18.18} "
+                f"{group['endpoint']:<30.30} {group['calls']:>6} {group['retries']:>6} "
+                f"{group['errors']:>5} {latency_stats['total'] / group['calls']:>8.0f} "
+                f"{_percentile(latency_stats, 0.95):>8} {latency_stats['max']:>8.0f} "
+                f"{group['bytes_sent'] / 1024:>9.1f} {latency_stats['total'] / 1000:>8.1f}"
+            )
+
+        totals = self.totals()
+        logger.info(
+            f"==  Total: {totals['calls']} calls, {totals['retries']} retries, "
+            f"{totals['errors']} errors, {totals['bytes_sent'] / 1024:.1f} KB sent, "
+            f"{totals['latency_s']:.1f}s waiting on the API over {time.time() - self.started:.1f}s"
+        )
+
+        connections = self.connections()
+        logger.info(
+            f"==  Connections: {connections['opened']} opened, "
+            f"{connections['tls_handshakes']} TLS handshakes, "
+            f"{connections['calls_per_connection']:.1f} calls per connection"
+        )
+
+        concurrency = self.concurrency()
+        if concurrency:
+            elapsed = max(time.time() - self.started, 0.001)
+            cuts = ", ".join(
+                f"{count} {reason}" for reason, count in concurrency["cuts"].items()
+            )
+            tokens = (
+                f" over {len(concurrency['tokens'])} tokens"
+                if "tokens" in concurrency
+                else ""
+            )
+            logger.info(
+                f"==  Concurrency: limit {int(concurrency['current'])} calls at the end{tokens}, "
+                f"{int(concurrency['min'])}-{int(concurrency['max'])} over the run, "
+                f"{sum(concurrency['cuts'].values())} cuts{f' ({cuts})' if cuts else ''}, "
+                f"{totals['calls'] / elapsed:.2f} requests per second"
+            )
+
+    def write(self, file_path: str) -> None:
+        """Write every call group to a JSON file
+
+        Args:
+            file_path (str): Where to write the metrics
+        """
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "w") as f:
+            json.dump(
+                {
+                    "started": self.started,
+                    "finished": time.time(),
+                    "latency_buckets_ms": LATENCY_BUCKETS_MS,
+                    "totals": self.totals(),
+                    "connections": self.connections(),
+                    "concurrency": self.concurrency(),
+                    "calls": self.snapshot(),
+                },
+                f,
+                indent=2,
+            )
+
+
+def _bucket_index(latency_ms: float) -> int:
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _percentile(latency_stats: dict, fraction: float) -> str:
+    # == The histogram only gives the bucket, so report its upper bound
+    buckets = latency_stats["buckets"]
+    target = sum(buckets) * fraction
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen >= target and count:
+            if index < len(LATENCY_BUCKETS_MS):
+                return f"<{LATENCY_BUCKETS_MS[index]}"
+            return f">{LATENCY_BUCKETS_MS[-1]}"
+    return "-"
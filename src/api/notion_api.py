@@ -1,8 +1,17 @@
 from notion_client.errors import APIResponseError
 import sys
-from time import sleep
+from time import perf_counter
 import logging
+from typing import Union
 from notion_client import Client
+from src.api.block_diff import sync_children
+from src.api.progress import count_page
+from src.api.replicas import replicate_database, replicate_page
+from src.api.schema import migrate_database
+from src.api.site import write_site_page
+from src.builds.auto_link import link_entities
+from src.utils.page_index import page_title, srd_index
+from src.utils.wal import WAL_PROPERTY, key_property
 
 '''
 def query_notion(
@@ -67,12 +76,16 @@ def create_page_under_page(
             properties={"title": [{"type": "text", "text": {"content": title}}]},
         )
 
-        logger.info(f"Page created with ID: {response['id']}")
+        logger.info(
+            "Page created with ID: %s",
+            response["id"],
+            extra={"page_id": response["id"]},
+        )
         return response["id"]
 
     except APIResponseError as e:
-        logger.error(f"Response status: {e.status}")
-        logger.error(f"An API error occurred: {e}")
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
         sys.exit(1)
 
 
@@ -82,6 +95,9 @@ def create_page(
     database_id: str,
     markdown_properties: dict,
     children_properties: list,
+    replicate: bool = True,
+    chunk_size: Union[None, int] = None,
+    record_index: Union[None, str] = None,
 ) -> None:
     """This function creates a page in Notion. It is used to create the pages for the creatures and equipment.
 
@@ -92,25 +108,302 @@ def create_page(
         database_id (str): Database ID
         markdown_properties (list): List of properties for the page
         children_properties (list): List of children properties for the page
+        replicate (bool, optional): Copy the page to the client's replica workspaces. Defaults to True.
+        chunk_size (Union[None, int], optional): Blocks sent with a new page, the rest are appended chunk by chunk. Defaults to None, every block with the page.
+        record_index (Union[None, str], optional): SRD index of the record, the page's identity in the write-ahead log. Defaults to None, the URL and title.
+
+    When the client has a write-ahead log the page is created with an idempotency key, and a page
+    the log already has is not created again, so resuming a killed build does not duplicate it.
+    With --update a page built by an earlier run is updated in place instead, see update_page.
+    Without it a page a reused database already holds for the record is kept as it is, so a
+    rerun without the log, or with keys from an older log, does not add a second copy.
+    With --auto_link the names of SRD entities in the text become mentions, see link_entities.
+    With --replicate_to the rendered page is queued for every other workspace, see replicate_page.
 
     """
 
+    # == Rendered once, the replica workspaces get a copy with their own IDs
+    if replicate and getattr(notion, "replicas", None):
+        replicate_page(
+            logger,
+            notion,
+            create_page,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=record_index,
+        )
+
+    page_index = getattr(notion, "page_index", None)
+    wal = getattr(notion, "wal", None)
+    update_pages = getattr(notion, "update_pages", False)
+    known_id = None
+    properties_changed = True
+    if wal:
+        key = wal.page_key(database_id, markdown_properties, record_index)
+        existing_id = wal.page_id(key)
+        if existing_id and update_pages:
+            known_id = existing_id
+            properties_changed = wal.changed(key, markdown_properties)
+        elif existing_id:
+            logger.info(
+                "Page already created with ID: %s",
+                existing_id,
+                extra={"database_id": database_id, "page_id": existing_id},
+            )
+            if page_index:
+                page_index.record_page(
+                    database_id,
+                    page_title(markdown_properties),
+                    existing_id,
+                    srd_index(markdown_properties),
+                )
+            count_page(notion)
+            return existing_id
+        markdown_properties = {**markdown_properties, WAL_PROPERTY: key_property(key)}
+
+    # == Linked after rendering, the mentions point at page IDs and must not end up in the render cache
+    if getattr(notion, "auto_link", False) and page_index:
+        children_properties = link_entities(
+            notion, children_properties, page_title(markdown_properties)
+        )
+
+    # == Update the page built by an earlier run, matched by key and sent its properties only when they changed
+    if update_pages and page_index:
+        if known_id:
+            page_index.claim(known_id)
+        existing_id = known_id or page_index.existing_page(
+            database_id,
+            page_title(markdown_properties),
+            srd_index(markdown_properties),
+        )
+        if existing_id:
+            page_id = update_page(
+                logger,
+                notion,
+                database_id,
+                existing_id,
+                markdown_properties if properties_changed else None,
+                children_properties,
+            )
+            count_page(notion)
+            return page_id
+
+    # == A reused database may already hold the page, matched by SRD index or title
+    if page_index and not update_pages:
+        existing_id = page_index.existing_page(
+            database_id,
+            page_title(markdown_properties),
+            srd_index(markdown_properties),
+        )
+        if existing_id:
+            logger.info(
+                "Page already in the database with ID: %s",
+                existing_id,
+                extra={"database_id": database_id, "page_id": existing_id},
+            )
+            count_page(notion)
+            return existing_id
+
     try:
         # == Sending response to notion API
+        start = perf_counter()
         response = notion.pages.create(
             parent={"database_id": database_id},
             properties=markdown_properties,
-            children=children_properties,
+            children=children_properties[:chunk_size]
+            if chunk_size
+            else children_properties,
         )
-        logger.info(f"Page created with ID: {response['id']}")
+        logger.info(
+            "Page created with ID: %s",
+            response["id"],
+            extra={
+                "database_id": database_id,
+                "page_id": response["id"],
+                "latency_ms": round((perf_counter() - start) * 1000, 1),
+            },
+        )
+        # == Only a page created here gets the rest of its blocks, an existing one was skipped or synced above
+        if chunk_size:
+            for chunk_start in range(chunk_size, len(children_properties), chunk_size):
+                notion.blocks.children.append(
+                    block_id=response["id"],
+                    children=children_properties[
+                        chunk_start : chunk_start + chunk_size
+                    ],
+                )
 
-        sleep(0.5)
+        # == Later pages can link to this one without searching for it
+        if page_index:
+            page_index.record_page(
+                database_id,
+                page_title(markdown_properties),
+                response["id"],
+                srd_index(markdown_properties),
+            )
 
+        write_site_page(notion, response["id"])
+        count_page(notion)
         return response["id"]
 
     except APIResponseError as e:
-        logger.error(f"Response status: {e.status}")
-        logger.error(f"An API error occurred: {e}")
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
+        sys.exit(1)
+
+
+def create_long_page(
+    logger: logging.Logger,
+    notion: Client,
+    database_id: str,
+    markdown_properties: dict,
+    children_properties: list,
+    chunk_size: int = 100,
+    record_index: Union[None, str] = None,
+) -> str:
+    """Create a page with more blocks than a single request takes
+
+    The first chunk_size blocks are sent with the page and the rest appended chunk by chunk, see
+    create_page, a page built by an earlier run is skipped or updated whole. The replica
+    workspaces get the whole page as one upload, so its blocks stay in order there too.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (client): Notion Client object
+        database_id (str): Database ID
+        markdown_properties (dict): Properties for the page
+        children_properties (list): Every block of the page
+        chunk_size (int, optional): Blocks per request, at most Notion's 100. Defaults to 100.
+        record_index (Union[None, str], optional): SRD index of the record, see create_page. Defaults to None.
+
+    Returns:
+        str: The page ID
+    """
+    if getattr(notion, "replicas", None):
+        replicate_page(
+            logger,
+            notion,
+            create_long_page,
+            database_id,
+            markdown_properties,
+            children_properties,
+            chunk_size,
+            record_index=record_index,
+        )
+
+    return create_page(
+        logger,
+        notion,
+        database_id,
+        markdown_properties,
+        children_properties,
+        replicate=False,
+        chunk_size=chunk_size,
+        record_index=record_index,
+    )
+
+
+def submit_page(
+    logger: logging.Logger,
+    notion: Client,
+    database_id: str,
+    markdown_properties: dict,
+    children_properties: list,
+    record_index: Union[None, str] = None,
+) -> None:
+    """Create a page on the client's upload threads, or straight away when it has none
+
+    Builders that do not need the new page's ID use this so the next page can be rendered while
+    Notion answers. main waits for the uploads after each builder.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (client): Notion Client object
+        database_id (str): Database ID
+        markdown_properties (dict): Properties for the page
+        children_properties (list): List of children properties for the page
+        record_index (Union[None, str], optional): SRD index of the record, see create_page. Defaults to None.
+    """
+    uploader = getattr(notion, "uploader", None)
+    if uploader:
+        uploader.submit(
+            create_page,
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=record_index,
+        )
+        return
+    create_page(
+        logger,
+        notion,
+        database_id,
+        markdown_properties,
+        children_properties,
+        record_index=record_index,
+    )
+
+
+def update_page(
+    logger: logging.Logger,
+    notion: Client,
+    database_id: str,
+    page_id: str,
+    markdown_properties: Union[None, dict],
+    children_properties: list,
+) -> str:
+    """Update a page built by an earlier run in place rather than creating it again
+
+    The properties are sent with pages.update and the page content is diffed block by block
+    against children_properties (see src/api/block_diff.py), so only changed blocks cost requests.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (client): Notion Client object
+        database_id (str): Database ID
+        page_id (str): ID of the existing page
+        markdown_properties (Union[None, dict]): Properties for the page, None when they are unchanged
+        children_properties (list): List of children properties for the page
+
+    Returns:
+        str: The page ID
+    """
+    try:
+        start = perf_counter()
+        if markdown_properties is not None:
+            notion.pages.update(page_id=page_id, properties=markdown_properties)
+        counts = sync_children(logger, notion, page_id, children_properties)
+        logger.info(
+            "Page updated with ID: %s -- blocks unchanged: %s, updated: %s, deleted: %s, added: %s",
+            page_id,
+            counts["unchanged"],
+            counts["updated"],
+            counts["deleted"],
+            counts["added"],
+            extra={
+                "database_id": database_id,
+                "page_id": page_id,
+                "latency_ms": round((perf_counter() - start) * 1000, 1),
+            },
+        )
+
+        page_index = getattr(notion, "page_index", None)
+        if page_index and markdown_properties is not None:
+            page_index.record_page(
+                database_id,
+                page_title(markdown_properties),
+                page_id,
+                srd_index(markdown_properties),
+            )
+
+        return page_id
+
+    except APIResponseError as e:
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
         sys.exit(1)
 
 
@@ -120,9 +413,14 @@ def create_database(
     database_id: str,
     database_name: str,
     database_properties: dict,
+    renames: Union[None, dict] = None,
 ) -> str:
     """This function creates a database in Notion. It is used to create the database for the creatures and equipment.
 
+    If the parent page already has a child database with the same title it is reused instead, after
+    migrating it to database_properties (see src/api/schema.py), so repeated and resumed runs fill the
+    same database rather than leaving duplicates behind.
+
     Args:
 
         logger (logging.Logger): Logging object
@@ -130,22 +428,118 @@ def create_database(
         database_id (str): Database ID
         database_name (list): Name of the database
         database_properties (list): Properties for the database
+        renames (Union[None, dict], optional): Old property name -> new name for reused databases. Defaults to None.
+
+    With --replicate_to the database is created or reused in every other workspace first, see
+    replicate_database.
 
     """
 
+    if getattr(notion, "replicas", None):
+        replicate_database(
+            logger, notion, create_database, database_name, database_properties, renames
+        )
+
+    page_index = getattr(notion, "page_index", None)
+
+    # == Pages carry their idempotency key when the build keeps a write-ahead log
+    if getattr(notion, "wal", None):
+        database_properties = {**database_properties, WAL_PROPERTY: {"rich_text": {}}}
+
     try:
+        # == Reuse a database from a previous run when there is one
+        existing_id = find_child_database(logger, notion, database_id, database_name)
+        if existing_id:
+            migrate_database(
+                logger, notion, existing_id, database_name, database_properties, renames
+            )
+            if page_index:
+                page_index.set_database(database_name, existing_id)
+            logger.info(
+                "Reusing %s database with ID: %s",
+                database_name,
+                existing_id,
+                extra={"database_id": existing_id},
+            )
+            return existing_id
+
         # == Sending response to notion API
         response = notion.databases.create(
             parent={"type": "page_id", "page_id": database_id},
             title=[{"type": "text", "text": {"content": f"{database_name}"}}],
             properties=database_properties,
         )
-        logger.info(f"Page created for {database_name} with ID: {response['id']}")
+        logger.info(
+            "Page created for %s with ID: %s",
+            database_name,
+            response["id"],
+            extra={"database_id": response["id"]},
+        )
+        if page_index:
+            page_index.set_database(database_name, response["id"], loaded=True)
 
         # == Returning
         return response["id"]
 
     except APIResponseError as e:
-        logger.error(f"Response status: {e.status}")
-        logger.error(f"An API error occurred: {e}")
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
         sys.exit(1)
+
+
+def find_child_database(
+    logger: logging.Logger,
+    notion: Client,
+    page_id: str,
+    title: str,
+) -> Union[None, str]:
+    """Find a database directly under a page by its title
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (client): Notion Client object
+        page_id (str): The parent page, --database_id
+        title (str): Title of the database, for example "Creatures"
+
+    Returns:
+        Union[None, str]: The database ID, or None when the page has no database with that title
+    """
+    matches = [
+        block["id"]
+        for block in list_child_databases(notion, page_id)
+        if block["child_database"]["title"] == title
+    ]
+
+    if len(matches) > 1:
+        logger.warning(
+            "Found %s databases titled %s, reusing the first: %s",
+            len(matches),
+            title,
+            matches[0],
+        )
+    return matches[0] if matches else None
+
+
+def list_child_databases(notion: Client, page_id: str) -> list:
+    """List the databases directly under a page
+
+    Args:
+        notion (client): Notion Client object
+        page_id (str): The parent page, --database_id
+
+    Returns:
+        list: The child_database blocks, in page order
+    """
+    databases = []
+    start_cursor = None
+    while True:
+        response = notion.blocks.children.list(
+            block_id=page_id, start_cursor=start_cursor, page_size=100
+        )
+        databases.extend(
+            block for block in response["results"] if block["type"] == "child_database"
+        )
+        start_cursor = response.get("next_cursor")
+        if not response.get("has_more") or not start_cursor:
+            break
+    return databases
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+from typing import Union
+
+from src.api.metrics import ApiMetrics
+from src.api.rate_limit import NOTION_REQUESTS_PER_SECOND
+
+# == Seconds Notion usually takes to answer, used when --plan_latencies is not given
+DEFAULT_LATENCY_SECONDS = 0.4
+
+# == Endpoint -> column of the plan, calls to any other endpoint are counted as Other
+PLAN_CATEGORIES = {
+    "POST /pages": "Creates",
+    "POST /databases": "Creates",
+    "PATCH /blocks/{id}/children": "Appends",
+    "POST /search": "Searches",
+    "GET /blocks/{id}/children": "Lists",
+    "POST /databases/{id}/query": "Queries",
+}
+PLAN_COLUMNS = ["Creates", "Appends", "Searches", "Lists", "Queries", "Other"]
+
+
+def load_latencies(metrics_file: str) -> dict:
+    """Average latency per endpoint from the metrics JSON of an earlier run
+
+    Args:
+        metrics_file (str): A logs/<timestamp>-metrics.json written by a build against Notion
+
+    Returns:
+        dict: Endpoint -> average seconds per call
+    """
+    with open(metrics_file, "r") as f:
+        groups = json.load(f)["calls"]
+
+    totals = {}
+    for group in groups:
+        calls, seconds = totals.get(group["endpoint"], (0, 0.0))
+        totals[group["endpoint"]] = (
+            calls + group["calls"],
+            seconds + group["latency_ms"]["total"] / 1000,
+        )
+    return {
+        endpoint: seconds / calls
+        for endpoint, (calls, seconds) in totals.items()
+        if calls
+    }
+
+
+class BuildPlan:
+    """Estimate of a build from the calls it made against the in-process stand-in
+
+    The build runs offline exactly as it would against Notion, so every create, append, search,
+    list and query is counted with its payload. Wall time is estimated per builder as the longer
+    of two bounds, the calls at Notion's average rate per integration and the time the calls
+    spend waiting on Notion spread over the calls in flight. Builders run one after the other,
+    so the total is their sum. Retries after 429s are not included.
+
+    Args:
+        metrics (ApiMetrics): The calls of the offline build
+        tokens (int, optional): Integrations the build is spread over. Defaults to 1.
+        concurrency (int, optional): Calls in flight per integration. Defaults to 4.
+        latencies (Union[None, dict], optional): Endpoint -> seconds per call, see load_latencies.
+            Defaults to DEFAULT_LATENCY_SECONDS for every endpoint.
+
+    Example:
+        plan = BuildPlan(notion.metrics, len(args.auth_key), args.max_concurrency)
+        plan.log(logger)
+        plan.write("logs/plan.json")
+    """
+
+    def __init__(
+        self,
+        metrics: ApiMetrics,
+        tokens: int = 1,
+        concurrency: int = 4,
+        latencies: Union[None, dict] = None,
+    ) -> None:
+        self.metrics = metrics
+        self.tokens = max(1, tokens)
+        self.concurrency = max(1, concurrency)
+        self.latencies = latencies or {}
+
+    def rows(self) -> list:
+        """The calls, bytes and estimated seconds of each builder
+
+        Returns:
+            list: One dict per builder, in the order they were built
+        """
+        rows = {}
+        for group in self.metrics.snapshot():
+            row = rows.setdefault(
+                group["builder"],
+                {
+                    "builder": group["builder"],
+                    "databases": [],
+                    **{column: 0 for column in PLAN_COLUMNS},
+                    "calls": 0,
+                    "bytes_sent": 0,
+                    "latency_s": 0.0,
+                },
+            )
+            # == Calls made before the database is created or found are not tagged with it
+            if group["database"] and group["database"] not in row["databases"]:
+                row["databases"].append(group["database"])
+            row[PLAN_CATEGORIES.get(group["endpoint"], "Other")] += group["calls"]
+            row["calls"] += group["calls"]
+            row["bytes_sent"] += group["bytes_sent"]
+            row["latency_s"] += group["calls"] * self.latencies.get(
+                group["endpoint"], DEFAULT_LATENCY_SECONDS
+            )
+
+        for row in rows.values():
+            rate_seconds = row["calls"] / (NOTION_REQUESTS_PER_SECOND * self.tokens)
+            latency_seconds = row["latency_s"] / (self.concurrency * self.tokens)
+            row["estimate_s"] = max(rate_seconds, latency_seconds)
+            row["bound"] = "rate" if rate_seconds >= latency_seconds else "latency"
+        return list(rows.values())
+
+    def log(self, logger: logging.Logger) -> None:
+        """Log the plan as a table with the totals
+
+        Args:
+            logger (logging.Logger): Logging object
+        """
+        rows = self.rows()
+        logger.info("=========================================================")
+        logger.info("==  Build plan")
+        logger.info("=========================================================")
+        logger.info(
+            f"{'Builder':<18} {'Databases':<18} "
+            + " ".join(f"{column:>8}" for column in PLAN_COLUMNS)
+            + f" {'KB sent':>9} {'Estimate':>9} {'Bound':>7}"
+        )
+        for row in rows:
+            logger.info(
+                f"{str(row['builder']):<18.18} {', '.join(row['databases']):<18.18} "
+                + " ".join(f"{row[column]:>8}" for column in PLAN_COLUMNS)
+                + f" {row['bytes_sent'] / 1024:>9.1f} "
+                f"{format_duration(row['estimate_s']):>9} {row['bound']:>7}"
+            )
+
+        calls = sum(row["calls"] for row in rows)
+        logger.info(
+            f"==  Total: {calls} calls, "
+            f"{sum(row['bytes_sent'] for row in rows) / 1024:.1f} KB sent, about "
+            f"{format_duration(sum(row['estimate_s'] for row in rows))} with {self.tokens} "
+            f"integration{'s' if self.tokens > 1 else ''} at {NOTION_REQUESTS_PER_SECOND:g} "
+            f"requests per second and {self.concurrency} calls in flight each"
+        )
+        logger.info(
+            "==  Latency: %s",
+            "from the earlier run's metrics"
+            if self.latencies
+            else f"{DEFAULT_LATENCY_SECONDS}s per call, pass --plan_latencies for measured values",
+        )
+
+    def write(self, file_path: str) -> None:
+        """Write the plan to a JSON file
+
+        Args:
+            file_path (str): Where to write the plan
+        """
+        rows = self.rows()
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "w") as f:
+            json.dump(
+                {
+                    "tokens": self.tokens,
+                    "concurrency": self.concurrency,
+                    "requests_per_second": NOTION_REQUESTS_PER_SECOND,
+                    "latencies_s": self.latencies,
+                    "totals": {
+                        "calls": sum(row["calls"] for row in rows),
+                        "bytes_sent": sum(row["bytes_sent"] for row in rows),
+                        "estimate_s": sum(row["estimate_s"] for row in rows),
+                    },
+                    "builders": rows,
+                },
+                f,
+                indent=2,
+            )
+
+
+def format_duration(seconds: float) -> str:
+    """A number of seconds as hours, minutes and seconds
+
+    Args:
+        seconds (float): The duration
+
+    Returns:
+        str: For example "1h 05m", "3m 20s" or "12s"
+    """
+    seconds = round(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
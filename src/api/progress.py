@@ -0,0 +1,266 @@
+import logging
+import shutil
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, TextIO, Union
+
+from src.api.plan import format_duration
+from src.utils.logger import CONSOLE
+
+if TYPE_CHECKING:
+    from src.api.client import NotionClient
+    from src.utils.search_index import SearchIndex
+
+PROGRESS_MODES = ["auto", "live", "plain", "off"]
+# == Seconds between redraws of the live line
+LIVE_INTERVAL_SECONDS = 0.5
+# == Seconds between status lines when the output is not a terminal
+PLAIN_INTERVAL_SECONDS = 10
+BAR_WIDTH = 20
+# == Erases the current terminal line, so the live line can be redrawn or a log line printed
+CLEAR_LINE = "\r\x1b[K"
+
+
+class BuildProgress:
+    """Pages built for the current database, with throughput, concurrency, retries and an ETA
+
+    Driven by the pipeline's own counters: main sets the number of records selected for each
+    builder, create_page counts every page it creates, updates or finds in the write-ahead log,
+    and the calls in flight and retries are read from the client. In live mode a status line is
+    redrawn in place on the terminal and the console only shows warnings and errors, the log file
+    still gets every line. In plain mode, for CI and redirected output, the status is logged every
+    PLAIN_INTERVAL_SECONDS instead. Either way a summary is logged when a database is done.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (NotionClient): The client, for its concurrency controller or token pool and metrics
+        live (bool): Redraw a line on the terminal instead of logging the status
+        stream (Union[None, TextIO], optional): The terminal. Defaults to sys.stderr.
+
+    Example:
+        notion.progress = BuildProgress(logger, notion, live=sys.stderr.isatty())
+        notion.progress.start("spells", 319)
+        ...
+        notion.progress.finish()
+        notion.progress.close()
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        notion: "NotionClient",
+        live: bool,
+        stream: Union[None, TextIO] = None,
+    ) -> None:
+        self.logger = logger
+        self.notion = notion
+        self.live = live
+        self.stream = stream or sys.stderr
+        self.lock = threading.Lock()
+        self.name = None
+        self.total = 0
+        self.completed = 0
+        self.started = time.monotonic()
+        self.stopped = threading.Event()
+        self.thread = None
+
+        handler = CONSOLE.get("handler")
+        self.console_level = handler.level if handler else logging.NOTSET
+        if live and handler:
+            handler.setLevel(logging.WARNING)
+            handler.setStream(_LineClearingStream(handler.stream))
+            # == The summaries are printed with the live line, the console skips their log record
+            handler.addFilter(_skip_progress_summary)
+
+    def start(self, name: str, total: int) -> None:
+        """Start counting the pages of a database
+
+        Args:
+            name (str): The builder, for example "spells"
+            total (int): Pages expected, the records selected for the builder
+        """
+        with self.lock:
+            self.name = name
+            self.total = total
+            self.completed = 0
+            self.started = time.monotonic()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self.thread.start()
+
+    def set_total(self, total: int) -> None:
+        """Correct the pages expected, for builders making pages from part of their file
+
+        Args:
+            total (int): Pages expected
+        """
+        with self.lock:
+            self.total = total
+
+    def complete(self) -> None:
+        """Count a page as done, called from any upload thread"""
+        with self.lock:
+            self.completed += 1
+
+    def finish(self) -> None:
+        """Stop the status updates and log a summary of the database"""
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        summary = self.status(final=True)
+        if self.live:
+            self.stream.write(f"{CLEAR_LINE}{summary}\n")
+            self.stream.flush()
+        self.logger.info("==  %s", summary, extra={"progress_summary": True})
+
+    def close(self) -> None:
+        """Stop the status updates and give the console back to the log, also when a builder fails
+
+        Safe to call more than once.
+        """
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+            # == A build stopped part way leaves its live line behind
+            if self.live:
+                self.stream.write(CLEAR_LINE)
+                self.stream.flush()
+
+        handler = CONSOLE.get("handler")
+        if self.live and handler:
+            handler.setLevel(self.console_level)
+            if isinstance(handler.stream, _LineClearingStream):
+                handler.setStream(handler.stream.stream)
+            handler.removeFilter(_skip_progress_summary)
+
+    def status(self, final: bool = False) -> str:
+        """The status of the current database
+
+        Args:
+            final (bool, optional): The summary when the database is done. Defaults to False.
+
+        Returns:
+            str: For example "spells 120/319 pages, 4.2 pages/s, 3/4 in flight, 2 retries, ETA 47s"
+        """
+        with self.lock:
+            name, total, completed = self.name, self.total, self.completed
+            elapsed = max(time.monotonic() - self.started, 0.001)
+        rate = completed / elapsed
+        retries = self.notion.metrics.totals(name)["retries"]
+        if final:
+            return (
+                f"{name} {completed} pages in {format_duration(elapsed)}, "
+                f"{rate:.1f} pages/s, {retries} retries"
+            )
+
+        in_flight, limit = self.concurrency()
+        remaining = max(total - completed, 0)
+        eta = format_duration(remaining / rate) if rate else "--"
+        return (
+            f"{name} {completed}/{total} pages, {rate:.1f} pages/s, "
+            f"{in_flight}/{limit} in flight, {retries} retries, ETA {eta}"
+        )
+
+    def concurrency(self) -> tuple:
+        """Calls in flight and the limit, summed over the tokens of a pool
+
+        Returns:
+            tuple: (calls in flight, limit)
+        """
+        if self.notion.tokens:
+            controllers = [token.concurrency for token in self.notion.tokens.usable()]
+        elif self.notion.concurrency:
+            controllers = [self.notion.concurrency]
+        else:
+            controllers = []
+        return (
+            sum(controller.in_flight for controller in controllers),
+            sum(int(controller.limit) for controller in controllers),
+        )
+
+    def _run(self) -> None:
+        interval = LIVE_INTERVAL_SECONDS if self.live else PLAIN_INTERVAL_SECONDS
+        while not self.stopped.wait(interval):
+            if self.live:
+                self._draw()
+            else:
+                self.logger.info("==  Progress: %s", self.status())
+
+    def _draw(self) -> None:
+        with self.lock:
+            total, completed = self.total, self.completed
+        filled = BAR_WIDTH * min(completed, total) // total if total else 0
+        line = f"[{'#' * filled}{'-' * (BAR_WIDTH - filled)}] {self.status()}"
+        # == A line wider than the terminal wraps, and the carriage return only clears the last row
+        width = shutil.get_terminal_size().columns - 1
+        self.stream.write(f"{CLEAR_LINE}{line[:width]}")
+        self.stream.flush()
+
+
+def _skip_progress_summary(record: logging.LogRecord) -> bool:
+    return not getattr(record, "progress_summary", False)
+
+
+class _LineClearingStream:
+    # == Log lines are printed over the live line, it is drawn again on the next tick
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        return self.stream.write(f"{CLEAR_LINE}{text}")
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def record_total(
+    search_index: "SearchIndex",
+    json_file: str,
+    where: Union[None, str],
+    start: int,
+    end: Union[None, int],
+) -> int:
+    """The records a builder makes pages from, after --where and the start and end range
+
+    Args:
+        search_index (SearchIndex): The offline SRD index
+        json_file (str): The builder's file
+        where (Union[None, str]): The --where query
+        start (int): --start_range
+        end (Union[None, int]): --end_range
+
+    Returns:
+        int: The number of records
+    """
+    records = (
+        len(search_index.select(json_file, where))
+        if where
+        else search_index.count(json_file)
+    )
+    return len(range(records)[start:end])
+
+
+def set_progress_total(notion: "NotionClient", total: int) -> None:
+    """Correct the pages expected for the current database, when the client shows progress
+
+    Args:
+        notion (NotionClient): The client
+        total (int): Pages expected
+    """
+    progress = getattr(notion, "progress", None)
+    if progress:
+        progress.set_total(total)
+
+
+def count_page(notion: "NotionClient") -> None:
+    """Count a finished page, when the client shows progress
+
+    Args:
+        notion (NotionClient): The client the page was made with
+    """
+    progress = getattr(notion, "progress", None)
+    if progress:
+        progress.complete()
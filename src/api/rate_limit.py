@@ -0,0 +1,51 @@
+import threading
+import time
+
+# == Notion allows an average of three requests per second per integration
+NOTION_REQUESTS_PER_SECOND = 3.0
+
+
+class TokenBucket:
+    """Client side token bucket keeping requests under Notion's average rate limit.
+
+    Shared by every thread using the client, so concurrent callers queue for tokens instead of all
+    sending at once and being answered with 429s.
+
+    Args:
+        rate (float): Requests per second allowed on average
+        burst (int, optional): Requests that can be sent back to back. Defaults to 1.
+
+    Example:
+        notion = NotionClient(auth=args.auth_key, rate_limiter=TokenBucket(args.rate))
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Wait for a token
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+
+                delay = (1 - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
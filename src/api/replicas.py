@@ -0,0 +1,198 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Union
+
+if TYPE_CHECKING:
+    from src.api.client import NotionClient
+    from src.utils.page_index import PageIndex
+
+
+def replicate_database(
+    logger: logging.Logger,
+    notion: "NotionClient",
+    create: Callable,
+    database_name: str,
+    database_properties: dict,
+    renames: Union[None, dict] = None,
+) -> None:
+    """Create or reuse a database in every replica workspace at the same time
+
+    Each replica runs create, normally create_database, under its own parent page, with the
+    relation properties pointing at its own databases. Waits for all of them, pages cannot be
+    copied before their database exists.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (NotionClient): The primary client, with the replica clients in notion.replicas
+        create (Callable): The function creating the database on one client
+        database_name (str): Title of the database
+        database_properties (dict): The schema, as sent for the primary workspace
+        renames (Union[None, dict], optional): Old property name -> new name. Defaults to None.
+    """
+    replicas = notion.replicas
+
+    def create_on(replica: "NotionClient") -> str:
+        properties = translate(
+            notion.page_index, replica.page_index, database_properties
+        )
+        return create(
+            logger,
+            replica,
+            replica.page_index.parent_id,
+            database_name,
+            properties,
+            renames,
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=len(replicas), thread_name_prefix="replica"
+    ) as executor:
+        list(executor.map(create_on, replicas))
+
+
+def replicate_page(
+    logger: logging.Logger,
+    notion: "NotionClient",
+    create: Callable,
+    database_id: str,
+    markdown_properties: dict,
+    children_properties: list,
+    *args: Any,
+    **kwargs: Any,
+) -> None:
+    """Queue a rendered page on the upload threads of every replica workspace
+
+    The page is rendered once for the primary workspace. Each replica's threads translate the
+    database, mention and relation IDs to that workspace just before the upload, so pages the
+    replica created in the meantime can be linked, and each replica uploads at the pace its own
+    concurrency controller allows.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (NotionClient): The primary client, with the replica clients in notion.replicas
+        create (Callable): The function creating the page on one client, create_page or create_long_page
+        database_id (str): The primary workspace's database
+        markdown_properties (dict): Properties for the page
+        children_properties (list): Blocks for the page
+        *args: Passed on to create after the blocks
+        **kwargs: Passed on to create, for example record_index
+    """
+    for replica in notion.replicas:
+        replica.uploader.submit(
+            _create_replica_page,
+            logger,
+            notion.page_index,
+            replica,
+            create,
+            database_id,
+            markdown_properties,
+            children_properties,
+            *args,
+            **kwargs,
+        )
+
+
+def _create_replica_page(
+    logger: logging.Logger,
+    primary_index: "PageIndex",
+    replica: "NotionClient",
+    create: Callable,
+    database_id: str,
+    markdown_properties: dict,
+    children_properties: list,
+    *args: Any,
+    **kwargs: Any,
+) -> None:
+    location = primary_index.locate(database_id)
+    replica_database = location and replica.page_index.database_id(location[0])
+    if not replica_database:
+        logger.error(
+            "No %s database in the replica under %s",
+            location[0] if location else database_id,
+            replica.page_index.parent_id,
+        )
+        return
+    create(
+        logger,
+        replica,
+        replica_database,
+        translate(primary_index, replica.page_index, markdown_properties),
+        translate(primary_index, replica.page_index, children_properties),
+        *args,
+        **kwargs,
+    )
+
+
+def translate(
+    source: "PageIndex", target: "PageIndex", value: Union[dict, list, Any]
+) -> Union[dict, list, Any]:
+    """Rewrite the page and database IDs in a payload from one workspace to another
+
+    IDs are looked up in the source index and found again by title in the target index. A
+    mention of a page the target does not have becomes its title as plain text, a relation to
+    one is left out, and a relation property to a database the target does not have is dropped.
+
+    Args:
+        source (PageIndex): Index of the workspace the payload was built for
+        target (PageIndex): Index of the workspace it is sent to
+        value (Union[dict, list, Any]): Properties, blocks or a database schema
+
+    Returns:
+        Union[dict, list, Any]: A translated copy
+    """
+    if isinstance(value, list):
+        translated = []
+        for item in value:
+            if isinstance(item, dict) and set(item) == {"id"}:
+                # == A relation entry, kept only when the target has the page
+                target_id = _translate_id(source, target, item["id"])
+                if target_id:
+                    translated.append({"id": target_id})
+                continue
+            translated.append(translate(source, target, item))
+        return translated
+
+    if not isinstance(value, dict):
+        return value
+
+    if value.get("type") == "mention":
+        mention = value.get("mention") or {}
+        kind = "page" if "page" in mention else "database"
+        mentioned = (mention.get(kind) or {}).get("id")
+        if mentioned:
+            target_id = _translate_id(source, target, mentioned)
+            if target_id:
+                return {**value, "mention": {kind: {"id": target_id}}}
+            location = source.locate(mentioned)
+            text = (location[1] or location[0]) if location else ""
+            run = {"type": "text", "text": {"content": text}}
+            if value.get("annotations"):
+                run["annotations"] = value["annotations"]
+            return run
+
+    translated = {}
+    for key, item in value.items():
+        relation = item.get("relation") if isinstance(item, dict) else None
+        if isinstance(relation, dict) and "database_id" in relation:
+            # == A relation property of a schema, pointing at the target's database
+            target_id = _translate_id(source, target, relation["database_id"])
+            if target_id:
+                translated[key] = {
+                    **item,
+                    "relation": {**relation, "database_id": target_id},
+                }
+            continue
+        translated[key] = translate(source, target, item)
+    return translated
+
+
+def _translate_id(
+    source: "PageIndex", target: "PageIndex", object_id: str
+) -> Union[None, str]:
+    location = source.locate(object_id)
+    if location is None:
+        return None
+    database_title, page_title = location
+    if page_title is None:
+        return target.database_id(database_title)
+    return target.page_id(database_title, page_title)
@@ -0,0 +1,288 @@
+import sys
+import logging
+from typing import Callable, Union
+from notion_client import Client
+from notion_client.errors import APIResponseError
+from src.utils.wal import WAL_PROPERTY
+
+# == Property types whose database query filters support is_empty
+EMPTY_FILTER_TYPES = {
+    "title",
+    "rich_text",
+    "number",
+    "select",
+    "multi_select",
+    "url",
+    "date",
+    "relation",
+    "email",
+    "phone_number",
+    "files",
+    "people",
+}
+
+# == Properties added to a reused database during this run, keyed by database ID, waiting to be
+# == back-filled on the pages built by a previous run
+MIGRATED_PROPERTIES = {}
+
+
+def diff_schema(
+    logger: logging.Logger,
+    database_name: str,
+    live_properties: dict,
+    schema: dict,
+    renames: Union[None, dict] = None,
+) -> tuple[dict, dict]:
+    """Work out the smallest databases.update that brings a live database up to a schema
+
+    The schema is the properties dict a builder creates its database with. Renamed properties
+    keep their values on existing pages, missing properties are added and missing select and
+    multi_select options are appended to the existing ones. Properties are never removed, and
+    a property whose type has changed is left as it is with a warning, as converting it could
+    lose data on existing pages.
+
+    Args:
+        logger (logging.Logger): Logging object
+        database_name (str): Name of the database, for logging
+        live_properties (dict): Properties of the live database from databases.retrieve
+        schema (dict): Properties the builder creates the database with
+        renames (Union[None, dict], optional): Old property name -> new name. Defaults to None.
+
+    Returns:
+        tuple[dict, dict]: Properties for databases.update, empty when the database is up to date,
+            and the added properties with their types
+
+    Example:
+        updates, added = diff_schema(logger, "Spells", live["properties"], schema, {"Time": "Casting Time"})
+    """
+    live = dict(live_properties)
+    updates = {}
+    added = {}
+
+    # == Payload key of each property, renamed properties are still addressed by their old name
+    payload_key = {}
+    for old, new in (renames or {}).items():
+        if old in live and new not in live:
+            updates[old] = {"name": new}
+            live[new] = live.pop(old)
+            payload_key[new] = old
+
+    # == There is only ever one title property, follow the schema if it was renamed
+    live_title = next((n for n, p in live.items() if p["type"] == "title"), None)
+    schema_title = next((n for n, c in schema.items() if "title" in c), None)
+    if live_title and schema_title and live_title != schema_title:
+        if schema_title not in live:
+            updates[live_title] = {"name": schema_title}
+            live[schema_title] = live.pop(live_title)
+
+    for name, config in schema.items():
+        kind = next(iter(config))
+        existing = live.get(name)
+
+        if existing is None:
+            updates[name] = config
+            added[name] = kind
+            continue
+
+        if existing["type"] != kind:
+            logger.warning(
+                "%s property %s is %s in Notion but %s in the build, leaving it unchanged",
+                database_name,
+                name,
+                existing["type"],
+                kind,
+            )
+            continue
+
+        if kind not in ("select", "multi_select"):
+            continue
+
+        current = existing[kind].get("options", [])
+        known = {option["name"] for option in current}
+        missing = [
+            option
+            for option in config[kind].get("options", [])
+            if option["name"] not in known
+        ]
+        if missing:
+            key = payload_key.get(name, name)
+            updates.setdefault(key, {})[kind] = {
+                "options": [
+                    {k: option[k] for k in ("name", "color") if k in option}
+                    for option in current
+                ]
+                + missing
+            }
+
+    return updates, added
+
+
+def migrate_database(
+    logger: logging.Logger,
+    notion: Client,
+    database_id: str,
+    database_name: str,
+    schema: dict,
+    renames: Union[None, dict] = None,
+) -> None:
+    """Bring a reused database up to the builder's schema
+
+    Properties that were added are remembered in MIGRATED_PROPERTIES so the builder can back-fill
+    them on the pages a previous run created, see backfill_pages.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        database_id (str): ID of the existing database
+        database_name (str): Name of the database
+        schema (dict): Properties the builder creates the database with
+        renames (Union[None, dict], optional): Old property name -> new name. Defaults to None.
+    """
+    live = notion.databases.retrieve(database_id=database_id)
+    updates, added = diff_schema(
+        logger, database_name, live["properties"], schema, renames
+    )
+    if not updates:
+        return
+
+    notion.databases.update(database_id=database_id, properties=updates)
+    renamed = [
+        f"{name} -> {change['name']}"
+        for name, change in updates.items()
+        if "name" in change
+    ]
+    options = [
+        name
+        for name, change in updates.items()
+        if "name" not in change and name not in added
+    ]
+    logger.info(
+        "Migrated %s schema -- added: %s -- renamed: %s -- new options: %s",
+        database_name,
+        ", ".join(added) or "none",
+        ", ".join(renamed) or "none",
+        ", ".join(options) or "none",
+        extra={"database_id": database_id},
+    )
+    # == The build key is only ever written when a page is created, there is nothing to back-fill
+    added.pop(WAL_PROPERTY, None)
+    if added:
+        MIGRATED_PROPERTIES[database_id] = added
+
+
+def migrated_properties(database_id: str) -> dict:
+    """The properties added to a database this run that still need back-filling
+
+    Args:
+        database_id (str): ID of the database
+
+    Returns:
+        dict: Property name -> type, empty when nothing was added
+    """
+    return MIGRATED_PROPERTIES.get(database_id, {})
+
+
+def backfill_pages(
+    logger: logging.Logger,
+    notion: Client,
+    database_id: str,
+    records: list,
+    render_properties: Callable[[dict], dict],
+) -> int:
+    """Fill in the properties added by migrate_database on pages built by a previous run
+
+    Only pages where one of the new properties is empty are fetched, they are matched to their
+    SRD record by name and re-rendered, and only the new properties are sent with pages.update.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        database_id (str): ID of the database
+        records (list): The SRD records the database is built from
+        render_properties (Callable[[dict], dict]): Builds the page properties for a record
+
+    Returns:
+        int: Number of pages updated
+
+    Example:
+        if migrated_properties(spells_db_id):
+            backfill_pages(logger, notion, spells_db_id, spells_data,
+                           lambda x: spells_properties(_spell(**x)))
+    """
+    added = MIGRATED_PROPERTIES.pop(database_id, {})
+    if not added:
+        return 0
+
+    # == Ask Notion for just the pages missing a new value when every type can be filtered
+    query_filter = None
+    if all(kind in EMPTY_FILTER_TYPES for kind in added.values()):
+        query_filter = {
+            "or": [
+                {"property": name, kind: {"is_empty": True}}
+                for name, kind in added.items()
+            ]
+        }
+
+    records_by_name = {record["name"]: record for record in records}
+    updated = 0
+    try:
+        # == Collect the pages first, updating them changes which pages match the filter
+        pages = []
+        start_cursor = None
+        while True:
+            query = {"database_id": database_id, "page_size": 100}
+            if query_filter:
+                query["filter"] = query_filter
+            if start_cursor:
+                query["start_cursor"] = start_cursor
+            response = notion.databases.query(**query)
+            pages.extend(response["results"])
+
+            start_cursor = response.get("next_cursor")
+            if not response.get("has_more") or not start_cursor:
+                break
+
+        for page in pages:
+            record = records_by_name.get(_page_title(page))
+            if record is None:
+                continue
+
+            properties = render_properties(record)
+            changes = {
+                name: properties[name]
+                for name in added
+                if name in properties
+                and not _is_empty(properties[name])
+                and _is_empty(page["properties"].get(name))
+            }
+            if changes:
+                notion.pages.update(page_id=page["id"], properties=changes)
+                updated += 1
+
+    except APIResponseError as e:
+        logger.error("Response status: %s", e.status)
+        logger.error("An API error occurred: %s", e)
+        sys.exit(1)
+
+    logger.info(
+        "Back-filled %s on %s pages",
+        ", ".join(added),
+        updated,
+        extra={"database_id": database_id},
+    )
+    return updated
+
+
+def _page_title(page: dict) -> str:
+    for value in page["properties"].values():
+        if value.get("type") == "title" or "title" in value:
+            return "".join(run.get("plain_text", "") for run in value.get("title", []))
+    return ""
+
+
+def _is_empty(value: Union[None, dict]) -> bool:
+    if not value:
+        return True
+    kind = value.get("type") or next(key for key in value if key != "id")
+    content = value.get(kind)
+    return content is None or content == [] or content == "" or content is False
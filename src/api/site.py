@@ -0,0 +1,507 @@
+import html
+import logging
+import os
+import re
+from typing import TYPE_CHECKING, Callable, Union
+from urllib.parse import quote
+
+from src.api.export import (
+    file_name,
+    item_title,
+    object_key,
+    property_text,
+    reset_output_directory,
+    unique_name,
+)
+from src.api.stub_server import NotionStub
+
+if TYPE_CHECKING:
+    from src.api.client import NotionClient
+from src.utils.wal import WAL_PROPERTY
+
+STYLESHEET = """body { font-family: system-ui, sans-serif; max-width: 60rem; margin: 2rem auto; padding: 0 1rem; line-height: 1.5; color: #37352f; }
+a { color: #2e7cb8; }
+table { border-collapse: collapse; margin: 1rem 0; }
+th, td { border: 1px solid #ddd; padding: 0.3rem 0.6rem; text-align: left; vertical-align: top; }
+th { background: #f7f6f3; }
+aside, blockquote { background: #f7f6f3; border-left: 3px solid #ccc; margin: 1rem 0; padding: 0.5rem 1rem; }
+details { margin: 0.5rem 0; }
+summary { cursor: pointer; }
+nav.breadcrumbs { font-size: 0.9rem; margin-bottom: 1rem; }
+"""
+
+LIST_TAGS = {"bulleted_list_item": "ul", "numbered_list_item": "ol"}
+
+ANNOTATION_TAGS = (
+    ("code", "code"),
+    ("bold", "strong"),
+    ("italic", "em"),
+    ("strikethrough", "s"),
+    ("underline", "u"),
+)
+
+
+class SiteWriter:
+    """Writes the pages a build makes in the in-process stand-in as a static HTML site
+
+    Each page is written as soon as create_page has made it, see write_site_page, and its blocks
+    are then dropped from the stand-in, so memory only holds the pages being uploaded however
+    many databases are built. Titles and properties are kept and mentions of other pages become
+    relative links. Called after each builder, flush() writes the index page of every database
+    that got new pages, a table of its pages with their properties, and finish() writes the home
+    page linking the databases.
+
+    Args:
+        logger (logging.Logger): Logging object
+        stub (NotionStub): The stand-in the build fills
+        parent_id (str): The parent page the databases are built under
+        output_directory (str): Where to write the site, emptied first, see reset_output_directory
+        force (bool, optional): Empty the directory even if an earlier build did not write it. Defaults to False.
+
+    Example:
+        notion.site = SiteWriter(logger, stub, args.database_id, args.site)
+        ...  # == after each builder
+        notion.site.flush()
+        ...
+        notion.site.finish()
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        stub: NotionStub,
+        parent_id: str,
+        output_directory: str,
+        force: bool = False,
+    ) -> None:
+        self.logger = logger
+        self.stub = stub
+        self.parent_key = object_key(parent_id)
+        self.output_directory = output_directory
+        # == Page or database key -> path in the site, the only per page state kept
+        self.paths = {}
+        self.names = {}
+        # == Databases with pages written since their index page was
+        self.updated = set()
+        self.indexed = set()
+        self.page_count = 0
+
+        reset_output_directory(output_directory, force)
+        with open(os.path.join(output_directory, "style.css"), "w") as f:
+            f.write(STYLESHEET)
+
+    def write(self, page_id: str) -> None:
+        """Write a page that has all its blocks, then drop the blocks from the stand-in
+
+        Args:
+            page_id (str): ID of the page
+        """
+        page_key = object_key(page_id)
+        with self.stub.lock:
+            page = self.stub.pages.get(page_key)
+            if not page or not self.path(page_key):
+                return
+            self.write_page(page)
+            self.evict(page_key)
+            self.updated.add(object_key(page["parent"]["database_id"]))
+
+    def flush(self) -> None:
+        """Write the index pages of the databases that got pages since the last flush"""
+        with self.stub.lock:
+            for database in self.databases():
+                database_key = object_key(database["id"])
+                if database_key in self.updated:
+                    self.write_index(database)
+                    self.indexed.add(database_key)
+            self.updated.clear()
+
+    def path(self, key: str) -> Union[None, str]:
+        """The path in the site of a page or database, given one the first time it is asked for
+
+        Pages get their path before they are written, so a page can link one being uploaded on
+        another thread.
+
+        Args:
+            key (str): Key of the page or database
+
+        Returns:
+            Union[None, str]: The path from the site root, None for anything outside the databases
+        """
+        with self.stub.lock:
+            if key in self.paths:
+                return self.paths[key]
+            if key in self.stub.databases:
+                folder = file_name(item_title(self.stub.databases[key]))
+                self.paths[key] = f"{folder}/index.html"
+                self.names[key] = set()
+                return self.paths[key]
+
+            page = self.stub.pages.get(key)
+            database_id = page and page["parent"].get("database_id")
+            database_path = database_id and self.path(object_key(database_id))
+            if not database_path:
+                return None
+            database_key = object_key(database_id)
+            name = unique_name(file_name(item_title(page)), self.names[database_key])
+            self.paths[key] = f"{os.path.dirname(database_path)}/{name}.html"
+            return self.paths[key]
+
+    def finish(self) -> str:
+        """Write the home page linking every database
+
+        Returns:
+            str: Path of the home page
+        """
+        databases = [
+            database
+            for database in self.databases()
+            if object_key(database["id"]) in self.indexed
+        ]
+        items = "".join(
+            f'<li><a href="{quote(self.paths[object_key(database["id"])])}">'
+            f"{html.escape(item_title(database))}</a></li>"
+            for database in databases
+        )
+        home = os.path.join(self.output_directory, "index.html")
+        with open(home, "w", encoding="utf-8") as f:
+            f.write(document("D&D 5E SRD", "style.css", f"<ul>{items}</ul>"))
+
+        self.logger.info(
+            "Wrote %s pages in %s databases to %s",
+            self.page_count,
+            len(databases),
+            home,
+        )
+        return home
+
+    def databases(self) -> list:
+        """The databases under the parent page, in the order they were created
+
+        Returns:
+            list: The stub databases
+        """
+        return [
+            self.stub.databases[block_key]
+            for block_key in self.stub.children.get(self.parent_key, [])
+            if block_key in self.stub.databases
+        ]
+
+    def pages(self, database_key: str) -> list:
+        """The pages of a database, in the order they were created
+
+        Args:
+            database_key (str): Key of the database
+
+        Returns:
+            list: The stub pages
+        """
+        return [
+            page
+            for page in self.stub.pages.values()
+            if not page["archived"]
+            and page["parent"].get("database_id")
+            and object_key(page["parent"]["database_id"]) == database_key
+        ]
+
+    def write_page(self, page: dict) -> None:
+        """Write the HTML file of a page
+
+        Args:
+            page (dict): The stub page
+        """
+        path = self.path(object_key(page["id"]))
+        database_key = object_key(page["parent"]["database_id"])
+        renderer = HtmlRenderer(self.stub, self.path, path)
+        title = item_title(page)
+        breadcrumbs = (
+            f'<nav class="breadcrumbs"><a href="{renderer.link(self.path(database_key))}">'
+            f"{html.escape(item_title(self.stub.databases[database_key]))}</a></nav>"
+        )
+        body = breadcrumbs + renderer.blocks(object_key(page["id"]))
+
+        full_path = os.path.join(self.output_directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(document(title, renderer.link("style.css"), body))
+        self.page_count += 1
+
+    def write_index(self, database: dict) -> None:
+        """Write the index page of a database, a table of its pages and their properties
+
+        Args:
+            database (dict): The stub database
+        """
+        database_key = object_key(database["id"])
+        path = self.path(database_key)
+        renderer = HtmlRenderer(self.stub, self.path, path)
+        columns = [
+            name
+            for name in sorted(
+                database["properties"],
+                key=lambda name: database["properties"][name]["type"] != "title",
+            )
+            if name != WAL_PROPERTY
+        ]
+
+        rows = []
+        for page in self.pages(database_key):
+            cells = [
+                html.escape(property_text(self.stub, page["properties"].get(name)))
+                for name in columns
+            ]
+            cells[0] = (
+                f'<a href="{renderer.link(self.path(object_key(page["id"])))}">'
+                f"{cells[0]}</a>"
+            )
+            rows.append(
+                "<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>"
+            )
+
+        header = "".join(f"<th>{html.escape(name)}</th>" for name in columns)
+        body = (
+            f'<nav class="breadcrumbs"><a href="{renderer.link("index.html")}">Home</a></nav>'
+            f"<table><thead><tr>{header}</tr></thead><tbody>{''.join(rows)}</tbody></table>"
+        )
+
+        full_path = os.path.join(self.output_directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(document(item_title(database), renderer.link("style.css"), body))
+
+    def evict(self, parent_key: str) -> None:
+        """Drop the blocks under a written page from the stand-in
+
+        Args:
+            parent_key (str): Key of the page or block
+        """
+        for block_key in self.stub.children.pop(parent_key, []):
+            self.evict(block_key)
+            self.stub.blocks.pop(block_key, None)
+
+
+class HtmlRenderer:
+    """Renders the blocks of a stub page as HTML
+
+    Args:
+        stub (NotionStub): The stand-in holding the blocks
+        path_of (Callable): Page or database key -> path in the site or None, for links, see SiteWriter.path
+        page_path (str): Path of the file being written, links are relative to it
+    """
+
+    def __init__(self, stub: NotionStub, path_of: Callable, page_path: str) -> None:
+        self.stub = stub
+        self.path_of = path_of
+        self.folder = os.path.dirname(page_path)
+
+    def link(self, path: str) -> str:
+        """A link to a path in the site relative to the page being written
+
+        Args:
+            path (str): Path from the site root
+
+        Returns:
+            str: The href
+        """
+        return quote(os.path.relpath(path, self.folder or ".").replace(os.sep, "/"))
+
+    def blocks(self, parent_key: str) -> str:
+        """The HTML of a page's or block's children
+
+        Args:
+            parent_key (str): Key of the page or block
+
+        Returns:
+            str: The HTML
+        """
+        parts = []
+        open_list = None
+        for block_key in self.stub.children.get(parent_key, []):
+            block = self.stub.blocks[block_key]
+            block_type = block["type"]
+
+            # == Consecutive list items share one list
+            list_tag = LIST_TAGS.get(block_type)
+            if open_list != list_tag:
+                if open_list:
+                    parts.append(f"</{open_list}>")
+                if list_tag:
+                    parts.append(f"<{list_tag}>")
+                open_list = list_tag
+
+            parts.append(self.block(block_key, block))
+        if open_list:
+            parts.append(f"</{open_list}>")
+        return "".join(parts)
+
+    def block(self, block_key: str, block: dict) -> str:
+        """The HTML of a single block and its children
+
+        Args:
+            block_key (str): Key of the block
+            block (dict): The stub block
+
+        Returns:
+            str: The HTML
+        """
+        block_type = block["type"]
+        content = block.get(block_type) or {}
+        text = self.rich_text(content.get("rich_text") or [])
+        children = self.blocks(block_key)
+
+        if block_type.startswith("heading_"):
+            level = int(block_type[-1]) + 1
+            anchor = heading_anchor(block_key)
+            return f'<h{level} id="{anchor}">{text}</h{level}>{children}'
+        if block_type in LIST_TAGS:
+            return f"<li>{text}{children}</li>"
+        if block_type == "toggle":
+            return f"<details><summary>{text}</summary>{children}</details>"
+        if block_type == "callout":
+            icon = html.escape((content.get("icon") or {}).get("emoji") or "")
+            return f"<aside>{icon} {text}{children}</aside>"
+        if block_type == "quote":
+            return f"<blockquote>{text}{children}</blockquote>"
+        if block_type == "divider":
+            return "<hr>"
+        if block_type == "code":
+            return f"<pre><code>{text}</code></pre>"
+        if block_type == "table":
+            return self.table(block_key, content)
+        if block_type == "table_of_contents":
+            return self.table_of_contents(block["parent"])
+        if block_type == "child_database":
+            return ""
+        return f"<p>{text}</p>{children}"
+
+    def table(self, table_key: str, content: dict) -> str:
+        """The HTML of a table, its first row as the header when the table has one
+
+        Args:
+            table_key (str): Key of the table block
+            content (dict): The table settings
+
+        Returns:
+            str: The HTML
+        """
+        rows = []
+        for position, row_key in enumerate(self.stub.children.get(table_key, [])):
+            tag = "th" if position == 0 and content.get("has_column_header") else "td"
+            cells = self.stub.blocks[row_key]["table_row"]["cells"]
+            rows.append(
+                "<tr>"
+                + "".join(f"<{tag}>{self.rich_text(cell)}</{tag}>" for cell in cells)
+                + "</tr>"
+            )
+        return f"<table>{''.join(rows)}</table>"
+
+    def table_of_contents(self, parent: dict) -> str:
+        """Links to the headings of the page holding a table of contents block
+
+        Args:
+            parent (dict): Parent of the table of contents block, a page or a block
+
+        Returns:
+            str: The HTML
+        """
+        # == The block can sit in a toggle, the headings are those of the page around it
+        while parent["type"] == "block_id":
+            parent = self.stub.blocks[object_key(parent["block_id"])]["parent"]
+        parent_key = object_key(parent.get(parent["type"], ""))
+        items = []
+        for block_key in self.stub.children.get(parent_key, []):
+            block = self.stub.blocks[block_key]
+            if block["type"] in ("heading_2", "heading_3"):
+                text = self.rich_text(block[block["type"]].get("rich_text") or [])
+                items.append(
+                    f'<li><a href="#{heading_anchor(block_key)}">{text}</a></li>'
+                )
+        return f"<nav><ul>{''.join(items)}</ul></nav>" if items else ""
+
+    def rich_text(self, runs: list) -> str:
+        """HTML for a rich text array, mentions of written pages become relative links
+
+        Args:
+            runs (list): The rich text runs
+
+        Returns:
+            str: The HTML
+        """
+        parts = []
+        for run in runs:
+            if run.get("type") == "mention":
+                parts.append(self.mention(run["mention"]))
+                continue
+
+            text = (run.get("text") or {}).get("content") or run.get("plain_text", "")
+            text = html.escape(text).replace("\n", "<br>")
+            annotations = run.get("annotations") or {}
+            for name, tag in ANNOTATION_TAGS:
+                if annotations.get(name):
+                    text = f"<{tag}>{text}</{tag}>"
+            link = (run.get("text") or {}).get("link")
+            if link and link.get("url"):
+                text = f'<a href="{html.escape(link["url"])}">{text}</a>'
+            parts.append(text)
+        return "".join(parts)
+
+    def mention(self, mention: dict) -> str:
+        """A link for a mention of a page or database in the site, its title otherwise
+
+        Args:
+            mention (dict): The mention object of a rich text run
+
+        Returns:
+            str: The HTML
+        """
+        target = object_key(
+            (mention.get("page") or mention.get("database") or {}).get("id", "")
+        )
+        item = self.stub.pages.get(target) or self.stub.databases.get(target)
+        title = html.escape(item_title(item)) if item else ""
+        path = self.path_of(target)
+        if not path:
+            return title
+        return f'<a href="{self.link(path)}">{title}</a>'
+
+
+def document(title: str, stylesheet: str, body: str) -> str:
+    """A complete HTML document
+
+    Args:
+        title (str): The page title, also the top heading
+        stylesheet (str): Relative link to style.css
+        body (str): The HTML of the content
+
+    Returns:
+        str: The document
+    """
+    title = html.escape(title)
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{title}</title>\n<link rel="stylesheet" href="{stylesheet}">\n'
+        f"</head>\n<body>\n<h1>{title}</h1>\n{body}\n</body>\n</html>\n"
+    )
+
+
+def heading_anchor(block_key: str) -> str:
+    """The id of a heading, for table of contents links
+
+    Args:
+        block_key (str): Key of the heading block
+
+    Returns:
+        str: The id
+    """
+    return "h-" + re.sub(r"[^0-9a-z]", "", block_key.lower())[:12]
+
+
+def write_site_page(notion: "NotionClient", page_id: str) -> None:
+    """Write a finished page to the client's static site, when it builds one
+
+    Args:
+        notion (NotionClient): The client the page was made with
+        page_id (str): ID of the page
+    """
+    site = getattr(notion, "site", None)
+    if site:
+        site.write(page_id)
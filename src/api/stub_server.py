@@ -0,0 +1,1126 @@
+"""
+
+Local stand-in for the parts of the Notion API this project uses.
+
+Keeps pages, databases and blocks in memory and answers the same JSON shapes as api.notion.com,
+so the builders can run end to end without a real workspace. Notion's documented payload limits
+are enforced, requests above the configured rate receive a 429 with a Retry-After header, and
+every response can be delayed to simulate network latency. As on Notion, the rate applies to each
+integration token separately.
+
+Supported endpoints:
+
+    POST  /v1/pages                   pages.create
+    POST  /v1/databases               databases.create
+    GET   /v1/databases/{id}          databases.retrieve
+    PATCH /v1/databases/{id}          databases.update
+    POST  /v1/databases/{id}/query    databases.query
+    PATCH /v1/pages/{id}              pages.update
+    PATCH /v1/blocks/{id}/children    blocks.children.append
+    GET   /v1/blocks/{id}/children    blocks.children.list
+    PATCH /v1/blocks/{id}             blocks.update
+    DELETE /v1/blocks/{id}            blocks.delete, also archives pages and databases
+    POST  /v1/search                  search
+
+    GET   /__stub/stats               request counters for benchmarks
+    POST  /__stub/reset               clear all pages, databases and counters
+
+EXAMPLES:
+
+Start the stand-in on port 8765 with 50ms latency and Notion's average rate limit
+    py -m src.api.stub_server --port 8765 --latency 0.05 --rate_limit 3
+
+Point a build at it
+    py .\\main.py --build conditions --database_id stub-parent -k secret_stub --base_url http://127.0.0.1:8765
+
+Refuse a token with a 401, to try a build with several tokens when one of them is revoked
+    py -m src.api.stub_server --port 8765 --rejected_tokens secret_revoked
+
+"""
+
+import argparse
+import datetime
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Union
+from urllib.parse import parse_qs, urlparse
+
+# == Limits from https://developers.notion.com/reference/request-limits
+MAX_PAYLOAD_BYTES = 500 * 1000
+MAX_BLOCKS_PER_PAYLOAD = 1000
+MAX_ARRAY_ELEMENTS = 100
+MAX_NESTING_LEVELS = 2
+MAX_TEXT_CONTENT = 2000
+MAX_PAGE_SIZE = 100
+
+
+class StubError(Exception):
+    """An error response in Notion's error format"""
+
+    def __init__(
+        self, status: int, code: str, message: str, headers: dict = None
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.headers = headers or {}
+
+    def body(self) -> dict:
+        return {
+            "object": "error",
+            "status": self.status,
+            "code": self.code,
+            "message": self.message,
+        }
+
+
+class RateLimiter:
+    """Token bucket deciding which requests are answered with a 429
+
+    Args:
+        rate (float): Requests per second allowed on average, 0 disables the limit
+        burst (int): Number of requests that can be made back to back
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Union[None, int]:
+        """Take a token for a request
+
+        Returns:
+            Union[None, int]: None if the request may proceed, otherwise the Retry-After seconds
+        """
+        if not self.rate:
+            return None
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+
+            return max(1, math.ceil((1 - self.tokens) / self.rate))
+
+
+class NotionStub:
+    """In-memory Notion workspace answering API requests
+
+    The HTTP handler below is a thin wrapper around handle(), so the same store can also be used in
+    process. Unknown parent pages are created on first use, which stands in for sharing a page with
+    the integration in a real workspace.
+
+    Args:
+        latency (float, optional): Seconds added to every response. Defaults to 0.
+        latency_jitter (float, optional): Random extra seconds added on top of latency. Defaults to 0.
+        rate_limit (float, optional): Average requests per second before 429s, 0 disables. Defaults to 0.
+        burst (int, optional): Requests allowed back to back before the rate limit applies. Defaults to 10.
+        error_rate (float, optional): Fraction of requests answered with a 429 regardless of rate. Defaults to 0.
+        rejected_tokens (Union[None, list], optional): Tokens answered with a 401, as if revoked. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        latency_jitter: float = 0,
+        rate_limit: float = 0,
+        burst: int = 10,
+        error_rate: float = 0,
+        rejected_tokens: Union[None, list] = None,
+    ) -> None:
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.rejected_tokens = set(rejected_tokens or [])
+        # == Authorization header -> RateLimiter, Notion rate limits each integration on its own
+        self.limiters = {}
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Remove every page, database and block and zero the counters"""
+        with self.lock:
+            self.pages = {}
+            self.databases = {}
+            self.blocks = {}
+            # == Parent ID -> ordered list of child block IDs
+            self.children = {}
+            self.stats = {
+                "requests": 0,
+                "connections": 0,
+                "rate_limited": 0,
+                "errors": 0,
+                "bytes_received": 0,
+                "bytes_sent": 0,
+                "endpoints": {},
+            }
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: dict,
+        body: Union[None, dict],
+        headers: dict,
+        body_bytes: int = 0,
+    ) -> tuple[int, dict, dict]:
+        """Answer a single API request
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path including the /v1 prefix
+            query (dict): Query string parameters
+            body (Union[None, dict]): Decoded JSON body
+            headers (dict): Request headers, only Authorization is read
+            body_bytes (int, optional): Size of the raw request body. Defaults to 0.
+
+        Returns:
+            tuple[int, dict, dict]: Status code, response headers and JSON body
+        """
+        if path.startswith("/__stub/"):
+            return self._handle_control(method, path)
+
+        endpoint = self._endpoint_name(method, path)
+
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_received"] += body_bytes
+            self.stats["endpoints"][endpoint] = (
+                self.stats["endpoints"].get(endpoint, 0) + 1
+            )
+
+        self._sleep_latency()
+
+        authorization = headers.get("Authorization", "")
+        with self.lock:
+            limiter = self.limiters.setdefault(
+                authorization, RateLimiter(self.rate_limit, self.burst)
+            )
+
+        try:
+            retry_after = limiter.acquire()
+            if retry_after is None and self.error_rate:
+                if random.random() < self.error_rate:
+                    retry_after = 1
+            if retry_after is not None:
+                with self.lock:
+                    self.stats["rate_limited"] += 1
+                raise StubError(
+                    429,
+                    "rate_limited",
+                    "You have been rate limited. Please try again in a few minutes.",
+                    {"Retry-After": str(retry_after)},
+                )
+
+            if (
+                not authorization.startswith("Bearer ")
+                or authorization[len("Bearer ") :] in self.rejected_tokens
+            ):
+                raise StubError(401, "unauthorized", "API token is invalid.")
+
+            if body_bytes > MAX_PAYLOAD_BYTES:
+                raise StubError(
+                    413,
+                    "validation_error",
+                    f"Request body is {body_bytes} bytes, the limit is {MAX_PAYLOAD_BYTES}.",
+                )
+
+            with self.lock:
+                response = self._route(method, path, query, body or {})
+
+        except StubError as e:
+            if e.status != 429:
+                with self.lock:
+                    self.stats["errors"] += 1
+            return e.status, e.headers, e.body()
+
+        return 200, {}, response
+
+    # == Routing
+    # ==========
+    def _endpoint_name(self, method: str, path: str) -> str:
+        parts = path.strip("/").split("/")[1:]
+        # == Replace object IDs so counters group by endpoint
+        if len(parts) > 1:
+            parts[1] = "{id}"
+        return f"{method} /{'/'.join(parts)}"
+
+    def _route(self, method: str, path: str, query: dict, body: dict) -> dict:
+        parts = path.strip("/").split("/")
+        if not parts or parts[0] != "v1":
+            raise StubError(404, "invalid_request_url", f"Invalid request URL: {path}")
+        parts = parts[1:]
+
+        if method == "POST" and parts == ["pages"]:
+            return self._create_page(body)
+        if method == "POST" and parts == ["databases"]:
+            return self._create_database(body)
+        if len(parts) == 2 and parts[0] == "databases":
+            if method == "GET":
+                return self._get_database(parts[1])
+            if method == "PATCH":
+                return self._update_database(parts[1], body)
+        if (
+            method == "POST"
+            and len(parts) == 3
+            and parts[0] == "databases"
+            and parts[2] == "query"
+        ):
+            return self._query_database(parts[1], body)
+        if method == "PATCH" and len(parts) == 2 and parts[0] == "pages":
+            return self._update_page(parts[1], body)
+        if method == "POST" and parts == ["search"]:
+            return self._search(body)
+        if method == "PATCH" and len(parts) == 2 and parts[0] == "blocks":
+            return self._update_block(parts[1], body)
+        if method == "DELETE" and len(parts) == 2 and parts[0] == "blocks":
+            return self._delete_block(parts[1])
+        if len(parts) == 3 and parts[0] == "blocks" and parts[2] == "children":
+            if method == "PATCH":
+                return self._append_children(parts[1], body)
+            if method == "GET":
+                return self._list_children(parts[1], query)
+
+        raise StubError(
+            404, "invalid_request_url", f"Invalid request URL: {method} {path}"
+        )
+
+    def _handle_control(self, method: str, path: str) -> tuple[int, dict, dict]:
+        if method == "GET" and path == "/__stub/stats":
+            with self.lock:
+                return 200, {}, json.loads(json.dumps(self.stats))
+        if method == "POST" and path == "/__stub/reset":
+            self.reset()
+            return 200, {}, {"ok": True}
+        return (
+            404,
+            {},
+            {"object": "error", "status": 404, "code": "invalid_request_url"},
+        )
+
+    def _sleep_latency(self) -> None:
+        delay = self.latency
+        if self.latency_jitter:
+            delay += random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    # == Endpoints
+    # ==========
+    def _create_page(self, body: dict) -> dict:
+        parent = body.get("parent") or {}
+        properties = body.get("properties") or {}
+
+        if "database_id" in parent:
+            database = self._get_database(parent["database_id"])
+            for name in properties:
+                if name not in database["properties"]:
+                    raise StubError(
+                        400,
+                        "validation_error",
+                        f"{name} is not a property that exists.",
+                    )
+        elif "page_id" in parent:
+            self._get_or_create_parent_page(parent["page_id"])
+        else:
+            raise StubError(400, "validation_error", "body.parent should be defined.")
+
+        self._validate_rich_text(properties)
+        children = body.get("children") or []
+        self._validate_children(children)
+
+        page_id = str(uuid.uuid4())
+        page = {
+            "object": "page",
+            "id": page_id,
+            "created_time": _now(),
+            "last_edited_time": _now(),
+            "parent": _normalise_parent(parent),
+            "archived": False,
+            "properties": {
+                name: _property_value(value) for name, value in properties.items()
+            },
+            "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+        }
+        self.pages[_key(page_id)] = page
+        self.children[_key(page_id)] = []
+        self._store_children(page_id, children, "page_id")
+
+        return page
+
+    def _create_database(self, body: dict) -> dict:
+        parent = body.get("parent") or {}
+        if "page_id" not in parent:
+            raise StubError(
+                400, "validation_error", "body.parent.page_id should be defined."
+            )
+        self._get_or_create_parent_page(parent["page_id"])
+
+        properties = body.get("properties") or {}
+        if not any("title" in value for value in properties.values()):
+            raise StubError(
+                400, "validation_error", "Database must have a title property."
+            )
+        for value in properties.values():
+            self._validate_options(value)
+
+        database_id = str(uuid.uuid4())
+        title = [_with_plain_text_run(run) for run in body.get("title") or []]
+        database = {
+            "object": "database",
+            "id": database_id,
+            "created_time": _now(),
+            "last_edited_time": _now(),
+            "parent": {"type": "page_id", "page_id": parent["page_id"]},
+            "title": title,
+            "properties": {
+                name: {
+                    "id": _property_id(value),
+                    "name": name,
+                    "type": next(iter(value)),
+                    **value,
+                }
+                for name, value in properties.items()
+            },
+            "archived": False,
+            "url": f"https://www.notion.so/{database_id.replace('-', '')}",
+        }
+        self.databases[_key(database_id)] = database
+        self.children[_key(database_id)] = []
+
+        # == Databases show up as child_database blocks on their parent page
+        block = self._new_block(
+            {
+                "type": "child_database",
+                "child_database": {"title": "".join(r["plain_text"] for r in title)},
+            },
+            parent["page_id"],
+            "page_id",
+        )
+        block["id"] = database_id
+        self.blocks[_key(database_id)] = block
+        self.children[_key(parent["page_id"])].append(_key(database_id))
+
+        return database
+
+    def _update_database(self, database_id: str, body: dict) -> dict:
+        database = self._get_database(database_id)
+
+        if body.get("title") is not None:
+            database["title"] = [_with_plain_text_run(run) for run in body["title"]]
+            self.blocks[_key(database["id"])]["child_database"]["title"] = _title_of(
+                database
+            )
+
+        properties = database["properties"]
+        for name, value in (body.get("properties") or {}).items():
+            # == Properties are addressed by name or ID, like the real API
+            current = next(
+                (
+                    key
+                    for key, existing in properties.items()
+                    if key == name or existing["id"] == name
+                ),
+                None,
+            )
+
+            if value is None:
+                if current is not None:
+                    del properties[current]
+                    self._rename_page_property(database["id"], current, None)
+                continue
+
+            self._validate_options(value)
+            if current is None:
+                kind = next(k for k in value if k != "name")
+                new_name = value.get("name", name)
+                properties[new_name] = {
+                    "id": _property_id(value),
+                    "name": new_name,
+                    "type": kind,
+                    kind: value[kind],
+                }
+                continue
+
+            prop = properties.pop(current)
+            new_name = value.get("name", current)
+            prop["name"] = new_name
+            if new_name != current:
+                self._rename_page_property(database["id"], current, new_name)
+            for kind, config in value.items():
+                if kind == "name":
+                    continue
+                if kind != prop["type"]:
+                    prop.pop(prop["type"], None)
+                    prop["type"] = kind
+                    prop[kind] = config
+                    continue
+                # == Options are merged, existing options are never dropped by an update
+                if "options" in (config or {}):
+                    known = {o["name"] for o in prop[kind].get("options", [])}
+                    prop[kind]["options"] = prop[kind].get("options", []) + [
+                        o for o in config["options"] if o["name"] not in known
+                    ]
+                    self._validate_options(prop)
+            properties[new_name] = prop
+
+        database["last_edited_time"] = _now()
+        return database
+
+    def _query_database(self, database_id: str, body: dict) -> dict:
+        database = self._get_database(database_id)
+        results = [
+            page
+            for page in self.pages.values()
+            if page["parent"].get("database_id")
+            and _key(page["parent"]["database_id"]) == _key(database["id"])
+            and not page["archived"]
+            and _matches_filter(page, body.get("filter"))
+        ]
+        results.sort(key=lambda page: page["created_time"])
+        return _paginate(results, body.get("start_cursor"), body.get("page_size"))
+
+    def _update_page(self, page_id: str, body: dict) -> dict:
+        page = self.pages.get(_key(page_id))
+        if page is None:
+            raise StubError(
+                404, "object_not_found", f"Could not find page with ID: {page_id}."
+            )
+
+        properties = body.get("properties") or {}
+        if page["parent"].get("database_id"):
+            database = self._get_database(page["parent"]["database_id"])
+            for name in properties:
+                if name not in database["properties"]:
+                    raise StubError(
+                        400,
+                        "validation_error",
+                        f"{name} is not a property that exists.",
+                    )
+        self._validate_rich_text(properties)
+
+        for name, value in properties.items():
+            page["properties"][name] = _property_value(value)
+        if "archived" in body:
+            page["archived"] = bool(body["archived"])
+        page["last_edited_time"] = _now()
+        return page
+
+    def _append_children(self, block_id: str, body: dict) -> dict:
+        parent_key = _key(block_id)
+        if parent_key not in self.children or parent_key in self.databases:
+            raise StubError(
+                404,
+                "object_not_found",
+                f"Could not find block with ID: {block_id}.",
+            )
+
+        children = body.get("children") or []
+        self._validate_children(children)
+
+        parent_type = "page_id" if parent_key in self.pages else "block_id"
+        created = self._store_children(
+            block_id, children, parent_type, after=body.get("after")
+        )
+        return {
+            "object": "list",
+            "results": [self.blocks[_key(c)] for c in created],
+            "next_cursor": None,
+            "has_more": False,
+            "type": "block",
+            "block": {},
+        }
+
+    def _list_children(self, block_id: str, query: dict) -> dict:
+        parent_key = _key(block_id)
+        # == Unknown IDs are parent pages the user shared, the same as when creating under them
+        if parent_key not in self.children:
+            self._get_or_create_parent_page(block_id)
+        results = [self.blocks[c] for c in self.children[parent_key]]
+        return _paginate(results, query.get("start_cursor"), query.get("page_size"))
+
+    def _update_block(self, block_id: str, body: dict) -> dict:
+        block = self.blocks.get(_key(block_id))
+        if block is None or block["archived"]:
+            raise StubError(
+                404, "object_not_found", f"Could not find block with ID: {block_id}."
+            )
+
+        block_type = block["type"]
+        for key in body:
+            if key not in (block_type, "archived"):
+                raise StubError(
+                    400,
+                    "validation_error",
+                    f"body.{key} should not be present, the block is a {block_type}.",
+                )
+
+        content = dict(body.get(block_type) or {})
+        if "children" in content or "table_width" in content:
+            raise StubError(
+                400,
+                "validation_error",
+                f"body.{block_type} children and table_width cannot be updated.",
+            )
+        self._validate_rich_text(content)
+        block[block_type] = _with_plain_text({**block[block_type], **content})
+        block["last_edited_time"] = _now()
+        if body.get("archived"):
+            return self._delete_block(block_id)
+        return block
+
+    def _delete_block(self, block_id: str) -> dict:
+        block_key = _key(block_id)
+        block = self.blocks.get(block_key) or self.pages.get(block_key)
+        if block is None or block["archived"]:
+            raise StubError(
+                404, "object_not_found", f"Could not find block with ID: {block_id}."
+            )
+
+        # == Databases and pages are blocks too, archiving one archives the other
+        for item in (
+            self.blocks.get(block_key),
+            self.pages.get(block_key),
+            self.databases.get(block_key),
+        ):
+            if item:
+                item["archived"] = True
+                item["last_edited_time"] = _now()
+
+        for siblings in self.children.values():
+            if block_key in siblings:
+                siblings.remove(block_key)
+        return block
+
+    def _search(self, body: dict) -> dict:
+        text = (body.get("query") or "").lower()
+        object_filter = (body.get("filter") or {}).get("value")
+
+        candidates = []
+        if object_filter in (None, "page"):
+            candidates.extend(self.pages.values())
+        if object_filter in (None, "database"):
+            candidates.extend(self.databases.values())
+
+        results = [
+            item
+            for item in candidates
+            if not item["archived"] and text in _title_of(item).lower()
+        ]
+        results.sort(key=lambda item: item["last_edited_time"], reverse=True)
+
+        return _paginate(results, body.get("start_cursor"), body.get("page_size"))
+
+    # == Storage helpers
+    # ==========
+    def _rename_page_property(
+        self, database_id: str, old: str, new: Union[None, str]
+    ) -> None:
+        # == A new name of None removes the property from the pages
+        for page in self.pages.values():
+            parent_id = page["parent"].get("database_id")
+            if (
+                parent_id
+                and _key(parent_id) == _key(database_id)
+                and old in page["properties"]
+            ):
+                value = page["properties"].pop(old)
+                if new is not None:
+                    page["properties"][new] = value
+
+    def _get_database(self, database_id: str) -> dict:
+        database = self.databases.get(_key(database_id))
+        if database is None:
+            raise StubError(
+                404,
+                "object_not_found",
+                f"Could not find database with ID: {database_id}.",
+            )
+        return database
+
+    def _get_or_create_parent_page(self, page_id: str) -> dict:
+        page_key = _key(page_id)
+        if page_key in self.databases:
+            raise StubError(
+                400, "validation_error", f"{page_id} is a database, not a page."
+            )
+        if page_key not in self.pages:
+            self.pages[page_key] = {
+                "object": "page",
+                "id": page_id,
+                "created_time": _now(),
+                "last_edited_time": _now(),
+                "parent": {"type": "workspace", "workspace": True},
+                "archived": False,
+                "properties": {"title": {"id": "title", "type": "title", "title": []}},
+                "url": f"https://www.notion.so/{page_key}",
+            }
+            self.children[page_key] = []
+        return self.pages[page_key]
+
+    def _new_block(self, block: dict, parent_id: str, parent_type: str) -> dict:
+        block_type = block["type"]
+        content = dict(block.get(block_type) or {})
+        content.pop("children", None)
+        return {
+            "object": "block",
+            "id": str(uuid.uuid4()),
+            "parent": {"type": parent_type, parent_type: parent_id},
+            "created_time": _now(),
+            "last_edited_time": _now(),
+            "has_children": False,
+            "archived": False,
+            "type": block_type,
+            block_type: _with_plain_text(content),
+        }
+
+    def _store_children(
+        self,
+        parent_id: str,
+        children: list,
+        parent_type: str,
+        after: str = None,
+    ) -> list:
+        parent_key = _key(parent_id)
+        created = []
+        for child in children:
+            block = self._new_block(child, parent_id, parent_type)
+            block_key = _key(block["id"])
+            self.blocks[block_key] = block
+            self.children[block_key] = []
+            created.append(block["id"])
+
+            nested = (child.get(child["type"]) or {}).get("children") or []
+            if nested:
+                block["has_children"] = True
+                self._store_children(block["id"], nested, "block_id")
+
+        siblings = self.children.setdefault(parent_key, [])
+        position = len(siblings)
+        if after:
+            if _key(after) not in siblings:
+                raise StubError(
+                    400,
+                    "validation_error",
+                    f"Block {after} is not a child of {parent_id}.",
+                )
+            position = siblings.index(_key(after)) + 1
+        siblings[position:position] = [_key(c) for c in created]
+
+        if parent_key in self.blocks and created:
+            self.blocks[parent_key]["has_children"] = True
+
+        return created
+
+    # == Validation
+    # ==========
+    def _validate_options(self, value: dict) -> None:
+        for kind in ("select", "multi_select"):
+            options = (value.get(kind) or {}).get("options", [])
+            if len(options) > MAX_ARRAY_ELEMENTS:
+                raise StubError(
+                    400,
+                    "validation_error",
+                    f"{kind} options should have at most {MAX_ARRAY_ELEMENTS} items.",
+                )
+
+    def _validate_children(self, children: list) -> None:
+        total = self._count_blocks(children, 1)
+        if total > MAX_BLOCKS_PER_PAYLOAD:
+            raise StubError(
+                400,
+                "validation_error",
+                f"body contains {total} blocks, the limit is {MAX_BLOCKS_PER_PAYLOAD}.",
+            )
+        self._validate_rich_text(children)
+
+    def _count_blocks(self, children: list, depth: int) -> int:
+        if len(children) > MAX_ARRAY_ELEMENTS:
+            raise StubError(
+                400,
+                "validation_error",
+                f"body.children.length should be ≤ `{MAX_ARRAY_ELEMENTS}`, instead was `{len(children)}`.",
+            )
+        total = 0
+        for child in children:
+            if not isinstance(child, dict) or child.get("type") not in child:
+                raise StubError(
+                    400,
+                    "validation_error",
+                    "body.children should contain block objects with a type.",
+                )
+            total += 1
+            nested = (child.get(child["type"]) or {}).get("children") or []
+            if nested:
+                if depth > MAX_NESTING_LEVELS:
+                    raise StubError(
+                        400,
+                        "validation_error",
+                        f"Blocks can only be nested {MAX_NESTING_LEVELS} levels deep in a single request.",
+                    )
+                total += self._count_blocks(nested, depth + 1)
+        return total
+
+    def _validate_rich_text(self, value: Union[dict, list]) -> None:
+        if isinstance(value, list):
+            for item in value:
+                self._validate_rich_text(item)
+            return
+        if not isinstance(value, dict):
+            return
+
+        for key, item in value.items():
+            if key in ("rich_text", "title") and isinstance(item, list):
+                if len(item) > MAX_ARRAY_ELEMENTS:
+                    raise StubError(
+                        400,
+                        "validation_error",
+                        f"{key}.length should be ≤ `{MAX_ARRAY_ELEMENTS}`, instead was `{len(item)}`.",
+                    )
+            if key == "text" and isinstance(item, dict):
+                content = item.get("content") or ""
+                if len(content) > MAX_TEXT_CONTENT:
+                    raise StubError(
+                        400,
+                        "validation_error",
+                        f"text.content.length should be ≤ `{MAX_TEXT_CONTENT}`, instead was `{len(content)}`.",
+                    )
+            self._validate_rich_text(item)
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Translates HTTP requests into NotionStub.handle calls"""
+
+    # == HTTP/1.1 keeps connections alive between requests like api.notion.com
+    protocol_version = "HTTP/1.1"
+    # == Headers and body are written separately, without TCP_NODELAY a kept alive connection
+    # == waits on the client's delayed ACK before the body goes out
+    disable_nagle_algorithm = True
+    stub: NotionStub = None
+
+    def setup(self) -> None:
+        # == Called once per connection, so clients that reuse connections open fewer
+        super().setup()
+        with self.stub.lock:
+            self.stub.stats["connections"] += 1
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def log_message(self, format: str, *args) -> None:
+        # == Keep the console quiet, the stats endpoint reports the traffic
+        pass
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except json.JSONDecodeError:
+            self._respond(
+                400,
+                {},
+                {
+                    "object": "error",
+                    "status": 400,
+                    "code": "invalid_json",
+                    "message": "Error parsing JSON body.",
+                },
+            )
+            return
+
+        status, headers, payload = self.stub.handle(
+            method, url.path, query, body, dict(self.headers), len(raw)
+        )
+        self._respond(status, headers, payload)
+
+    def _respond(self, status: int, headers: dict, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        with self.stub.lock:
+            self.stub.stats["bytes_sent"] += len(data)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server(
+    stub: NotionStub, host: str = "127.0.0.1", port: int = 0
+) -> ThreadingHTTPServer:
+    """Start serving the stub on a background thread
+
+    Args:
+        stub (NotionStub): The in-memory workspace to serve
+        host (str, optional): Interface to bind. Defaults to "127.0.0.1".
+        port (int, optional): Port to bind, 0 picks a free port. Defaults to 0.
+
+    Returns:
+        ThreadingHTTPServer: The running server, use server.server_address for the bound port
+
+    Example:
+        server = start_stub_server(NotionStub(latency=0.05))
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        ...
+        server.shutdown()
+    """
+    handler = type("BoundStubRequestHandler", (StubRequestHandler,), {"stub": stub})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# == Helpers
+# ==========
+def _key(object_id: str) -> str:
+    return object_id.replace("-", "")
+
+
+def _now() -> str:
+    return (
+        datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[
+            :-3
+        ]
+        + "Z"
+    )
+
+
+def _normalise_parent(parent: dict) -> dict:
+    if "database_id" in parent:
+        return {"type": "database_id", "database_id": parent["database_id"]}
+    return {"type": "page_id", "page_id": parent["page_id"]}
+
+
+def _with_plain_text_run(run: dict) -> dict:
+    run = dict(run)
+    if run.get("type", "text") == "text" and "text" in run:
+        run.setdefault("type", "text")
+        run["plain_text"] = run["text"].get("content", "")
+    elif "plain_text" not in run:
+        run["plain_text"] = ""
+    return run
+
+
+def _with_plain_text(value: Union[dict, list]) -> Union[dict, list]:
+    # == Notion echoes rich text back with a plain_text field which search results rely on
+    if isinstance(value, list):
+        return [_with_plain_text(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "text" in value and isinstance(value["text"], dict):
+        return _with_plain_text_run(value)
+    return {key: _with_plain_text(item) for key, item in value.items()}
+
+
+def _property_id(value: dict) -> str:
+    # == Notion gives the title property the ID "title" and every other property a short random ID
+    if "title" in value:
+        return "title"
+    return uuid.uuid4().hex[:4]
+
+
+def _property_value(value: dict) -> dict:
+    # == Page properties are echoed back with their type, like the real API
+    kind = value.get("type") or next(key for key in value if key != "id")
+    return {"type": kind, kind: _with_plain_text(value.get(kind))}
+
+
+def _is_empty(value: Union[None, dict], kind: str) -> bool:
+    content = (value or {}).get(kind)
+    return content is None or content == [] or content == "" or content is False
+
+
+def _matches_filter(page: dict, query_filter: Union[None, dict]) -> bool:
+    # == Supports "and", "or", created and edited time and the is_empty, is_not_empty, equals and
+    # == contains conditions
+    if not query_filter:
+        return True
+    if "and" in query_filter:
+        return all(_matches_filter(page, f) for f in query_filter["and"])
+    if "or" in query_filter:
+        return any(_matches_filter(page, f) for f in query_filter["or"])
+    if "timestamp" in query_filter:
+        return _matches_timestamp(
+            page[query_filter["timestamp"]],
+            query_filter[query_filter["timestamp"]],
+        )
+
+    value = page["properties"].get(query_filter.get("property"))
+    kind, condition = next(
+        (key, item) for key, item in query_filter.items() if key != "property"
+    )
+    content = (value or {}).get(kind)
+    if kind in ("title", "rich_text") and isinstance(content, list):
+        content = "".join(run.get("plain_text", "") for run in content)
+    elif kind == "select" and isinstance(content, dict):
+        content = content.get("name")
+    elif kind == "multi_select" and isinstance(content, list):
+        content = [option.get("name") for option in content]
+
+    if condition.get("is_empty"):
+        return _is_empty(value, kind)
+    if condition.get("is_not_empty"):
+        return not _is_empty(value, kind)
+    if "equals" in condition:
+        return content == condition["equals"]
+    if "contains" in condition:
+        return condition["contains"] in (content or [])
+    raise StubError(
+        400, "validation_error", f"Unsupported filter condition: {condition}"
+    )
+
+
+def _matches_timestamp(value: str, condition: dict) -> bool:
+    timestamp = _parse_time(value)
+    for operator, compare in (
+        ("before", lambda a, b: a < b),
+        ("after", lambda a, b: a > b),
+        ("on_or_before", lambda a, b: a <= b),
+        ("on_or_after", lambda a, b: a >= b),
+        ("equals", lambda a, b: a == b),
+    ):
+        if operator in condition and not compare(
+            timestamp, _parse_time(condition[operator])
+        ):
+            return False
+    return True
+
+
+def _parse_time(value: str) -> datetime.datetime:
+    # == Dates without a time are midnight UTC, like Notion treats them
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def _title_of(item: dict) -> str:
+    if item["object"] == "database":
+        return "".join(run.get("plain_text", "") for run in item["title"])
+    for value in item["properties"].values():
+        if isinstance(value, dict) and "title" in value:
+            return "".join(run.get("plain_text", "") for run in value["title"])
+    return ""
+
+
+def _paginate(
+    results: list, start_cursor: Union[None, str], page_size: Union[None, int, str]
+) -> dict:
+    start = int(start_cursor) if start_cursor else 0
+    size = min(int(page_size or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+    end = start + size
+    return {
+        "object": "list",
+        "results": results[start:end],
+        "next_cursor": str(end) if end < len(results) else None,
+        "has_more": end < len(results),
+        "type": "page_or_database",
+        "page_or_database": {},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="""A local stand-in for the Notion API used for offline runs and benchmarks."""
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="""Interface to bind. Defaults to 127.0.0.1.""",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="""Port to listen on. Defaults to 8765.""",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="""Seconds added to every response. Defaults to 0.""",
+    )
+    parser.add_argument(
+        "--latency_jitter",
+        type=float,
+        default=0,
+        help="""Random extra seconds added on top of --latency. Defaults to 0.""",
+    )
+    parser.add_argument(
+        "--rate_limit",
+        type=float,
+        default=3,
+        help="""Average requests per second before 429s are returned, 0 disables. Defaults to 3.""",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=10,
+        help="""Requests allowed back to back before the rate limit applies. Defaults to 10.""",
+    )
+    parser.add_argument(
+        "--error_rate",
+        type=float,
+        default=0,
+        help="""Fraction of requests answered with a 429 regardless of rate. Defaults to 0.""",
+    )
+    parser.add_argument(
+        "--rejected_tokens",
+        nargs="+",
+        type=str,
+        default=None,
+        help="""Integration tokens answered with a 401, as if revoked. Defaults to none.""",
+    )
+
+    args = parser.parse_args()
+
+    stub = NotionStub(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        error_rate=args.error_rate,
+        rejected_tokens=args.rejected_tokens,
+    )
+    server = start_stub_server(stub, args.host, args.port)
+    print(f"Notion stand-in listening on http://{args.host}:{server.server_address[1]}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
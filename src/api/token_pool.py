@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Union
+
+from notion_client.errors import APIResponseError
+
+from src.api.uploader import AimdController, PageUploader
+from src.utils.logger import mask_secret
+
+if TYPE_CHECKING:
+    from src.api.client import NotionClient
+    from src.api.metrics import ApiMetrics
+
+# == Answers refusing the integration itself rather than the request, another token may still work
+REJECTED_STATUS_CODES = {401, 403}
+
+
+class IntegrationToken:
+    """One integration token of a TokenPool, throttled by its own concurrency controller
+
+    Args:
+        auth (str): The integration token
+        concurrency (AimdController): Calls in flight for this token, cut only by its own 429s
+        name (str): Its position in the pool and masked token for logs and metrics, for example "#2 ********gU1k"
+    """
+
+    def __init__(self, auth: str, concurrency: AimdController, name: str) -> None:
+        self.auth = auth
+        self.concurrency = concurrency
+        self.name = name
+        self.calls = 0
+        self.rejected = None
+
+
+class TokenPool:
+    """Integration tokens shared on the same parent page, spreading the calls of one build
+
+    Notion rate limits each integration separately, so every token has its own AimdController
+    and a 429 only slows down the token that received it. Each call goes to the usable token with
+    the most room left, skipping tokens paused by a Retry-After. A token refused with a 401 or
+    403 is taken out of the pool and the call is sent again with another one, the last token is
+    kept so its error reaches the caller.
+
+    Args:
+        logger (logging.Logger): Logging object, rejected tokens are logged as warnings
+        auth_keys (list): The integration tokens, duplicates are ignored
+        min_limit (int, optional): Lowest number of calls in flight per token. Defaults to 1.
+        max_limit (int, optional): Highest number of calls in flight per token. Defaults to 4.
+        metrics (Union[None, ApiMetrics], optional): Where the limit changes of every token are recorded. Defaults to None.
+
+    Example:
+        enable_token_pool(logger, notion, args.auth_key, args.min_concurrency, args.max_concurrency)
+        notion.tokens.verify(notion, args.database_id)
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        auth_keys: list,
+        min_limit: int = 1,
+        max_limit: int = 4,
+        metrics: Union[None, "ApiMetrics"] = None,
+    ) -> None:
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.metrics = metrics
+        self.tokens = []
+        for position, auth_key in enumerate(dict.fromkeys(auth_keys), 1):
+            name = f"#{position} {mask_secret(auth_key)}"
+            controller = AimdController(
+                min_limit, max_limit, metrics=metrics, name=name
+            )
+            self.tokens.append(IntegrationToken(auth_key, controller, name))
+
+    def usable(self) -> list:
+        """The tokens not rejected so far
+
+        Returns:
+            list: The IntegrationToken objects
+        """
+        with self.lock:
+            return [token for token in self.tokens if token.rejected is None]
+
+    def pick(self) -> IntegrationToken:
+        """The token to send the next call with
+
+        Returns:
+            IntegrationToken: The usable token with the fewest calls in flight for its limit,
+                preferring tokens that are not paused
+        """
+        now = time.monotonic()
+
+        def load(token: IntegrationToken) -> tuple:
+            concurrency = token.concurrency
+            return (
+                concurrency.paused_until > now,
+                concurrency.in_flight / max(1, int(concurrency.limit)),
+            )
+
+        token = min(self.usable(), key=load)
+        with self.lock:
+            token.calls += 1
+        return token
+
+    def reject(self, token: IntegrationToken, status: int) -> bool:
+        """Take a token out of the pool after Notion refused it
+
+        Args:
+            token (IntegrationToken): The refused token
+            status (int): The HTTP status it was refused with
+
+        Returns:
+            bool: True if another token is left to send the call with
+        """
+        with self.lock:
+            if token.rejected is not None:
+                return any(other.rejected is None for other in self.tokens)
+            remaining = [
+                other
+                for other in self.tokens
+                if other.rejected is None and other is not token
+            ]
+            if not remaining:
+                return False
+            token.rejected = status
+        self.logger.warning(
+            "Integration token %s was refused with %s, continuing with %s other tokens",
+            mask_secret(token.auth),
+            status,
+            len(remaining),
+        )
+        return True
+
+    def verify(self, notion: "NotionClient", parent_id: str) -> bool:
+        """Check every token can read the parent page before the build starts
+
+        A token the page was not shared with gets a 404 from Notion rather than a 403, this finds
+        those up front instead of in the middle of a build.
+
+        Args:
+            notion (NotionClient): The client the pool belongs to
+            parent_id (str): The parent page every token should be authorised on
+
+        Returns:
+            bool: True if at least one token can read the page
+        """
+        readable = False
+        for token in list(self.tokens):
+            try:
+                notion.blocks.children.list(
+                    block_id=parent_id, page_size=1, auth=token.auth
+                )
+                readable = True
+            except APIResponseError as e:
+                self.reject(token, e.status)
+        return readable
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log how the calls were spread over the tokens
+
+        Args:
+            logger (logging.Logger): Logging object
+        """
+        limits = (self.metrics.concurrency() if self.metrics else {}).get("tokens", {})
+        for token in self.tokens:
+            stats = limits.get(token.name)
+            logger.info(
+                "==  Token %s: %s calls, limit %s calls at the end%s%s",
+                token.name,
+                token.calls,
+                int(token.concurrency.limit),
+                f", {int(stats['min'])}-{int(stats['max'])} over the run, {stats['cuts']} cuts"
+                if stats
+                else "",
+                f", refused with {token.rejected}" if token.rejected else "",
+            )
+
+
+def enable_token_pool(
+    logger: logging.Logger,
+    notion: "NotionClient",
+    auth_keys: list,
+    min_limit: int,
+    max_limit: int,
+) -> None:
+    """Give a client a TokenPool and a PageUploader sized to the pool's upper bound
+
+    Used instead of enable_adaptive_uploads when more than one token is given, the pool's
+    controllers take the place of the client's single AimdController.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (NotionClient): The client
+        auth_keys (list): The integration tokens
+        min_limit (int): Lowest number of calls in flight per token
+        max_limit (int): Highest number of calls in flight per token
+    """
+    notion.tokens = TokenPool(logger, auth_keys, min_limit, max_limit, notion.metrics)
+    notion.concurrency = None
+    notion.uploader = PageUploader(
+        max(min_limit, max_limit) * len(notion.tokens.tokens)
+    )
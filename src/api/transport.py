@@ -0,0 +1,68 @@
+import importlib.util
+from typing import Union
+
+import httpx
+
+# == Idle connections are kept this many seconds, long enough to span the gaps between builders
+KEEPALIVE_EXPIRY = 60.0
+CONNECT_TIMEOUT = 10.0
+WRITE_TIMEOUT = 30.0
+# == Seconds a call waits for a free connection when every pooled one is busy
+POOL_TIMEOUT = 60.0
+
+
+def http2_available() -> bool:
+    """Whether httpx can speak HTTP/2, which needs the optional h2 package
+
+    Returns:
+        bool: True when h2 is installed
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_http_client(
+    pool_size: int, http2: Union[None, bool] = None, read_timeout: float = 60.0
+) -> httpx.Client:
+    """Create the shared httpx client every Notion API call goes through
+
+    The pool holds one connection per call that can be in flight and keeps them alive between
+    calls, so TLS handshakes happen once per connection rather than once per request. HTTP/2 is
+    used when h2 is installed, in which case the calls share a single multiplexed connection.
+
+    Args:
+        pool_size (int): Connections kept open, the highest number of calls in flight
+        http2 (Union[None, bool], optional): Force HTTP/2 on or off, used when available by default. Defaults to None.
+        read_timeout (float, optional): Seconds to wait for a response. Defaults to 60.0.
+
+    Returns:
+        httpx.Client: The client to hand to NotionClient
+
+    Example:
+        notion = NotionClient(client=build_http_client(args.max_concurrency), auth=args.auth_key)
+    """
+    return httpx.Client(
+        http2=http2_available() if http2 is None else http2,
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=request_timeout(read_timeout),
+    )
+
+
+def request_timeout(read_timeout: float) -> httpx.Timeout:
+    """Timeouts for each phase of a call, only the wait for a response is long
+
+    Args:
+        read_timeout (float): Seconds to wait for a response
+
+    Returns:
+        httpx.Timeout: The timeouts
+    """
+    return httpx.Timeout(
+        connect=CONNECT_TIMEOUT,
+        read=read_timeout,
+        write=WRITE_TIMEOUT,
+        pool=POOL_TIMEOUT,
+    )
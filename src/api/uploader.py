@@ -0,0 +1,227 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Union
+
+if TYPE_CHECKING:
+    from src.api.client import NotionClient
+    from src.api.metrics import ApiMetrics
+
+# == Healthy responses needed per endpoint before its latency is trusted as a baseline
+BASELINE_SAMPLES = 10
+# == Weight of each new response in the baseline latency
+BASELINE_WEIGHT = 0.1
+
+
+class AimdController:
+    """Adaptive limit on the number of Notion API calls in flight.
+
+    The limit grows additively, by about one call for every limit's worth of healthy responses, and
+    is cut multiplicatively when a call is rate limited, times out, fails with a server error or
+    takes latency_spike times longer than usual for its endpoint. Cuts are at most one per cooldown, so a burst of 429s from
+    the same window only halves the limit once. The limit stays between the operator's bounds and
+    every change is recorded in the metrics.
+
+    Args:
+        min_limit (int, optional): Lowest number of calls in flight. Defaults to 1.
+        max_limit (int, optional): Highest number of calls in flight. Defaults to 4.
+        decrease_factor (float, optional): Multiplier applied on congestion. Defaults to 0.5.
+        latency_spike (float, optional): Latency over the endpoint's baseline counted as congestion. Defaults to 3.0.
+        cooldown (float, optional): Seconds after a cut before the limit can be cut again. Defaults to 1.0.
+        metrics (ApiMetrics, optional): Where limit changes are recorded. Defaults to None.
+        name (Union[None, str], optional): Tags the recorded changes, the masked token of a TokenPool controller. Defaults to None.
+
+    Example:
+        notion.concurrency = AimdController(args.min_concurrency, args.max_concurrency, metrics=notion.metrics)
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 4,
+        decrease_factor: float = 0.5,
+        latency_spike: float = 3.0,
+        cooldown: float = 1.0,
+        metrics: "ApiMetrics" = None,
+        name: Union[None, str] = None,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_spike = latency_spike
+        self.cooldown = cooldown
+        self.metrics = metrics
+        self.name = name
+
+        self.limit = float(min_limit)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.last_decrease = 0.0
+        self.paused_until = 0.0
+        # == Endpoint -> [baseline latency in seconds, healthy responses seen]
+        self.baselines = {}
+
+        if metrics:
+            metrics.record_concurrency(self.limit, "start", name)
+
+    def acquire(self) -> None:
+        """Wait until another call may be sent"""
+        with self.condition:
+            while True:
+                paused = self.paused_until - time.monotonic()
+                if paused > 0:
+                    self.condition.wait(paused)
+                elif self.in_flight >= int(self.limit):
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every new call, for the Retry-After of a 429
+
+        Args:
+            seconds (float): How long to wait before sending again
+        """
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def release(
+        self, endpoint: str, status: Union[None, int, str], latency: float
+    ) -> None:
+        """Report how a call went and free its slot
+
+        Args:
+            endpoint (str): The endpoint, for example "POST /pages"
+            status (Union[None, int, str]): HTTP status, "timeout", or None when the call failed
+                without an answer
+            latency (float): Seconds the call took
+        """
+        with self.condition:
+            self.in_flight -= 1
+
+            if status == 429:
+                self._decrease("rate limited")
+            elif status == "timeout" or (isinstance(status, int) and status >= 500):
+                self._decrease("timeout" if status == "timeout" else "server error")
+            elif isinstance(status, int):
+                baseline = self.baselines.setdefault(endpoint, [latency, 0])
+                if (
+                    baseline[1] >= BASELINE_SAMPLES
+                    and latency > baseline[0] * self.latency_spike
+                ):
+                    self._decrease("latency")
+                else:
+                    baseline[0] += (latency - baseline[0]) * BASELINE_WEIGHT
+                    baseline[1] += 1
+                    self._increase()
+
+            self.condition.notify_all()
+
+    def _increase(self) -> None:
+        if self.limit >= self.max_limit:
+            return
+        previous = int(self.limit)
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        if self.metrics and int(self.limit) != previous:
+            self.metrics.record_concurrency(self.limit, "increase", self.name)
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        if self.metrics:
+            self.metrics.record_concurrency(self.limit, reason, self.name)
+
+
+class PageUploader:
+    """Creates pages on worker threads so a builder can render the next page while Notion answers.
+
+    Builders hand pages over with submit_page, the number of requests actually in flight is left
+    to the client's AimdController. The queue is bounded, so rendering never runs far ahead of the
+    uploads, and the first failure is raised again in the builder's thread.
+
+    Args:
+        workers (int): Number of upload threads, the highest concurrency the controller may reach
+
+    Example:
+        notion.uploader = PageUploader(args.max_concurrency)
+        ...
+        notion.uploader.drain()
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="upload"
+        )
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.error = None
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """Queue a call, waiting while the queue is full
+
+        Args:
+            fn (Callable): The function to call on a worker thread, usually create_page
+            *args: Passed to fn
+            **kwargs: Passed to fn
+
+        Returns:
+            Future: The pending result
+        """
+        self._raise_error()
+        self.slots.acquire()
+        future = self.executor.submit(fn, *args, **kwargs)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def drain(self) -> None:
+        """Wait for every queued call, raising the first failure"""
+        with self.lock:
+            futures = list(self.futures)
+        wait(futures)
+        self._raise_error()
+
+    def shutdown(self) -> None:
+        """Wait for the queued calls and stop the threads"""
+        self.executor.shutdown(wait=True)
+
+    def _done(self, future: Future) -> None:
+        with self.lock:
+            self.futures.discard(future)
+            if (
+                self.error is None
+                and not future.cancelled()
+                and future.exception() is not None
+            ):
+                self.error = future.exception()
+        self.slots.release()
+
+    def _raise_error(self) -> None:
+        with self.lock:
+            error, self.error = self.error, None
+            queued = list(self.futures)
+        if error is not None:
+            # == Pages still waiting for a thread are dropped, the run is about to stop
+            for future in queued:
+                future.cancel()
+            raise error
+
+
+def enable_adaptive_uploads(
+    notion: "NotionClient", min_limit: int, max_limit: int
+) -> None:
+    """Give a client an AimdController and a PageUploader sized to its upper bound
+
+    Args:
+        notion (NotionClient): The client, its metrics record the concurrency limit
+        min_limit (int): Lowest number of calls in flight
+        max_limit (int): Highest number of calls in flight
+    """
+    notion.concurrency = AimdController(min_limit, max_limit, metrics=notion.metrics)
+    notion.uploader = PageUploader(max(min_limit, max_limit))
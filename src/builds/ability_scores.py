@@ -1,7 +1,6 @@
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -53,7 +52,10 @@ def ability_scores_page(
         selected_skill = ability_scores_data[index]
 
         logger.info(
-            f"Building Markdown for ability_scores -- {selected_skill['name']} -- Index -- {index} --"
+            "Building Markdown for ability_scores -- %s -- Index -- %s --",
+            selected_skill["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _ability_scores class
@@ -93,12 +95,15 @@ def ability_scores_page(
 
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=selected_skill["index"],
         )
 
-        sleep(0.5)
-
 
 def ability_scores_db(
     logger: "logging.Logger", notion: "client", database_id: str
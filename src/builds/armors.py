@@ -1,8 +1,8 @@
 from src.classes.equipment_class import _equipment
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
+from src.api.progress import set_progress_total
 from typing import Union
-from time import sleep
 import logging
 from notion_client import Client
 
@@ -47,6 +47,16 @@ def armor_page(
     if end is None or end > len(equipment_data):
         end = len(equipment_data)
 
+    # == Only the armor in the equipment file become pages
+    set_progress_total(
+        notion,
+        sum(
+            1
+            for x in equipment_data[start:end]
+            if x["equipment_category"]["index"] == "armor"
+        ),
+    )
+
     # == Iterates through the specified range of the equipment JSON
     for index in range(start, end):
         x = equipment_data[index]
@@ -56,7 +66,10 @@ def armor_page(
 
         if equipment.equipment_category["index"] == "armor":
             logger.info(
-                f"Building Markdown for equipment -- {equipment.name} -- Index -- {index} --"
+                "Building Markdown for equipment -- %s -- Index -- %s --",
+                equipment.name,
+                index,
+                extra={"index": index},
             )
 
             # == Building markdown properties from _equipment class
@@ -89,16 +102,15 @@ def armor_page(
 
             # == Sending api call
             # ==========
-            create_page(
+            submit_page(
                 logger,
                 notion,
                 database_id,
                 markdown_properties,
                 children_properties,
+                record_index=x["index"],
             )
 
-            sleep(0.5)
-
 
 def armor_db(logger: "logging.Logger", notion: "Client", database_id: str) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
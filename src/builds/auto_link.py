@@ -0,0 +1,83 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from notion_client import Client
+
+# == Notion rejects rich text arrays longer than this
+MAX_RICH_TEXT_RUNS = 100
+
+# == Block types whose text is left alone, headings repeat the page title and code is literal
+SKIPPED_BLOCK_TYPES = {"heading_1", "heading_2", "heading_3", "code", "equation"}
+
+
+def link_entities(notion: "Client", blocks: list, page_name: str = "") -> list:
+    """Turn the names of SRD entities in rendered text into page mentions
+
+    Every plain text run of every block, table cells and nested children included, is scanned
+    with the page index's name matcher, so "the target is frightened" links to the Frightened
+    condition without a search per word. Runs that are already mentions or links are kept as
+    they are, and a page never mentions itself. The blocks are copied, the rendered ones are left
+    unchanged for the render cache.
+
+    Args:
+        notion (Client): Notion client with a page_index
+        blocks (list): Blocks from build_*_markdown
+        page_name (str, optional): Title of the page the blocks belong to. Defaults to "".
+
+    Returns:
+        list: The blocks with mentions
+
+    Example:
+        children = link_entities(notion, build_spells_markdown(spell, notion, logger, database_id), spell.name)
+    """
+    page_index = notion.page_index
+    matcher, databases = page_index.name_matcher()
+    if not matcher.keywords:
+        return blocks
+
+    own_name = page_name.strip().lower()
+
+    def link_runs(runs: list) -> list:
+        linked = []
+        for position, run in enumerate(runs):
+            text = (run.get("text") or {}).get("content")
+            if run.get("type") != "text" or not text or run["text"].get("link"):
+                linked.append(run)
+                continue
+
+            # == Mentions can only be added while the rest of the runs still fit
+            room = MAX_RICH_TEXT_RUNS - len(linked) - (len(runs) - position)
+            pieces = []
+            for segment, name in matcher.split(text):
+                page_id = None
+                if name and name != own_name and room >= 2:
+                    page_id = page_index.page_id(databases[name], name)
+                if page_id:
+                    mention = {"type": "mention", "mention": {"page": {"id": page_id}}}
+                    if run.get("annotations"):
+                        mention["annotations"] = run["annotations"]
+                    pieces.append(mention)
+                    room -= 2
+                elif pieces and pieces[-1].get("type") == "text":
+                    pieces[-1]["text"]["content"] += segment
+                else:
+                    pieces.append({**run, "text": {**run["text"], "content": segment}})
+            linked.extend(pieces)
+        return linked
+
+    def link_block(block: dict) -> dict:
+        block_type = block.get("type")
+        content = block.get(block_type)
+        if block_type in SKIPPED_BLOCK_TYPES or not isinstance(content, dict):
+            return block
+
+        content = dict(content)
+        if "rich_text" in content:
+            content["rich_text"] = link_runs(content["rich_text"])
+        if "cells" in content:
+            content["cells"] = [link_runs(cell) for cell in content["cells"]]
+        if "children" in content:
+            content["children"] = [link_block(child) for child in content["children"]]
+        return {**block, block_type: content}
+
+    return [link_block(block) for block in blocks]
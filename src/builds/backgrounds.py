@@ -1,7 +1,6 @@
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -53,7 +52,10 @@ def backgrounds_page(
         backgrounds_data = backgrounds_data[index]
 
         logger.info(
-            f"Building Markdown for backgrounds -- {backgrounds_data['name']} -- Index -- {index} --"
+            "Building Markdown for backgrounds -- %s -- Index -- %s --",
+            backgrounds_data["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _backgrounds class
@@ -79,12 +81,15 @@ def backgrounds_page(
 
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=backgrounds_data["index"],
         )
 
-        sleep(0.5)
-
 
 def backgrounds_db(logger: "logging.Logger", notion: "client", database_id: str) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
@@ -2,6 +2,9 @@ from notion_client import Client
 import re
 from typing import Union
 
+from src.utils.keyword_matcher import keyword_matcher
+from src.utils.search_index import entity_databases
+
 
 def get_rich_paragraph(content, bold=False, italic=False, underline=False):
     return {
@@ -105,7 +108,7 @@ def add_paragraph_with_mentions(
     notion: Client,
     markdown_children: list,
     text: str,
-    mention_keywords: list,
+    mention_keywords: Union[None, list] = None,
     exclude_tag: str = "",
     include_tags: str = "",
     value_type: str = "page",
@@ -118,23 +121,46 @@ def add_paragraph_with_mentions(
         notion (Client): The Notion client
         markdown_children (list): Your markdown list that contains all elements so far
         text (str): The text content for the paragraph
-        mention_keywords (list): List of keywords to mention
+        mention_keywords (Union[None, list]): List of keywords to mention, every page title in the
+            page index's ENTITY_DATABASES when None, mentioned without searching Notion
         ret (bool): Whether to return the rich_text list
 
     Returns:
         Union[None, list]: The rich_text list if ret is True, otherwise None
     """
 
-    # Create a regex pattern that matches any of the keywords
-    pattern = "|".join(map(re.escape, mention_keywords))
-
-    # Split the text and keep the keywords using parentheses
-    split_text = re.split(f"({pattern})", text)
-
     rich_text = []
 
-    for word in split_text:
-        if word in mention_keywords:
+    if mention_keywords is None:
+        # == Entity names are matched and resolved from the page index, no search per keyword
+        page_index = notion.page_index
+        matcher, databases = page_index.name_matcher()
+        for word, keyword in matcher.split(text):
+            page_id = keyword and page_index.page_id(databases[keyword], keyword)
+            if page_id:
+                rich_text.append(
+                    {"type": "mention", "mention": {"page": {"id": page_id}}}
+                )
+            else:
+                rich_text.append({"type": "text", "text": {"content": word}})
+        split_text = []
+    else:
+        # == One automaton per keyword list, shared by every paragraph using the same keywords
+        split_text = keyword_matcher(tuple(mention_keywords), ignore_case=False).split(
+            text
+        )
+
+    for word, keyword in split_text:
+        if keyword is not None and value_type == "page":
+            # == The offline search index names the databases holding the word, so no search
+            page_id = indexed_page_id(notion, word, include_tags, exclude_tag)
+            if page_id:
+                rich_text.append(
+                    {"type": "mention", "mention": {"page": {"id": page_id}}}
+                )
+                continue
+
+        if keyword is not None:
             # Define the filter for the search query
 
             filt = {
@@ -219,6 +245,38 @@ def add_paragraph_with_mentions(
     return None
 
 
+def indexed_page_id(
+    notion: Client, name: str, include_tags: str = "", exclude_tag: str = ""
+) -> Union[None, str]:
+    """Resolve a name to a page through the offline search index and the page index
+
+    Args:
+        notion (Client): The Notion client, with search_index and page_index set by main
+        name (str): The name to resolve, for example "Shortsword"
+        include_tags (str, optional): Only pages of this database. Defaults to "".
+        exclude_tag (str, optional): Never pages of this database, or of these databases when a list. Defaults to "".
+
+    Returns:
+        Union[None, str]: The page ID, or None to fall back on notion.search
+    """
+    search_index = notion.search_index
+    page_index = notion.page_index
+    if search_index is None or page_index is None:
+        return None
+
+    excluded = exclude_tag if isinstance(exclude_tag, list) else [exclude_tag]
+    for entity, record_name in search_index.named(name):
+        for database_title in entity_databases(entity):
+            if include_tags and database_title != include_tags:
+                continue
+            if database_title in excluded:
+                continue
+            page_id = page_index.page_id(database_title, record_name)
+            if page_id:
+                return page_id
+    return None
+
+
 def add_paragraph(markdown_children: list, text: str, rich_text: list = []) -> None:
     """Add a paragraph to the markdown children list with formatting checks.
 
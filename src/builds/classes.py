@@ -1,8 +1,7 @@
 # from Experiement.test import add_bulleted_list
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import create_database, create_long_page
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -63,7 +62,10 @@ def classes_page(
         class_json = classes_data[index]
 
         logger.info(
-            f"Building Markdown for classes -- {class_json['name']} -- Index -- {index} --"
+            "Building Markdown for classes -- %s -- Index -- %s --",
+            class_json["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _classes class
@@ -100,12 +102,6 @@ def classes_page(
             logger, notion, class_json, features_data, level_data, subclasses_data
         )
 
-        # == Sending api call
-        # ==========
-        created_page = create_page(
-            logger, notion, database_id, markdown_properties, children_properties
-        )
-
         # == Class Base Features
         # ==========================================================
 
@@ -129,57 +125,38 @@ def classes_page(
             else []
         )
 
-        temp_markdown = []
+        feature_markdown = []
 
         for feat in feature_list:
             if feat.get("subclass"):
                 continue
             if feat["index"].startswith("spellcasting-"):
                 continue
-            add_section_heading(temp_markdown, feat["name"], level=2)
-            add_paragraph(temp_markdown, f"Level: {feat['level']}")
-            add_divider(temp_markdown)
+            add_section_heading(feature_markdown, feat["name"], level=2)
+            add_paragraph(feature_markdown, f"Level: {feat['level']}")
+            add_divider(feature_markdown)
             if feat["desc"]:
                 for f in feat["desc"]:
-                    add_paragraph(temp_markdown, f)
-            if len(temp_markdown) >= 80:
-                notion.blocks.children.append(
-                    block_id=created_page, children=temp_markdown
-                )
-                temp_markdown = []
-
-        if temp_markdown:
-            notion.blocks.children.append(block_id=created_page, children=temp_markdown)
+                    add_paragraph(feature_markdown, f)
 
         # == Class Base Features
         # ==========================================================
 
-        temp_markdown = []
-
         for subclass in subclass_list:
-            add_section_heading(temp_markdown, subclass["name"], level=1)
-            add_divider(temp_markdown)
+            add_section_heading(feature_markdown, subclass["name"], level=1)
+            add_divider(feature_markdown)
             for f in subclass["desc"]:
-                add_paragraph(temp_markdown, f"{f}")
+                add_paragraph(feature_markdown, f"{f}")
 
             for feat in feature_list:
                 if feat.get("subclass"):
                     if feat["subclass"]["name"].lower() == subclass["name"].lower():
-                        add_section_heading(temp_markdown, feat["name"], level=2)
-                        add_paragraph(temp_markdown, f"Level: {feat['level']}")
+                        add_section_heading(feature_markdown, feat["name"], level=2)
+                        add_paragraph(feature_markdown, f"Level: {feat['level']}")
                         if feat["desc"]:
                             for f in feat["desc"]:
-                                add_paragraph(temp_markdown, f)
-                        if len(temp_markdown) >= 80:
-                            notion.blocks.children.append(
-                                block_id=created_page, children=temp_markdown
-                            )
-                            temp_markdown = []
-
-        if temp_markdown:
-            notion.blocks.children.append(block_id=created_page, children=temp_markdown)
+                                add_paragraph(feature_markdown, f)
 
-        response = notion.blocks.children.list(block_id=created_page)
         toc = {
             "object": "block",
             "type": "table_of_contents",
@@ -198,14 +175,25 @@ def classes_page(
             },
         }
 
-        # Append the TOC block at the top of the page
-        notion.blocks.children.append(
-            block_id=created_page,
-            children=[toggle_block],
-            after=response["results"][0]["id"],
+        # == The TOC sits right under the first block, the features follow the class overview
+        children_properties = (
+            children_properties[:1]
+            + [toggle_block]
+            + children_properties[1:]
+            + feature_markdown
         )
 
-        sleep(0.5)
+        # == Sending api call, the blocks go out 80 at a time
+        # ==========
+        create_long_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            chunk_size=80,
+            record_index=class_json["index"],
+        )
 
 
 def classes_db(logger: "logging.Logger", notion: "client", database_id: str) -> str:
@@ -1,16 +1,37 @@
 from src.classes.creature_class import _Creature
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
+from src.builds.relations import relation_schema, relation_values
+from src.api.schema import backfill_pages, migrated_properties
+from src.utils.render_cache import mention_version, open_render_cache
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
     from notion_client import client
+    from src.utils.render_cache import RenderCache
+
+# == Bump this whenever the rendered output changes so cached pages are re-rendered
+RENDER_VERSION = 2
 
 
 def build_creature_database(logger, notion, data_directory, json_file, args):
-    creature_db_id = creature_db(logger, notion, args.database_id)
+    creature_db_id = creature_db(logger, notion, args.database_id, args.relations)
+
+    # == Pages built by a previous run get the properties the schema has gained since
+    if migrated_properties(creature_db_id):
+        backfill_pages(
+            logger,
+            notion,
+            creature_db_id,
+            load_data(logger, data_directory, json_file),
+            lambda x: {
+                **creature_properties(_Creature(**x)),
+                **(relation_values(notion, "Creatures", x) if args.relations else {}),
+            },
+        )
+
+    render_cache = open_render_cache(logger, args)
     creature_page(
         logger,
         notion,
@@ -19,7 +40,11 @@ def build_creature_database(logger, notion, data_directory, json_file, args):
         creature_db_id,
         args.start_range,
         args.end_range,
+        render_cache,
+        args.relations,
     )
+    if render_cache:
+        render_cache.log_summary()
 
 
 def creature_page(
@@ -30,6 +55,8 @@ def creature_page(
     database_id: str,
     start: int,
     end: Union[None, int],
+    render_cache: Union[None, "RenderCache"] = None,
+    relations: bool = False,
 ) -> None:
     """This generates the api calls needed for Notion. This parses the JSON and build the markdown body for the API call.
     It iterates through each creature in the json depending on params.
@@ -41,6 +68,8 @@ def creature_page(
         database_id (str): Your database ID - This must be a page cannot be another database
         start (int): If you want to only capture a range specify the start
         end (Union[None, int]): If you want to only capture a range specify the end
+        render_cache (Union[None, RenderCache], optional): Cache of previously rendered creatures. Defaults to None.
+        relations (bool, optional): Link to other SRD databases with relation properties. Defaults to False.
     """
     # == Get Monster Data
     creature_data = load_data(logger, data_directory, json_file)
@@ -49,60 +78,106 @@ def creature_page(
     if end is None or end > len(creature_data):
         end = len(creature_data)
 
+    # == Spells are mentioned by their SRD index, cached creatures are rendered again once the
+    # == Spells pages change
+    page_index = getattr(notion, "page_index", None)
+    spell_pages = page_index.srd_pages("Spells") if page_index else {}
+    spells_version = mention_version(spell_pages)
+
     # == Iterates through the specified range of the monster JSON
     for index in range(start, end):
         x = creature_data[index]
 
-        # == Makes the creature as a data class
-        monster = _Creature(**x)
-
         logger.info(
-            f"Building Markdown for Creature -- {monster.name} -- Index -- {index} --"
+            "Building Markdown for Creature -- %s -- Index -- %s --",
+            x["name"],
+            index,
+            extra={"index": index},
         )
 
-        # == Building markdown properties from _Creature class
-        markdown_properties = {
-            "Name": {
-                "title": [
-                    {
-                        "type": "text",
-                        "text": {"content": monster.name},
-                    }
-                ]
-            },
-            "URL": {"url": f"https://www.dndbeyond.com/monsters/{monster.index}"},
-            "Size": {"select": {"name": monster.size.capitalize()}},
-            "Type": {"select": {"name": monster.type.capitalize()}},
-            "CR": {"number": monster.challenge_rating},
-            "Hit Points": {"number": monster.hit_points},
-            "Movement Type": {
-                "multi_select": [{"name": mt.capitalize()} for mt in monster.speed]
-            },
-            "5E Category": {"select": {"name": "Creatures"}},
-        }
+        # == Unchanged creatures reuse the payload rendered on a previous run
+        cached = None
+        if render_cache:
+            cache_key = render_cache.key("creatures", RENDER_VERSION, x, spells_version)
+            cached = render_cache.get(cache_key)
+
+        if cached:
+            markdown_properties, children_properties = cached
+        else:
+            # == Makes the creature as a data class
+            monster = _Creature(**x)
+
+            # == Building markdown properties from _Creature class
+            markdown_properties = creature_properties(monster)
 
-        # == Ensure children list is empty
-        children_properties = []
+            # == Building markdown for creature
+            children_properties = build_creature_markdown(monster, spell_pages)
 
-        # == Building markdown for creature
-        children_properties = build_creature_markdown(monster)
+            if render_cache:
+                render_cache.put(cache_key, markdown_properties, children_properties)
+
+        # == Relations point at page IDs, so they are added after rendering and caching
+        if relations:
+            markdown_properties = {
+                **markdown_properties,
+                **relation_values(notion, "Creatures", x),
+            }
 
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=x["index"],
         )
 
-        sleep(0.5)
 
+def creature_properties(monster: _Creature) -> dict:
+    """Build the database properties for a single creature page
 
-def creature_db(logger: "logging.Logger", notion: "client", database_id: str) -> str:
+    Args:
+        monster (_Creature): The creature being built
+
+    Returns:
+        dict: The page properties for the Notion API call
+    """
+    return {
+        "Name": {
+            "title": [
+                {
+                    "type": "text",
+                    "text": {"content": monster.name},
+                }
+            ]
+        },
+        "URL": {"url": f"https://www.dndbeyond.com/monsters/{monster.index}"},
+        "Size": {"select": {"name": monster.size.capitalize()}},
+        "Type": {"select": {"name": monster.type.capitalize()}},
+        "CR": {"number": monster.challenge_rating},
+        "Hit Points": {"number": monster.hit_points},
+        "Movement Type": {
+            "multi_select": [{"name": mt.capitalize()} for mt in monster.speed]
+        },
+        "5E Category": {"select": {"name": "Creatures"}},
+    }
+
+
+def creature_db(
+    logger: "logging.Logger",
+    notion: "client",
+    database_id: str,
+    relations: bool = False,
+) -> str:
     """This generates the api calls needed for Notion. This just bulds the empty database page with the required options.
 
     Args:
         logger (logging.Logger): _description_
         notion (client): _description_
         database_id (str): _description_
+        relations (bool, optional): Add relation properties to other SRD databases. Defaults to False.
 
     Returns:
         str: _description_
@@ -165,18 +240,26 @@ def creature_db(logger: "logging.Logger", notion: "client", database_id: str) ->
         },
     }
 
+    # == Link to the pages of other SRD databases
+    if relations:
+        database_properties.update(relation_schema(logger, notion, database_name))
+
     return create_database(
         logger, notion, database_id, database_name, database_properties
     )
 
 
-def build_creature_markdown(creature: object) -> list:
+def build_creature_markdown(
+    creature: object, spell_pages: Union[None, dict] = None
+) -> list:
     from src.utils.ability_modifier import ability_modifier
     from src.builds.children_md import (
         add_paragraph,
+        add_paragraph_block,
         add_section_heading,
         add_table,
         add_divider,
+        get_rich_paragraph,
     )
 
     # == Initializing the markdown children list
@@ -280,11 +363,26 @@ def build_creature_markdown(creature: object) -> list:
 
     # == Spellcasting
     # ==========
-    spell_ability = creature.get_spellcasting()
-    if spell_ability:
-        add_section_heading(markdown_children, "Spellcasting", level=3)
+    # == Each spell mentions its page in the Spells database, found by SRD index
+    for spell_ability in creature.get_spellcasting():
+        add_section_heading(markdown_children, spell_ability["name"], level=3)
         add_divider(markdown_children)
-        add_paragraph(markdown_children, spell_ability)
+        add_paragraph(markdown_children, spell_ability["desc"])
+        for label, spells in spell_ability["groups"].items():
+            rich_text = [get_rich_paragraph(f"{label}: ", bold=True)]
+            for position, spell in enumerate(spells):
+                if position:
+                    rich_text.append(get_rich_paragraph(", "))
+                page_id = (spell_pages or {}).get(spell["index"])
+                if page_id:
+                    rich_text.append(
+                        {"type": "mention", "mention": {"page": {"id": page_id}}}
+                    )
+                else:
+                    rich_text.append(get_rich_paragraph(spell["name"]))
+                if spell["notes"]:
+                    rich_text.append(get_rich_paragraph(f" ({spell['notes']})"))
+            markdown_children.append(add_paragraph_block(rich_text))
 
     # == Actions
     # ==========
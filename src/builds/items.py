@@ -1,8 +1,8 @@
 from src.classes.equipment_class import _equipment
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
+from src.api.progress import set_progress_total
 from typing import Union
-from time import sleep
 import logging
 from notion_client import Client
 
@@ -47,6 +47,16 @@ def items_page(
     if end is None or end > len(items_data):
         end = len(items_data)
 
+    # == Only the other items in the equipment file become pages
+    set_progress_total(
+        notion,
+        sum(
+            1
+            for x in items_data[start:end]
+            if x["equipment_category"]["index"] not in ("armor", "weapon")
+        ),
+    )
+
     # == Iterates through the specified range of the items JSON
     for index in range(start, end):
         x = items_data[index]
@@ -59,7 +69,10 @@ def items_page(
             and items.equipment_category["index"] != "weapon"
         ):
             logger.info(
-                f"Building Markdown for items -- {items.name} -- Index -- {index} --"
+                "Building Markdown for items -- %s -- Index -- %s --",
+                items.name,
+                index,
+                extra={"index": index},
             )
 
             # == Building markdown properties from _items class
@@ -110,16 +123,15 @@ def items_page(
 
             # == Sending api call
             # ==========
-            create_page(
+            submit_page(
                 logger,
                 notion,
                 database_id,
                 markdown_properties,
                 children_properties,
+                record_index=x["index"],
             )
 
-            sleep(0.5)
-
 
 def items_db(logger: logging.Logger, notion: Client, database_id: str) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
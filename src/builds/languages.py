@@ -1,7 +1,6 @@
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -53,7 +52,10 @@ def languages_properties_page(
         selected_prop = languages_data[index]
 
         logger.info(
-            f"Building Markdown for weapon properties -- {selected_prop['name']} -- Index -- {index} --"
+            "Building Markdown for weapon properties -- %s -- Index -- %s --",
+            selected_prop["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from languages properties class
@@ -85,12 +87,15 @@ def languages_properties_page(
 
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=selected_prop["index"],
         )
 
-        sleep(0.5)
-
 
 def languages_properties_db(
     logger: "logging.Logger", notion: "client", database_id: str
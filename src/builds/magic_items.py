@@ -1,8 +1,7 @@
 from src.classes.magic_items_class import _magic_item
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -57,7 +56,10 @@ def magic_items_page(
         magic_items = _magic_item(**x)
 
         logger.info(
-            f"Building Markdown for magic_items -- {magic_items.name} -- Index -- {index} --"
+            "Building Markdown for magic_items -- %s -- Index -- %s --",
+            magic_items.name,
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _magic_items class
@@ -106,16 +108,15 @@ def magic_items_page(
 
         # == Sending api call
         # ==========
-        create_page(
+        submit_page(
             logger,
             notion,
             database_id,
             markdown_properties,
             children_properties,
+            record_index=x["index"],
         )
 
-        sleep(0.5)
-
 
 def magic_items_db(logger: "logging.Logger", notion: "client", database_id: str) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
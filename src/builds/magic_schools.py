@@ -1,7 +1,6 @@
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -53,7 +52,10 @@ def magic_schools_page(
         schools = magic_schools_data[index]
 
         logger.info(
-            f"Building Markdown for magic_schools -- {schools['name']} -- Index -- {index} --"
+            "Building Markdown for magic_schools -- %s -- Index -- %s --",
+            schools["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _magic_schools class
@@ -85,12 +87,15 @@ def magic_schools_page(
 
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=schools["index"],
         )
 
-        sleep(0.5)
-
 
 def magic_schools_db(
     logger: "logging.Logger", notion: "client", database_id: str
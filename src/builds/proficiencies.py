@@ -1,7 +1,6 @@
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -53,7 +52,10 @@ def proficiencies_page(
         selected_proficiencies = proficiencies_data[index]
 
         logger.info(
-            f"Building Markdown for proficiencies -- {selected_proficiencies['name']} -- Index -- {index} --"
+            "Building Markdown for proficiencies -- %s -- Index -- %s --",
+            selected_proficiencies["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _proficiencies class
@@ -92,12 +94,15 @@ def proficiencies_page(
 
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=selected_proficiencies["index"],
         )
 
-        sleep(0.5)
-
 
 def proficiencies_db(
     logger: "logging.Logger", notion: "client", database_id: str
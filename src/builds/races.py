@@ -1,8 +1,8 @@
 # from Experiement.test import add_bulleted_list
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
+from src.builds.relations import relation_schema, relation_values
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -10,7 +10,7 @@ if TYPE_CHECKING:
 
 
 def build_races_database(logger, notion, data_directory, json_file, args):
-    races_db_id = races_db(logger, notion, args.database_id)
+    races_db_id = races_db(logger, notion, args.database_id, args.relations)
     races_page(
         logger,
         notion,
@@ -19,6 +19,7 @@ def build_races_database(logger, notion, data_directory, json_file, args):
         races_db_id,
         args.start_range,
         args.end_range,
+        args.relations,
     )
 
 
@@ -30,6 +31,7 @@ def races_page(
     database_id: str,
     start: int,
     end: Union[None, int],
+    relations: bool = False,
 ) -> None:
     from src.builds.children_md import (
         add_paragraph,
@@ -47,6 +49,7 @@ def races_page(
         database_id (str): Your database ID - This must be a page cannot be another database
         start (int): If you want to only capture a range specify the start
         end (Union[None, int]): If you want to only capture a range specify the end
+        relations (bool, optional): Link to other SRD databases with relation properties. Defaults to False.
     """
     # == Get races Data
     races_data = load_data(logger, data_directory, json_file)
@@ -62,7 +65,10 @@ def races_page(
         races_json = races_data[index]
 
         logger.info(
-            f"Building Markdown for races -- {races_json['name']} -- Index -- {index} --"
+            "Building Markdown for races -- %s -- Index -- %s --",
+            races_json["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _races class
@@ -119,22 +125,38 @@ def races_page(
             logger, notion, races_json, traits_data, subraces_data
         )
 
+        # == Link this race to the pages of other SRD databases
+        if relations:
+            markdown_properties = {
+                **markdown_properties,
+                **relation_values(notion, "Races", races_json),
+            }
+
         # == Sending api call
         # ==========
-        create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        submit_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=races_json["index"],
         )
 
-        sleep(0.5)
 
-
-def races_db(logger: "logging.Logger", notion: "client", database_id: str) -> str:
+def races_db(
+    logger: "logging.Logger",
+    notion: "client",
+    database_id: str,
+    relations: bool = False,
+) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
 
     Args:
         logger (logging.Logger): Logging object
         notion (client): Notion client object
         database_id (str): Database ID
+        relations (bool, optional): Add relation properties to other SRD databases. Defaults to False.
 
     Returns:
         str: Database ID
@@ -231,6 +253,10 @@ def races_db(logger: "logging.Logger", notion: "client", database_id: str) -> st
         },
     }
 
+    # == Link to the pages of other SRD databases
+    if relations:
+        database_races_properties.update(relation_schema(logger, notion, database_name))
+
     return create_database(
         logger, notion, database_id, database_name, database_races_properties
     )
@@ -0,0 +1,84 @@
+import importlib
+from typing import Callable
+
+# == Maps each database name to "module:function" of its builder and the JSON source file
+# == Builders are only imported when they are selected, so --help or a single build stays quick
+# == Some of these are order dependent for example, you need to build the weapon properties before the weapons
+DATABASE_BUILDERS = {
+    "weapon-properties": (
+        "src.builds.weapons_properties:build_weapon_properties_database",
+        "5e-SRD-Weapon-Properties.json",
+    ),
+    "backgrounds": (
+        "src.builds.backgrounds:build_backgrounds_database",
+        "5e-SRD-Backgrounds.json",
+    ),
+    "feats": ("src.builds.feats:build_feats_database", "5e-SRD-Feats.json"),
+    "magic-schools": (
+        "src.builds.magic_schools:build_magic_schools_database",
+        "5e-SRD-Magic-Schools.json",
+    ),
+    "rules": (
+        "src.builds.rules_section:build_rules_database",
+        "5e-SRD-Rule-Sections.json",
+    ),
+    "languages": (
+        "src.builds.languages:build_languages_database",
+        "5e-SRD-Languages.json",
+    ),
+    "damage-types": (
+        "src.builds.damage_types:build_damage_types_database",
+        "5e-SRD-Damage-Types.json",
+    ),
+    "conditions": (
+        "src.builds.conditions:build_conditions_database",
+        "5e-SRD-Conditions.json",
+    ),
+    "alignments": (
+        "src.builds.alignments:build_alignments_database",
+        "5e-SRD-Alignments.json",
+    ),
+    "proficiencies": (
+        "src.builds.proficiencies:build_proficiencies_database",
+        "5e-SRD-Proficiencies.json",
+    ),
+    "skills": ("src.builds.skills:build_skills_database", "5e-SRD-Skills.json"),
+    "ability-scores": (
+        "src.builds.ability_scores:build_ability_scores_database",
+        "5e-SRD-Ability-Scores.json",
+    ),
+    "races": ("src.builds.races:build_races_database", "5e-SRD-Races.json"),
+    "classes": ("src.builds.classes:build_classes_database", "5e-SRD-Classes.json"),
+    "weapons": ("src.builds.weapons:build_weapons_database", "5e-SRD-Equipment.json"),
+    "armors": ("src.builds.armors:build_armors_database", "5e-SRD-Equipment.json"),
+    "items": ("src.builds.items:build_items_database", "5e-SRD-Equipment.json"),
+    "magic-items": (
+        "src.builds.magic_items:build_magic_items_database",
+        "5e-SRD-Magic-Items.json",
+    ),
+    "spells": ("src.builds.spells:build_spells_database", "5e-SRD-Spells.json"),
+    # == Creatures mention the spells they cast, so they are built after the Spells pages
+    "creatures": (
+        "src.builds.creature:build_creature_database",
+        "5e-SRD-Monsters.json",
+    ),
+}
+
+
+def load_builder(name: str) -> tuple[Callable, str]:
+    """Import the builder for a database
+
+    Args:
+        name (str): Key of the database in DATABASE_BUILDERS, for example "creatures"
+
+    Returns:
+        tuple[Callable, str]: The build function and the JSON file it reads
+
+    Example:
+        builder, json_file = load_builder("conditions")
+        builder(logger, notion, DATA_DIRECTORY, json_file, args)
+    """
+    target, json_file = DATABASE_BUILDERS[name]
+    module_name, function_name = target.split(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name), json_file
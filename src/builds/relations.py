@@ -0,0 +1,68 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import logging
+    from notion_client import Client
+
+# == Relation properties written with --relations, database -> property -> (target database, SRD field)
+# == The SRD field holds a list of references like {"index": "wizard", "name": "Wizard"}
+# == The multi_select versions are kept alongside so existing views and filters still work
+# == Race traits have no database of their own, so they stay a multi_select
+RELATIONS = {
+    "Spells": {"Classes": ("Classes", "classes")},
+    "Races": {"Known Languages": ("Languages", "languages")},
+    "Weapons": {"Weapon Properties": ("Weapon Properties", "properties")},
+    "Creatures": {"Condition Immunities": ("Conditions", "condition_immunities")},
+}
+
+
+def relation_schema(
+    logger: "logging.Logger", notion: "Client", database_name: str
+) -> dict:
+    """The relation properties to add to a database schema
+
+    A relation is skipped with a warning when its target database has not been built yet.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion client with a page_index
+        database_name (str): Title of the database being built, for example "Spells"
+
+    Returns:
+        dict: Relation properties for databases.create
+    """
+    schema = {}
+    for name, (target, _) in RELATIONS.get(database_name, {}).items():
+        target_id = notion.page_index.database_id(target)
+        if target_id is None:
+            logger.warning(
+                "No %s database under the parent page, build it first for the %s relation on %s",
+                target,
+                name,
+                database_name,
+            )
+            continue
+        schema[name] = {"relation": {"database_id": target_id, "single_property": {}}}
+    return schema
+
+
+def relation_values(notion: "Client", database_name: str, record: dict) -> dict:
+    """The relation property values for a page, resolved from the page index
+
+    Args:
+        notion (Client): Notion client with a page_index
+        database_name (str): Title of the database the page is in, for example "Spells"
+        record (dict): The SRD record the page is built from
+
+    Returns:
+        dict: Relation properties for pages.create
+    """
+    values = {}
+    for name, (target, field) in RELATIONS.get(database_name, {}).items():
+        if notion.page_index.database_id(target) is None:
+            continue
+        page_ids = notion.page_index.page_ids(
+            target, [reference["name"] for reference in record.get(field) or []]
+        )
+        values[name] = {"relation": [{"id": page_id} for page_id in page_ids]}
+    return values
@@ -1,7 +1,6 @@
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import create_database, create_long_page
 from typing import TYPE_CHECKING, Union
-from time import sleep
 from src.builds.children_md import (
     add_paragraph,
 )
@@ -56,7 +55,10 @@ def rules_properties_page(
         selected_prop = rules_properties_data[index]
 
         logger.info(
-            f"Building Markdown for weapon properties -- {selected_prop['name']} -- Index -- {index} --"
+            "Building Markdown for weapon properties -- %s -- Index -- %s --",
+            selected_prop["name"],
+            index,
+            extra={"index": index},
         )
 
         # == Building markdown properties from _weapon properties class
@@ -72,31 +74,24 @@ def rules_properties_page(
             "5E Category": {"select": {"name": "Rules"}},
         }
 
-        # == Ensure children_properties list is empty
+        # == One paragraph per line of the rule
         children_properties = []
 
-        # == Sending api call
+        for desc in selected_prop["desc"].split("\n"):
+            add_paragraph(children_properties, desc)
+
+        # == Sending api call, the paragraphs go out 100 at a time
         # ==========
 
-        created_page = create_page(
-            logger, notion, database_id, markdown_properties, children_properties
+        create_long_page(
+            logger,
+            notion,
+            database_id,
+            markdown_properties,
+            children_properties,
+            record_index=selected_prop["index"],
         )
 
-        list_of_desc = selected_prop["desc"].split("\n")
-        temp = []
-
-        for desc in list_of_desc:
-            add_paragraph(temp, desc)
-            if len(temp) >= 100:
-                notion.blocks.children.append(block_id=created_page, children=temp)
-                temp = []
-
-        # Append any remaining elements in temp
-        if temp:
-            notion.blocks.children.append(block_id=created_page, children=temp)
-
-        sleep(0.5)
-
 
 def rules_properties_db(
     logger: "logging.Logger", notion: "client", database_id: str
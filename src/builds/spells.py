@@ -1,16 +1,37 @@
 from src.classes.spells_class import _spell
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
+from src.builds.relations import relation_schema, relation_values
+from src.api.schema import backfill_pages, migrated_properties
+from src.utils.render_cache import open_render_cache
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
     from notion_client import Client
+    from src.utils.render_cache import RenderCache
+
+# == Bump this whenever the rendered output changes so cached pages are re-rendered
+RENDER_VERSION = 1
 
 
 def build_spells_database(logger, notion, data_directory, json_file, args):
-    spells_db_id = spells_db(logger, notion, args.database_id)
+    spells_db_id = spells_db(logger, notion, args.database_id, args.relations)
+
+    # == Pages built by a previous run get the properties the schema has gained since
+    if migrated_properties(spells_db_id):
+        backfill_pages(
+            logger,
+            notion,
+            spells_db_id,
+            load_data(logger, data_directory, json_file),
+            lambda x: {
+                **spells_properties(_spell(**x)),
+                **(relation_values(notion, "Spells", x) if args.relations else {}),
+            },
+        )
+
+    render_cache = open_render_cache(logger, args)
     spells_page(
         logger,
         notion,
@@ -19,7 +40,11 @@ def build_spells_database(logger, notion, data_directory, json_file, args):
         spells_db_id,
         args.start_range,
         args.end_range,
+        render_cache,
+        args.relations,
     )
+    if render_cache:
+        render_cache.log_summary()
 
 
 def spells_page(
@@ -30,6 +55,8 @@ def spells_page(
     database_id: str,
     start: int,
     end: Union[None, int],
+    render_cache: Union[None, "RenderCache"] = None,
+    relations: bool = False,
 ) -> None:
     """This generates the api calls needed for Notion. This parses the JSON and build the markdown body for the API call.
     It iterates through each spells in the json depending on params.
@@ -41,6 +68,8 @@ def spells_page(
         database_id (str): Your database ID - This must be a page cannot be another database
         start (int): If you want to only capture a range specify the start
         end (Union[None, int]): If you want to only capture a range specify the end
+        render_cache (Union[None, RenderCache], optional): Cache of previously rendered spells. Defaults to None.
+        relations (bool, optional): Link to other SRD databases with relation properties. Defaults to False.
     """
     # == Get spells Data
     spells_data = load_data(logger, data_directory, json_file)
@@ -53,117 +82,152 @@ def spells_page(
     for index in range(start, end):
         x = spells_data[index]
 
-        # == Makes the spells as a data class
-        spells = _spell(**x)
-
         logger.info(
-            f"Building Markdown for spells -- {spells.name} -- Index -- {index} --"
+            "Building Markdown for spells -- %s -- Index -- %s --",
+            x["name"],
+            index,
+            extra={"index": index},
         )
 
-        # == Building markdown properties from _spells class
-        markdown_properties = {
-            "Name": {
-                "title": [
-                    {
-                        "type": "text",
-                        "text": {"content": spells.name},
-                    }
-                ]
-            },
-            "5E Category": {"select": {"name": "Spells"}},
-            "URL": {"url": f"https://www.dndbeyond.com/spells/{spells.index}"},
-            "Level": {
-                "select": {
-                    "name": str(spells.level) if spells.level != 0 else "Cantrip"
-                }
-            },
-            "School": {"select": {"name": spells.school.get("name").capitalize()}},
-            "Casting Time": {"multi_select": [{"name": spells.casting_time}]},
-            "Range": {
-                "rich_text": [
-                    {
-                        "type": "text",
-                        "text": {"content": spells.range},
-                    }
-                ]
-            },
-            "Components": {
-                "multi_select": [
-                    {"name": component.capitalize()}
-                    for component in spells.components or []
-                ]
-            },
-            "Duration": {
-                "rich_text": [
-                    {
-                        "type": "text",
-                        "text": {"content": spells.duration},
-                    }
-                ]
-            },
-            "Concentration": {"checkbox": spells.concentration},
-            "Ritual": {"checkbox": spells.ritual},
-            "Classes and Subclasses": {
-                "multi_select": [
-                    {"name": cls["name"].capitalize()}
-                    for cls in spells.classes + spells.subclasses
-                ]
-            },
-        }
-
-        if spells.material:
-            markdown_properties["Materials"] = {
-                "rich_text": [
-                    {
-                        "type": "text",
-                        "text": {"content": spells.material},
-                    }
-                ]
-            }
-        if spells.attack_type:
-            markdown_properties["Attack Type"] = {
-                "select": {
-                    "name": spells.attack_type.capitalize()
-                    if spells.attack_type
-                    else ""
-                }
+        # == Unchanged spells reuse the payload rendered on a previous run
+        cached = None
+        if render_cache:
+            cache_key = render_cache.key("spells", RENDER_VERSION, x)
+            cached = render_cache.get(cache_key)
+
+        if cached:
+            markdown_properties, children_properties = cached
+        else:
+            # == Makes the spells as a data class
+            spells = _spell(**x)
+
+            # == Building markdown properties from _spells class
+            markdown_properties = spells_properties(spells)
+
+            # == Building markdown for spells
+            children_properties = build_spells_markdown(
+                spells,
+                notion,
+                logger,
+                database_id,
+            )
+
+            if render_cache:
+                render_cache.put(cache_key, markdown_properties, children_properties)
+
+        # == Relations point at page IDs, so they are added after rendering and caching
+        if relations:
+            markdown_properties = {
+                **markdown_properties,
+                **relation_values(notion, "Spells", x),
             }
 
-        if spells.damage and spells.damage.get("damage_type"):
-            markdown_properties["Damage Type"] = {
-                "select": {"name": spells.damage["damage_type"]["name"].capitalize()}
-            }
-
-        # == Ensure children_properties list is empty
-        children_properties = []
-
-        # == Building markdown for spells
-        children_properties = build_spells_markdown(
-            spells,
-            notion,
-            logger,
-            database_id,
-        )
         # == Sending api call
         # ==========
-        create_page(
+        submit_page(
             logger,
             notion,
             database_id,
             markdown_properties,
             children_properties,
+            record_index=x["index"],
         )
 
-        sleep(0.5)
 
+def spells_properties(spells: _spell) -> dict:
+    """Build the database properties for a single spell page
 
-def spells_db(logger: "logging.Logger", notion: "Client", database_id: str) -> str:
+    Args:
+        spells (_spell): The spell being built
+
+    Returns:
+        dict: The page properties for the Notion API call
+    """
+    markdown_properties = {
+        "Name": {
+            "title": [
+                {
+                    "type": "text",
+                    "text": {"content": spells.name},
+                }
+            ]
+        },
+        "5E Category": {"select": {"name": "Spells"}},
+        "URL": {"url": f"https://www.dndbeyond.com/spells/{spells.index}"},
+        "Level": {
+            "select": {"name": str(spells.level) if spells.level != 0 else "Cantrip"}
+        },
+        "School": {"select": {"name": spells.school.get("name").capitalize()}},
+        "Casting Time": {"multi_select": [{"name": spells.casting_time}]},
+        "Range": {
+            "rich_text": [
+                {
+                    "type": "text",
+                    "text": {"content": spells.range},
+                }
+            ]
+        },
+        "Components": {
+            "multi_select": [
+                {"name": component.capitalize()}
+                for component in spells.components or []
+            ]
+        },
+        "Duration": {
+            "rich_text": [
+                {
+                    "type": "text",
+                    "text": {"content": spells.duration},
+                }
+            ]
+        },
+        "Concentration": {"checkbox": spells.concentration},
+        "Ritual": {"checkbox": spells.ritual},
+        "Classes and Subclasses": {
+            "multi_select": [
+                {"name": cls["name"].capitalize()}
+                for cls in spells.classes + spells.subclasses
+            ]
+        },
+    }
+
+    if spells.material:
+        markdown_properties["Materials"] = {
+            "rich_text": [
+                {
+                    "type": "text",
+                    "text": {"content": spells.material},
+                }
+            ]
+        }
+    if spells.attack_type:
+        markdown_properties["Attack Type"] = {
+            "select": {
+                "name": spells.attack_type.capitalize() if spells.attack_type else ""
+            }
+        }
+
+    if spells.damage and spells.damage.get("damage_type"):
+        markdown_properties["Damage Type"] = {
+            "select": {"name": spells.damage["damage_type"]["name"].capitalize()}
+        }
+
+    return markdown_properties
+
+
+def spells_db(
+    logger: "logging.Logger",
+    notion: "Client",
+    database_id: str,
+    relations: bool = False,
+) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
 
     Args:
         logger (logging.Logger): Logging object
         notion (client): Notion client object
         database_id (str): Database ID
+        relations (bool, optional): Add relation properties to other SRD databases. Defaults to False.
 
     Returns:
         str: Database ID
@@ -284,6 +348,12 @@ def spells_db(logger: "logging.Logger", notion: "Client", database_id: str) -> s
         },
     }
 
+    # == Link to the pages of other SRD databases
+    if relations:
+        database_spells_properties.update(
+            relation_schema(logger, notion, database_name)
+        )
+
     return create_database(
         logger, notion, database_id, database_name, database_spells_properties
     )
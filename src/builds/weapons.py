@@ -1,9 +1,10 @@
 from cgi import test
 from src.classes.equipment_class import _equipment
 from src.utils.load_json import load_data
-from src.api.notion_api import create_page, create_database
+from src.api.notion_api import submit_page, create_database
+from src.api.progress import set_progress_total
+from src.builds.relations import relation_schema, relation_values
 from typing import TYPE_CHECKING, Union
-from time import sleep
 
 if TYPE_CHECKING:
     import logging
@@ -11,7 +12,7 @@ if TYPE_CHECKING:
 
 
 def build_weapons_database(logger, notion, data_directory, json_file, args):
-    weapons_db_id = weapons_db(logger, notion, args.database_id)
+    weapons_db_id = weapons_db(logger, notion, args.database_id, args.relations)
     weapons_page(
         logger,
         notion,
@@ -20,6 +21,7 @@ def build_weapons_database(logger, notion, data_directory, json_file, args):
         weapons_db_id,
         args.start_range,
         args.end_range,
+        args.relations,
     )
 
 
@@ -31,6 +33,7 @@ def weapons_page(
     database_id: str,
     start: int,
     end: Union[None, int],
+    relations: bool = False,
 ) -> None:
     """This generates the api calls needed for Notion. This parses the JSON and build the markdown body for the API call.
     It iterates through each equipment in the json depending on params.
@@ -42,6 +45,7 @@ def weapons_page(
         database_id (str): Your database ID - This must be a page cannot be another database
         start (int): If you want to only capture a range specify the start
         end (Union[None, int]): If you want to only capture a range specify the end
+        relations (bool, optional): Link to other SRD databases with relation properties. Defaults to False.
     """
     # == Get equipment Data
     equipment_data = load_data(logger, data_directory, json_file)
@@ -50,6 +54,16 @@ def weapons_page(
     if end is None or end > len(equipment_data):
         end = len(equipment_data)
 
+    # == Only the weapons in the equipment file become pages
+    set_progress_total(
+        notion,
+        sum(
+            1
+            for x in equipment_data[start:end]
+            if x["equipment_category"]["index"] == "weapon"
+        ),
+    )
+
     # == Iterates through the specified range of the equipment JSON
     for index in range(start, end):
         x = equipment_data[index]
@@ -59,7 +73,10 @@ def weapons_page(
 
         if equipment.equipment_category["index"] == "weapon":
             logger.info(
-                f"Building Markdown for equipment -- {equipment.name} -- Index -- {index} --"
+                "Building Markdown for equipment -- %s -- Index -- %s --",
+                equipment.name,
+                index,
+                extra={"index": index},
             )
 
             # == Building markdown properties from _equipment class
@@ -142,22 +159,38 @@ def weapons_page(
             # == Building markdown for equipment
             children_properties = build_weapon_markdown(logger, notion, equipment)
 
+            # == Link this weapon to the pages of other SRD databases
+            if relations:
+                markdown_properties = {
+                    **markdown_properties,
+                    **relation_values(notion, "Weapons", x),
+                }
+
             # == Sending api call
             # ==========
-            create_page(
-                logger, notion, database_id, markdown_properties, children_properties
+            submit_page(
+                logger,
+                notion,
+                database_id,
+                markdown_properties,
+                children_properties,
+                record_index=x["index"],
             )
 
-            sleep(0.5)
-
 
-def weapons_db(logger: "logging.Logger", notion: "client", database_id: str) -> str:
+def weapons_db(
+    logger: "logging.Logger",
+    notion: "client",
+    database_id: str,
+    relations: bool = False,
+) -> str:
     """This generates the api calls needed for Notion. This just builds the empty database page with the required options.
 
     Args:
         logger (logging.Logger): Logging object
         notion (client): Notion client object
         database_id (str): Database ID
+        relations (bool, optional): Add relation properties to other SRD databases. Defaults to False.
 
     Returns:
         str: Database ID
@@ -234,6 +267,12 @@ def weapons_db(logger: "logging.Logger", notion: "client", database_id: str) ->
         "Weight": {"rich_text": {}},
     }
 
+    # == Link to the pages of other SRD databases
+    if relations:
+        database_weapon_properties.update(
+            relation_schema(logger, notion, database_name)
+        )
+
     return create_database(
         logger, notion, database_id, database_name, database_weapon_properties
     )
@@ -145,7 +145,7 @@ class _Creature:
         special_ability = []
         if self.special_abilities:
             for x in self.special_abilities:
-                if x["name"].startswith("Spellcasting"):
+                if x["name"].startswith("Spellcasting") or x.get("spellcasting"):
                     continue
                 if x["name"] != ("Spellcasting"):
                     special_ability.append(f'{x['name']} : {x["desc"]}')
@@ -153,12 +153,38 @@ class _Creature:
 
     # == Spellcasting Abilitites
     # ===============
-    def get_spellcasting(self) -> list[str]:
-        spell_ability = []
+    def get_spellcasting(self) -> list[dict]:
+        spell_abilities = []
         for x in self.special_abilities or []:
-            if x["name"].startswith("Spellcasting"):
-                spell_ability = x["desc"]
-        return spell_ability
+            if not (x["name"].startswith("Spellcasting") or x.get("spellcasting")):
+                continue
+
+            # == The description ends with the spell list, which is rebuilt from the spells below
+            spell_ability = {
+                "name": x["name"],
+                "desc": x["desc"].split("\n\n")[0],
+                "groups": {},
+            }
+            spellcasting = x.get("spellcasting") or {}
+            slots = spellcasting.get("slots") or {}
+            spells = sorted(
+                spellcasting.get("spells") or [],
+                key=lambda spell: (
+                    spell.get("usage") is None,
+                    0 if spell.get("usage") else spell["level"],
+                ),
+            )
+            for spell in spells:
+                label = _spell_group(spell, slots)
+                spell_ability["groups"].setdefault(label, []).append(
+                    {
+                        "index": spell["url"].rstrip("/").rsplit("/", 1)[-1],
+                        "name": spell["name"],
+                        "notes": spell.get("notes"),
+                    }
+                )
+            spell_abilities.append(spell_ability)
+        return spell_abilities
 
     # == Actions
     # ===============
@@ -177,3 +203,20 @@ class _Creature:
             for x in self.legendary_actions:
                 legendary_action.append(f"{x['name']}: {x["desc"]}")
         return legendary_action
+
+
+# == Spell groups as the SRD lists them, "1st level (4 slots)" or "3/day each"
+def _spell_group(spell: dict, slots: dict) -> str:
+    usage = spell.get("usage")
+    if usage:
+        if usage["type"] == "per day":
+            return f"{usage['times']}/day each"
+        return usage["type"].capitalize()
+
+    if spell["level"] == 0:
+        return "Cantrips (at will)"
+    suffix = {1: "st", 2: "nd", 3: "rd"}.get(spell["level"], "th")
+    count = slots.get(str(spell["level"]))
+    if count is None:
+        return f"{spell['level']}{suffix} level"
+    return f"{spell['level']}{suffix} level ({count} slot{'s' if count != 1 else ''})"
@@ -0,0 +1,157 @@
+from collections import deque
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton finding many keywords in a text in a single pass.
+
+    The automaton is built once from the keywords, after which each text is scanned in time linear
+    in its length whatever the number of keywords, where a regex alternation is recompiled for
+    every keyword list and tries each keyword in turn. Matches are whole words by default and do
+    not overlap, at each position the longest keyword wins so "Acid Splash" is found rather than
+    "Acid".
+
+    Args:
+        keywords (list): The keywords to find, empty strings are ignored
+        ignore_case (bool, optional): Match regardless of case. Defaults to True.
+        whole_words (bool, optional): Only match keywords not surrounded by letters or digits. Defaults to True.
+
+    Example:
+        matcher = KeywordMatcher(["Frightened", "Poisoned"])
+        matcher.find("The target is frightened")  # [(14, 24, "Frightened")]
+    """
+
+    def __init__(
+        self, keywords: list, ignore_case: bool = True, whole_words: bool = True
+    ) -> None:
+        self.ignore_case = ignore_case
+        self.whole_words = whole_words
+        self.keywords = []
+
+        # == Node -> {character: next node}, the fallback node and (length, keyword) ending there
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+        seen = set()
+        for keyword in keywords:
+            key = self._fold(keyword)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self.keywords.append(keyword)
+            self._add(key, keyword)
+        self._link()
+
+    def find(self, text: str) -> list:
+        """Find the keywords in a text
+
+        Args:
+            text (str): The text to scan
+
+        Returns:
+            list: (start, end, keyword) for each match in text order, keyword as it was given
+        """
+        folded = self._fold(text)
+        if len(folded) != len(text):
+            # == A few characters change length when lowered, fold them one by one instead
+            folded = "".join(
+                lowered if len(lowered := char.lower()) == 1 else char for char in text
+            )
+
+        # == Longest keyword starting at each position
+        longest = {}
+        node = 0
+        for end, char in enumerate(folded, start=1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, keyword in self._outputs[node]:
+                start = end - length
+                if self.whole_words and not _on_word_boundary(text, start, end):
+                    continue
+                if length > longest.get(start, (0, None))[0]:
+                    longest[start] = (length, keyword)
+
+        matches = []
+        position = 0
+        for start in sorted(longest):
+            if start < position:
+                continue
+            length, keyword = longest[start]
+            matches.append((start, start + length, keyword))
+            position = start + length
+        return matches
+
+    def split(self, text: str) -> list:
+        """Split a text around the keywords it contains
+
+        Args:
+            text (str): The text to split
+
+        Returns:
+            list: (segment, keyword) pairs covering the whole text, keyword is None for the text
+                between matches
+        """
+        segments = []
+        position = 0
+        for start, end, keyword in self.find(text):
+            if start > position:
+                segments.append((text[position:start], None))
+            segments.append((text[start:end], keyword))
+            position = end
+        if position < len(text):
+            segments.append((text[position:], None))
+        return segments
+
+    def _fold(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def _add(self, key: str, keyword: str) -> None:
+        node = 0
+        for char in key:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._outputs[node].append((len(key), keyword))
+
+    def _link(self) -> None:
+        # == Breadth first, so the fallback of every shallower node is known before it is needed
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] = (
+                    self._outputs[child] + self._outputs[self._fail[child]]
+                )
+
+
+@lru_cache(maxsize=256)
+def keyword_matcher(
+    keywords: tuple, ignore_case: bool = True, whole_words: bool = True
+) -> KeywordMatcher:
+    """A KeywordMatcher shared by every caller with the same keywords
+
+    Args:
+        keywords (tuple): The keywords to find
+        ignore_case (bool, optional): Match regardless of case. Defaults to True.
+        whole_words (bool, optional): Only match whole words. Defaults to True.
+
+    Returns:
+        KeywordMatcher: The automaton, built on the first call for these keywords
+    """
+    return KeywordMatcher(list(keywords), ignore_case, whole_words)
+
+
+def _on_word_boundary(text: str, start: int, end: int) -> bool:
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    return end == len(text) or not text[end].isalnum()
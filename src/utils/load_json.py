@@ -1,5 +1,32 @@
 import json
 import logging
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from src.utils.search_index import SearchIndex
+
+# == The --where selection of the database being built, set by main around each builder
+RECORD_SELECTION = {}
+
+
+def select_records(
+    search_index: Union[None, "SearchIndex"] = None,
+    where: Union[None, str] = None,
+    file: Union[None, str] = None,
+) -> None:
+    """Only load the records of a file that match a search, called with no arguments to stop
+
+    Args:
+        search_index (Union[None, SearchIndex], optional): The index answering the search. Defaults to None.
+        where (Union[None, str], optional): The search query, for example "fire". Defaults to None.
+        file (Union[None, str], optional): The file the selection applies to, other files load whole. Defaults to None.
+
+    Example:
+        select_records(notion.search_index, args.where, "5e-SRD-Spells.json")
+    """
+    RECORD_SELECTION.clear()
+    if search_index is not None and where and file:
+        RECORD_SELECTION.update(search_index=search_index, where=where, file=file)
 
 
 def load_data(logger: logging.Logger, json_dir: str, file: str) -> json:
@@ -11,8 +38,19 @@ def load_data(logger: logging.Logger, json_dir: str, file: str) -> json:
         file (str): file name you want to access within the path
 
     Returns:
-        json: returns the entirety of the raw json file
+        json: returns the entirety of the raw json file, only the records matching --where when
+            it is set for this file
     """
-    logger.info(f"Attempting to load: {json_dir}/{file}")
+    logger.info("Attempting to load: %s/%s", json_dir, file)
     with open(f"{json_dir}/{file}", "r") as f:
-        return json.load(f)
+        data = json.load(f)
+
+    if RECORD_SELECTION.get("file") != file:
+        return data
+
+    where = RECORD_SELECTION["where"]
+    positions = RECORD_SELECTION["search_index"].select(file, where)
+    logger.info(
+        'Selected %s of %s records matching "%s"', len(positions), len(data), where
+    )
+    return [data[position] for position in positions]
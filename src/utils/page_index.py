@@ -0,0 +1,377 @@
+import logging
+import threading
+from typing import TYPE_CHECKING, Union
+
+from src.utils.keyword_matcher import KeywordMatcher
+
+if TYPE_CHECKING:
+    from notion_client import Client
+
+# == Databases whose page titles are found in description text, earlier titles win a tie
+ENTITY_DATABASES = (
+    "Conditions",
+    "Damage Types",
+    "Spells",
+    "Weapon Properties",
+    "Skills",
+)
+
+
+class PageIndex:
+    """Local index of the databases and pages built under the parent page.
+
+    Databases are indexed by title and pages by their title within a database, so builders can
+    link to other SRD entries without searching Notion. Pages created during the run are recorded
+    by create_page. Databases built by an earlier run are found through the parent page's child
+    databases and their pages are read with databases.query the first time they are needed.
+
+    Args:
+        logger (logging.Logger): Logging object
+        notion (Client): Notion Client object
+        parent_id (str): The parent page the databases are built under, --database_id
+
+    Example:
+        notion.page_index = PageIndex(logger, notion, args.database_id)
+        ...
+        wizard_id = notion.page_index.page_id("Classes", "Wizard")
+    """
+
+    def __init__(
+        self, logger: logging.Logger, notion: "Client", parent_id: str
+    ) -> None:
+        self.logger = logger
+        self.notion = notion
+        self.parent_id = parent_id
+        self.lock = threading.RLock()
+        # == Database title -> database ID, None when the parent page has no such database
+        self.databases = {}
+        # == Database ID -> {normalised page title: page ID}, missing until the pages are loaded
+        self.pages = {}
+        # == Database ID -> {SRD index: page ID}, for pages with an SRD URL property
+        self.srd_indexes = {}
+        # == Database ID -> {normalised page title: [page IDs]}, every page when titles repeat
+        self.title_pages = {}
+        # == Database ID -> {SRD index: [page IDs]}, items cut the index short in their URL so it repeats
+        self.index_pages = {}
+        # == Page ID -> SRD index from its URL property, None for pages without one
+        self.page_indexes = {}
+        # == Page ID without dashes -> (database ID, page title), to find a page in another workspace
+        self.titles = {}
+        # == Bumped on every change, so anything rendered from the index can tell it is stale
+        self.version = 0
+        # == Pages already updated in place this run, see existing_page
+        self.claimed = set()
+        # == Database titles -> (pages indexed when built, matcher, page title -> database title)
+        self.matchers = {}
+
+    def set_database(self, title: str, database_id: str, loaded: bool = False) -> None:
+        """Record a database created or reused during the run
+
+        Args:
+            title (str): Title of the database, for example "Classes"
+            database_id (str): ID of the database
+            loaded (bool, optional): Whether every page of the database will be recorded through
+                record_page, True for a database that was just created. Defaults to False.
+        """
+        with self.lock:
+            self.databases[title] = database_id
+            if loaded:
+                self.pages.setdefault(database_id, {})
+            self.version += 1
+
+    def record_page(
+        self,
+        database_id: str,
+        title: str,
+        page_id: str,
+        index: Union[None, str] = None,
+    ) -> None:
+        """Record a page created in a database
+
+        Args:
+            database_id (str): ID of the database the page was created in
+            title (str): Title of the page
+            page_id (str): ID of the page
+            index (Union[None, str], optional): SRD index of the record, see srd_index. Defaults to None.
+        """
+        with self.lock:
+            # == The page belongs to this record, existing_page does not hand it to another
+            self.claimed.add(page_id)
+            pages = self.pages.get(database_id)
+            if pages is None:
+                return
+            pages[_normalise(title)] = page_id
+            self._add_page(database_id, title, page_id, index)
+            self.version += 1
+
+    def database_id(self, title: str) -> Union[None, str]:
+        """Look up a database by title
+
+        Args:
+            title (str): Title of the database
+
+        Returns:
+            Union[None, str]: The database ID, or None if the parent page has no such database
+        """
+        # == Imported here as notion_api records into the index
+        from src.api.notion_api import find_child_database
+
+        with self.lock:
+            if title not in self.databases:
+                self.databases[title] = find_child_database(
+                    self.logger, self.notion, self.parent_id, title
+                )
+            return self.databases[title]
+
+    def page_id(self, database_title: str, name: str) -> Union[None, str]:
+        """Look up a page by the title of its database and its own title
+
+        Args:
+            database_title (str): Title of the database, for example "Conditions"
+            name (str): Title of the page, matched ignoring case, for example "Poisoned"
+
+        Returns:
+            Union[None, str]: The page ID, or None when there is no such page
+        """
+        pages = self._pages(database_title)
+        return pages.get(_normalise(name))
+
+    def locate(self, object_id: str) -> Union[None, tuple]:
+        """Find what a page or database ID of this workspace is, the reverse of page_id
+
+        Args:
+            object_id (str): ID of a page or database indexed here
+
+        Returns:
+            Union[None, tuple]: (database title, page title) for a page, (database title, None) for
+                a database, None for an ID the index does not know
+        """
+        key = object_id.replace("-", "")
+        with self.lock:
+            titles = {
+                database_id.replace("-", ""): title
+                for title, database_id in self.databases.items()
+                if database_id
+            }
+            if key in titles:
+                return titles[key], None
+            if key in self.titles:
+                database_id, title = self.titles[key]
+                return titles.get(database_id.replace("-", "")), title
+        return None
+
+    def page_ids(self, database_title: str, names: list) -> list:
+        """Look up several pages in the same database, skipping names without a page
+
+        Args:
+            database_title (str): Title of the database
+            names (list): Titles of the pages
+
+        Returns:
+            list: The page IDs in the order of names, without duplicates
+        """
+        pages = self._pages(database_title)
+        ids = []
+        for name in names:
+            page_id = pages.get(_normalise(name))
+            if page_id and page_id not in ids:
+                ids.append(page_id)
+        return ids
+
+    def srd_pages(self, database_title: str) -> dict:
+        """The pages of a database by the SRD index of their record, for example "fire-bolt"
+
+        Args:
+            database_title (str): Title of the database, for example "Spells"
+
+        Returns:
+            dict: A copy of the SRD index -> page ID map, empty when there is no such database
+        """
+        with self.lock:
+            database_id = self.database_id(database_title)
+            if database_id is None:
+                return {}
+            self._pages(database_title)
+            return dict(self.srd_indexes.get(database_id, {}))
+
+    def name_matcher(
+        self, database_titles: tuple = ENTITY_DATABASES
+    ) -> tuple[KeywordMatcher, dict]:
+        """A matcher over every page title in some databases, for finding entities in text
+
+        The matcher is kept between calls and only built again once pages have been added to
+        one of the databases, so every paragraph of a run shares the same automaton.
+
+        Args:
+            database_titles (tuple, optional): Titles of the databases. Defaults to ENTITY_DATABASES.
+
+        Returns:
+            tuple[KeywordMatcher, dict]: The matcher, whose keywords are normalised page titles,
+                and the title of the database each keyword was found in
+
+        Example:
+            matcher, databases = notion.page_index.name_matcher()
+            for start, end, name in matcher.find(text):
+                page_id = notion.page_index.page_id(databases[name], name)
+        """
+        with self.lock:
+            indexed = tuple(
+                (title, len(self._pages(title))) for title in database_titles
+            )
+            cached = self.matchers.get(database_titles)
+            if cached and cached[0] == indexed:
+                return cached[1], cached[2]
+
+            databases = {}
+            for title in database_titles:
+                for name in self._pages(title):
+                    databases.setdefault(name, title)
+            matcher = KeywordMatcher(list(databases))
+            self.matchers[database_titles] = (indexed, matcher, databases)
+            return matcher, databases
+
+    def existing_page(
+        self, database_id: str, title: str, index: Union[None, str] = None
+    ) -> Union[None, str]:
+        """Find a page built by an earlier run to update in place, each page is handed out once
+
+        A page is matched on the SRD index from its URL together with its title, so two records
+        sharing a title, such as the two Potions of Healing, or sharing a shortened index, such as
+        the Barding items, each find their own page. When no unclaimed page has both, the only page
+        with the index is used, then a page with the title that belongs to no other SRD index.
+
+        Args:
+            database_id (str): ID of the database
+            title (str): Title of the page
+            index (Union[None, str], optional): SRD index of the record, see srd_index. Defaults to None.
+
+        Returns:
+            Union[None, str]: The page ID, or None when there is no page left for the record
+        """
+        with self.lock:
+            if database_id not in self.pages:
+                self.pages[database_id] = self._load_pages(database_id)
+                self.version += 1
+            same_index = (
+                self.index_pages.get(database_id, {}).get(index, []) if index else []
+            )
+            same_title = self.title_pages.get(database_id, {}).get(
+                _normalise(title), []
+            )
+            candidates = [page_id for page_id in same_index if page_id in same_title]
+            # == A renamed record still has its index, when no other page shares it
+            if len(same_index) == 1:
+                candidates += same_index
+            candidates += [
+                page_id
+                for page_id in same_title
+                if self.page_indexes.get(page_id) in (None, index)
+            ]
+            page_id = next(
+                (page_id for page_id in candidates if page_id not in self.claimed), None
+            )
+            if page_id:
+                self.claimed.add(page_id)
+            return page_id
+
+    def claim(self, page_id: str) -> None:
+        """Mark a page as updated this run so existing_page does not hand it out again
+
+        Args:
+            page_id (str): ID of the page
+        """
+        with self.lock:
+            self.claimed.add(page_id)
+
+    def _pages(self, database_title: str) -> dict:
+        with self.lock:
+            database_id = self.database_id(database_title)
+            if database_id is None:
+                return {}
+            if database_id not in self.pages:
+                self.pages[database_id] = self._load_pages(database_id)
+                self.version += 1
+            return self.pages[database_id]
+
+    def _add_page(
+        self, database_id: str, title: str, page_id: str, index: Union[None, str]
+    ) -> None:
+        self.titles[page_id.replace("-", "")] = (database_id, title)
+        if index:
+            self.srd_indexes.setdefault(database_id, {})[index] = page_id
+            same_index = self.index_pages.setdefault(database_id, {}).setdefault(
+                index, []
+            )
+            if page_id not in same_index:
+                same_index.append(page_id)
+        self.page_indexes[page_id] = index
+        same_title = self.title_pages.setdefault(database_id, {}).setdefault(
+            _normalise(title), []
+        )
+        if page_id not in same_title:
+            same_title.append(page_id)
+
+    def _load_pages(self, database_id: str) -> dict:
+        pages = {}
+        start_cursor = None
+        while True:
+            query = {"database_id": database_id, "page_size": 100}
+            if start_cursor:
+                query["start_cursor"] = start_cursor
+            response = self.notion.databases.query(**query)
+            for page in response["results"]:
+                title = page_title(page["properties"])
+                pages[_normalise(title)] = page["id"]
+                self._add_page(
+                    database_id, title, page["id"], srd_index(page["properties"])
+                )
+
+            start_cursor = response.get("next_cursor")
+            if not response.get("has_more") or not start_cursor:
+                break
+
+        self.logger.info(
+            "Indexed %s existing pages", len(pages), extra={"database_id": database_id}
+        )
+        return pages
+
+
+def page_title(properties: dict) -> str:
+    """Read the plain text title from page properties
+
+    Works with the properties sent to pages.create as well as those returned by the API.
+
+    Args:
+        properties (dict): Page properties
+
+    Returns:
+        str: The title, or "" when there is no title property
+    """
+    for value in properties.values():
+        if "title" in value:
+            return "".join(
+                run.get("plain_text") or (run.get("text") or {}).get("content", "")
+                for run in value["title"]
+            )
+    return ""
+
+
+def srd_index(properties: dict) -> Union[None, str]:
+    """Read the SRD index of a page from its URL property, the last part of the link
+
+    Works with the properties sent to pages.create as well as those returned by the API.
+
+    Args:
+        properties (dict): Page properties
+
+    Returns:
+        Union[None, str]: The index, for example "fire-bolt", or None when the page has no URL
+    """
+    url = (properties.get("URL") or {}).get("url")
+    if not isinstance(url, str) or not url:
+        return None
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _normalise(name: str) -> str:
+    return name.strip().lower()
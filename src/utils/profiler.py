@@ -0,0 +1,107 @@
+import cProfile
+import datetime
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from src.api.metrics import ApiMetrics
+
+PROFILE_TOP_N = 25
+SLEEP_FUNCTION = "<built-in method time.sleep>"
+
+
+@contextmanager
+def profile_builder(
+    logger: logging.Logger,
+    name: str,
+    metrics: "ApiMetrics",
+    log_dir: str,
+    top_n: int = PROFILE_TOP_N,
+) -> Iterator[None]:
+    """Profile a single builder with cProfile and tracemalloc
+
+    Writes <log_dir>/profile/<datetime>-<name>.prof for snakeviz or pstats, and a
+    <datetime>-<name>-profile.txt report with the time breakdown, the slowest functions and
+    the largest allocations. Network time comes from the API metrics, sleep time from the
+    profile, and whatever is left is rendering, JSON loading and other local work.
+
+    Args:
+        logger (logging.Logger): Logging object
+        name (str): Name of the builder, used for the file names and to read the API metrics
+        metrics (ApiMetrics): The API metrics the Notion client records into
+        log_dir (str): Logging directory, reports go in a profile folder beneath it
+        top_n (int, optional): Number of functions and allocations to report. Defaults to PROFILE_TOP_N.
+
+    Example:
+        with profile_builder(logger, "creatures", notion.metrics, "logs"):
+            build_creature_database(logger, notion, DATA_DIRECTORY, json_file, args)
+    """
+    profile_dir = os.path.join(log_dir, "profile")
+    os.makedirs(profile_dir, exist_ok=True)
+    file_stem = os.path.join(
+        profile_dir,
+        f"{datetime.datetime.now().strftime('%Y-%m-%d.%H.%M.%S')}-{name}",
+    )
+
+    network_before = metrics.totals(name)["latency_s"]
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    start = time.perf_counter()
+    profiler.enable()
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall_time = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        network_time = metrics.totals(name)["latency_s"] - network_before
+        stats = pstats.Stats(profiler)
+        sleep_time = sum(
+            cumulative
+            for (_, _, function), (_, _, _, cumulative, _) in stats.stats.items()
+            if function == SLEEP_FUNCTION
+        )
+        local_time = max(0.0, wall_time - network_time - sleep_time)
+
+        profiler.dump_stats(f"{file_stem}.prof")
+
+        with open(f"{file_stem}-profile.txt", "w") as f:
+            f.write(f"Builder: {name}\n\n")
+            f.write(f"Wall time            : {wall_time:10.2f}s\n")
+            f.write(f"Network (API calls)  : {network_time:10.2f}s\n")
+            f.write(f"Sleeping / backoff   : {sleep_time:10.2f}s\n")
+            f.write(f"Render, load & other : {local_time:10.2f}s\n")
+            f.write(f"Peak traced memory   : {peak_memory / 2**20:10.2f} MiB\n\n")
+
+            f.write(f"== Top {top_n} functions by cumulative time\n\n")
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(
+                top_n
+            )
+            f.write(buffer.getvalue())
+
+            f.write(f"\n== Top {top_n} allocations by size\n\n")
+            for stat in snapshot.statistics("lineno")[:top_n]:
+                f.write(f"{stat}\n")
+
+        logger.info(
+            "Profile for %s: wall %.2fs, network %.2fs, sleep %.2fs, render/other %.2fs, "
+            "peak memory %.1f MiB -- %s.prof",
+            name,
+            wall_time,
+            network_time,
+            sleep_time,
+            local_time,
+            peak_memory / 2**20,
+            file_stem,
+        )
@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Union
+
+RENDER_CACHE_DIRECTORY = "cache/render"
+RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class RenderCache:
+    """On-disk cache of rendered page payloads.
+
+    Each entry holds the properties and children JSON produced for a single source record. Entries
+    are keyed by the builder version, a hash of the source record and the version of the mention
+    index used while rendering, so changing any of the three produces a miss. When the cache grows
+    past max_bytes the least recently used entries are removed.
+
+    Example:
+        render_cache = RenderCache(logger, "cache/render")
+        cache_key = render_cache.key("creatures", 1, creature_json)
+        cached = render_cache.get(cache_key)
+        if cached is None:
+            render_cache.put(cache_key, properties, children)
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        cache_dir: str,
+        max_bytes: int = RENDER_CACHE_MAX_BYTES,
+    ) -> None:
+        self.logger = logger
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # == Path -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self._load_entries()
+
+    def key(
+        self,
+        builder: str,
+        builder_version: int,
+        record: Union[dict, list],
+        mention_version: str = "",
+    ) -> str:
+        """Build the cache key for a source record
+
+        Args:
+            builder (str): Name of the database being built
+            builder_version (int): Version of the builder's rendering code
+            record (Union[dict, list]): The raw JSON record being rendered
+            mention_version (str, optional): Version of the mention index used while rendering. Defaults to "".
+
+        Returns:
+            str: The hex digest used as the cache key
+        """
+        record_hash = hashlib.sha256(
+            json.dumps(record, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        raw_key = f"{builder}:{builder_version}:{record_hash}:{mention_version}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Union[None, tuple[dict, list]]:
+        """Return the cached properties and children for the key, or None on a miss
+
+        Args:
+            key (str): The cache key from RenderCache.key
+
+        Returns:
+            Union[None, tuple[dict, list]]: The cached properties and children
+        """
+        path = self._path(key)
+        if path not in self._entries:
+            self.misses += 1
+            return None
+
+        try:
+            with open(path, "r") as f:
+                payload = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self._forget(path)
+            self.misses += 1
+            return None
+
+        # == Mark the entry as most recently used
+        self._entries.move_to_end(path)
+        os.utime(path)
+        self.hits += 1
+
+        return payload["properties"], payload["children"]
+
+    def put(self, key: str, properties: dict, children: list) -> None:
+        """Store the rendered payload for the key and evict old entries if needed
+
+        Args:
+            key (str): The cache key from RenderCache.key
+            properties (dict): The rendered page properties
+            children (list): The rendered children blocks
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # == Write to a temporary file first so an interrupted run never leaves half an entry
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"properties": properties, "children": children}, f)
+        os.replace(temp_path, path)
+
+        self._forget(path)
+        size = os.path.getsize(path)
+        self._entries[path] = size
+        self._total_bytes += size
+
+        self._evict()
+
+    def log_summary(self) -> None:
+        """Log the hit and miss counts for this run"""
+        self.logger.info(
+            "Render cache: %s hits, %s misses, %.0f KiB in %s entries",
+            self.hits,
+            self.misses,
+            self._total_bytes / 1024,
+            len(self._entries),
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_entries(self) -> None:
+        # == Rebuild the LRU order from the modified time of each entry on disk
+        found = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.path, stat.st_size))
+
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def _forget(self, path: str) -> None:
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def open_render_cache(
+    logger: logging.Logger, args: argparse.Namespace
+) -> Union[None, RenderCache]:
+    """Open the render cache unless it was disabled on the command line
+
+    Args:
+        logger (logging.Logger): Logging object
+        args (argparse.Namespace): The parsed command-line arguments
+
+    Returns:
+        Union[None, RenderCache]: The render cache, or None when --no-render-cache is set
+    """
+    if args.no_render_cache:
+        return None
+    return RenderCache(logger, RENDER_CACHE_DIRECTORY)
+
+
+def mention_version(page_ids: dict) -> str:
+    """Version of the page IDs a render mentions, for RenderCache.key
+
+    Args:
+        page_ids (dict): The pages that can be mentioned, for example SRD index -> page ID
+
+    Returns:
+        str: A short digest that changes whenever a page is added or rebuilt
+    """
+    if not page_ids:
+        return ""
+    raw = json.dumps(page_ids, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
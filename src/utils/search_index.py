@@ -0,0 +1,317 @@
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Union
+
+SEARCH_INDEX_PATH = "cache/search/srd.sqlite3"
+
+# == Bump this whenever the schema or the indexed text changes so the index is built again
+SEARCH_INDEX_VERSION = 1
+
+# == Record fields whose text is searched, at any depth so creature actions are included
+TEXT_FIELDS = {"desc", "higher_level"}
+
+# == SRD entity types built into databases with another title, the rest share their title
+ENTITY_DATABASES = {
+    "Monsters": ("Creatures",),
+    "Equipment": ("Weapons", "Armor", "Items"),
+    "Rule Sections": ("Rules",),
+}
+
+# == Queries using FTS5 syntax are passed through, anything else is searched word by word
+FTS_SYNTAX = re.compile(r'["*()^:]|\b(AND|OR|NOT|NEAR)\b')
+
+
+class SearchIndex:
+    """Offline full-text index of the SRD JSON files, backed by SQLite FTS5.
+
+    Every record with a name in data/5e-SRD-*.json is stored with its entity type (the file, for
+    example "Spells"), SRD index, name and description text. The index lives in a single SQLite
+    file and is built again when a JSON file or SEARCH_INDEX_VERSION changes, which takes about
+    a second. Queries are ranked with BM25, a match in the name counting ten times one in the
+    description.
+
+    Args:
+        logger (logging.Logger): Logging object
+        data_directory (str): Directory holding the SRD JSON files
+        path (str, optional): The SQLite file. Defaults to SEARCH_INDEX_PATH.
+
+    Example:
+        search_index = SearchIndex(logger, DATA_DIRECTORY)
+        for hit in search_index.search("fire damage", entity="Spells"):
+            print(hit["name"], hit["snippet"])
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        data_directory: str,
+        path: str = SEARCH_INDEX_PATH,
+    ) -> None:
+        self.logger = logger
+        self.data_directory = data_directory
+        self.path = path
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # == Builders upload pages on worker threads, which resolve mentions through the index
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        fingerprint = self._fingerprint()
+        if self._stored_fingerprint() != fingerprint:
+            self._build(fingerprint)
+
+    def search(
+        self, query: str, entity: Union[None, str] = None, limit: int = 10
+    ) -> list:
+        """Find the records matching a query, best match first
+
+        Args:
+            query (str): Words to look for, or an FTS5 query such as "fire NOT cold" or "drag*"
+            entity (Union[None, str], optional): Only records of this entity type, for example "Spells". Defaults to None.
+            limit (int, optional): Most hits returned. Defaults to 10.
+
+        Raises:
+            ValueError: If the query is not valid FTS5 syntax
+
+        Returns:
+            list: One dict per hit with entity, index, name, file, position, snippet and rank
+        """
+        sql = (
+            "SELECT r.entity, r.srd_index, r.name, r.file, r.position, "
+            "snippet(records_fts, 1, '[', ']', '...', 12) AS snippet, "
+            "bm25(records_fts, 10.0, 1.0) AS rank "
+            "FROM records_fts JOIN records r ON r.id = records_fts.rowid "
+            "WHERE records_fts MATCH ?"
+        )
+        parameters = [fts_query(query)]
+        if entity:
+            sql += " AND r.entity = ?"
+            parameters.append(entity)
+        sql += " ORDER BY rank LIMIT ?"
+        parameters.append(limit)
+
+        return [
+            {
+                "entity": row["entity"],
+                "index": row["srd_index"],
+                "name": row["name"],
+                "file": row["file"],
+                "position": row["position"],
+                "snippet": row["snippet"],
+                "rank": round(row["rank"], 3),
+            }
+            for row in self._query(sql, parameters)
+        ]
+
+    def named(self, name: str) -> list:
+        """The records with exactly this name, ignoring case
+
+        Args:
+            name (str): The name, for example "Fire Bolt"
+
+        Returns:
+            list: (entity, name) for each record, a name can be a spell and a magic item at once
+        """
+        rows = self._query(
+            "SELECT entity, name FROM records WHERE name = ? COLLATE NOCASE "
+            "ORDER BY id",
+            [name.strip()],
+        )
+        return [(row["entity"], row["name"]) for row in rows]
+
+    def select(self, json_file: str, query: str) -> list:
+        """Positions in a JSON file of the records matching a query, for --where
+
+        Args:
+            json_file (str): The file, for example "5e-SRD-Spells.json"
+            query (str): The search query
+
+        Raises:
+            ValueError: If the query is not valid FTS5 syntax
+
+        Returns:
+            list: Positions of the matching records, in file order
+        """
+        rows = self._query(
+            "SELECT r.position FROM records_fts JOIN records r ON r.id = records_fts.rowid "
+            "WHERE records_fts MATCH ? AND r.file = ? ORDER BY r.position",
+            [fts_query(query), json_file],
+        )
+        return [row["position"] for row in rows]
+
+    def count(self, json_file: str) -> int:
+        """Number of records in a JSON file
+
+        Args:
+            json_file (str): The file, for example "5e-SRD-Spells.json"
+
+        Returns:
+            int: The records indexed from it
+        """
+        rows = self._query(
+            "SELECT COUNT(*) AS records FROM records WHERE file = ?", [json_file]
+        )
+        return rows[0]["records"]
+
+    def close(self) -> None:
+        """Close the SQLite connection"""
+        with self.lock:
+            self.connection.close()
+
+    def _query(self, sql: str, parameters: list) -> list:
+        with self.lock:
+            try:
+                return self.connection.execute(sql, parameters).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Invalid search query: {e}") from e
+
+    def _fingerprint(self) -> str:
+        files = sorted(glob.glob(os.path.join(self.data_directory, "5e-SRD-*.json")))
+        stats = [
+            [os.path.basename(file), os.path.getsize(file), os.path.getmtime(file)]
+            for file in files
+        ]
+        return json.dumps([SEARCH_INDEX_VERSION, stats])
+
+    def _stored_fingerprint(self) -> Union[None, str]:
+        try:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'fingerprint'"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row["value"] if row else None
+
+    def _build(self, fingerprint: str) -> None:
+        connection = self.connection
+        with self.lock, connection:
+            connection.executescript(
+                """
+                DROP TABLE IF EXISTS records_fts;
+                DROP TABLE IF EXISTS records;
+                DROP TABLE IF EXISTS meta;
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE records (
+                    id INTEGER PRIMARY KEY,
+                    entity TEXT NOT NULL,
+                    srd_index TEXT,
+                    name TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    position INTEGER NOT NULL
+                );
+                CREATE INDEX records_name ON records (name COLLATE NOCASE);
+                CREATE VIRTUAL TABLE records_fts USING fts5(
+                    name, body, content='records', content_rowid='id',
+                    tokenize='porter unicode61'
+                );
+                """
+            )
+
+            count = 0
+            for file in sorted(
+                glob.glob(os.path.join(self.data_directory, "5e-SRD-*.json"))
+            ):
+                json_file = os.path.basename(file)
+                with open(file, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+                rows = [
+                    (
+                        entity_type(json_file),
+                        record.get("index"),
+                        record["name"],
+                        "\n".join(record_text(record)),
+                        json_file,
+                        position,
+                    )
+                    for position, record in enumerate(records)
+                    if isinstance(record, dict) and record.get("name")
+                ]
+                connection.executemany(
+                    "INSERT INTO records (entity, srd_index, name, body, file, position) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                count += len(rows)
+
+            connection.execute(
+                "INSERT INTO records_fts (rowid, name, body) "
+                "SELECT id, name, body FROM records"
+            )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('fingerprint', ?)",
+                [fingerprint],
+            )
+
+        self.logger.info("Built the SRD search index with %s records", count)
+
+
+def entity_type(json_file: str) -> str:
+    """The entity type of an SRD file
+
+    Args:
+        json_file (str): The file, for example "5e-SRD-Magic-Items.json"
+
+    Returns:
+        str: The entity type, for example "Magic Items"
+    """
+    stem = os.path.splitext(os.path.basename(json_file))[0]
+    return stem.removeprefix("5e-SRD-").replace("-", " ")
+
+
+def entity_databases(entity: str) -> tuple:
+    """The titles of the databases an entity type is built into
+
+    Args:
+        entity (str): The entity type, for example "Monsters"
+
+    Returns:
+        tuple: Database titles, for example ("Creatures",)
+    """
+    return ENTITY_DATABASES.get(entity, (entity,))
+
+
+def record_text(record: Union[dict, list, str]) -> list:
+    """Collect the description text of a record, nested descriptions included
+
+    Args:
+        record (Union[dict, list, str]): An SRD record or part of one
+
+    Returns:
+        list: The description strings in document order
+    """
+    texts = []
+    if isinstance(record, dict):
+        for key, value in record.items():
+            if key in TEXT_FIELDS:
+                if isinstance(value, str):
+                    texts.append(value)
+                elif isinstance(value, list):
+                    texts.extend(item for item in value if isinstance(item, str))
+            if isinstance(value, (dict, list)):
+                texts.extend(record_text(value))
+    elif isinstance(record, list):
+        for item in record:
+            if isinstance(item, (dict, list)):
+                texts.extend(record_text(item))
+    return texts
+
+
+def fts_query(query: str) -> str:
+    """Turn a search into an FTS5 query, plain words must all appear
+
+    Args:
+        query (str): The search as typed
+
+    Returns:
+        str: The FTS5 query
+    """
+    if FTS_SYNTAX.search(query):
+        return query
+    return " ".join(f'"{word}"' for word in query.split())
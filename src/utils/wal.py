@@ -0,0 +1,408 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Union
+
+from notion_client.errors import APIResponseError
+
+from src.utils.page_index import page_title, srd_index
+
+if TYPE_CHECKING:
+    from notion_client import Client
+
+WAL_DIRECTORY = "cache/wal"
+
+# == Rich text property holding the idempotency key of each page, hide it in your Notion views
+WAL_PROPERTY = "Build Key"
+
+
+class WriteAheadLog:
+    """Write-ahead log of the mutating Notion API calls made by a build.
+
+    Every POST, PATCH and DELETE that changes the workspace is written to the log as pending before
+    it is sent, and marked done or failed once the API answers. Lines are flushed to disk straight
+    away, so a process killed part way through a call leaves a pending entry behind.
+
+    Pages are created with an idempotency key in the WAL_PROPERTY property. The key is a hash of
+    the database and the record's SRD index as passed by its builder, so rebuilding the same
+    record gives the same key even after the renderer or --relations changes its properties,
+    and create_page skips pages the log already has. A hash of the properties is kept next to the
+    key so --update only sends properties that changed. On start-up recover() looks for the key
+    of each pending page in its database, a page that made it to Notion is marked done and one
+    that did not is marked failed and created again by the build.
+
+    Args:
+        logger (logging.Logger): Logging object
+        path (str): The log file, one JSON object per line
+
+    Example:
+        notion.wal = WriteAheadLog(logger, wal_path(args.database_id))
+        notion.wal.recover(notion)
+    """
+
+    def __init__(self, logger: logging.Logger, path: str) -> None:
+        self.logger = logger
+        self.path = path
+        self.lock = threading.Lock()
+        # == Idempotency key -> page ID of every page the log knows was created
+        self.pages = {}
+        # == Idempotency key -> ID of the database the page was created in
+        self.page_databases = {}
+        # == Idempotency key -> hash of the properties the page was last sent with
+        self.hashes = {}
+        # == Sequence number -> entry of every call that was sent but never answered
+        self.pending = {}
+        self._seq = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def page_key(
+        self,
+        database_id: str,
+        properties: dict,
+        record_index: Union[None, str] = None,
+    ) -> str:
+        """The idempotency key of a page, from its database and the identity of its record
+
+        The record is identified by its SRD index. Without one it falls back to the last part of
+        the URL property together with the title, as some builders cut the index short in the URL
+        and several items then share it.
+
+        Args:
+            database_id (str): ID of the database the page is created in
+            properties (dict): Properties sent to pages.create, without WAL_PROPERTY
+            record_index (Union[None, str], optional): The record's SRD index. Defaults to None.
+
+        Returns:
+            str: The hex digest used as the key
+        """
+        identity = record_index or [
+            srd_index(properties),
+            page_title(properties).strip().lower(),
+        ]
+        raw = json.dumps([database_id, identity], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def changed(self, key: str, properties: dict) -> bool:
+        """Whether a page's properties differ from the ones it was last sent with
+
+        Args:
+            key (str): The key from page_key
+            properties (dict): Properties for the page, without WAL_PROPERTY
+
+        Returns:
+            bool: True when they differ, or the log has no hash for the page
+        """
+        with self.lock:
+            return self.hashes.get(key) != properties_hash(properties)
+
+    def page_id(self, key: str) -> Union[None, str]:
+        """The page created with an idempotency key by this or an earlier run
+
+        Args:
+            key (str): The key from page_key
+
+        Returns:
+            Union[None, str]: The page ID, or None when the log has no page with that key
+        """
+        with self.lock:
+            return self.pages.get(key)
+
+    def begin(self, endpoint: str, body: Union[None, dict]) -> int:
+        """Write a call to the log before it is sent
+
+        Args:
+            endpoint (str): The endpoint, for example "POST /pages"
+            body (Union[None, dict]): The request body
+
+        Returns:
+            int: Sequence number to pass to commit or fail
+        """
+        body = body or {}
+        entry = {"state": "pending", "endpoint": endpoint, "time": time.time()}
+        properties = body.get("properties") or {}
+        if WAL_PROPERTY in properties:
+            entry["key"] = key_from_property(properties[WAL_PROPERTY])
+            entry["database_id"] = (body.get("parent") or {}).get("database_id")
+            entry["title"] = page_title(properties)
+            entry["hash"] = properties_hash(
+                {
+                    name: value
+                    for name, value in properties.items()
+                    if name != WAL_PROPERTY
+                }
+            )
+
+        with self.lock:
+            self._seq += 1
+            entry["seq"] = self._seq
+            self.pending[self._seq] = entry
+            self._write(entry)
+            return self._seq
+
+    def commit(
+        self,
+        seq: int,
+        object_id: Union[None, str],
+        database_id: Union[None, str] = None,
+    ) -> None:
+        """Mark a call as done once the API has accepted it
+
+        Args:
+            seq (int): Sequence number from begin
+            object_id (Union[None, str]): ID of the object created or changed
+            database_id (Union[None, str], optional): Database of a page that was updated rather than created. Defaults to None.
+        """
+        with self.lock:
+            entry = self.pending.pop(seq, {})
+            if entry.get("key") and object_id:
+                self.pages[entry["key"]] = object_id
+                self.page_databases[entry["key"]] = (
+                    entry.get("database_id") or database_id
+                )
+                self.hashes[entry["key"]] = entry.get("hash")
+            self._write({"seq": seq, "state": "done", "id": object_id})
+
+    def fail(self, seq: int, reason: str) -> None:
+        """Mark a call as failed once the API has rejected it or it timed out
+
+        Args:
+            seq (int): Sequence number from begin
+            reason (str): Why the call failed, for example the status code
+        """
+        with self.lock:
+            self.pending.pop(seq, None)
+            self._write({"seq": seq, "state": "failed", "reason": reason})
+
+    def recover(self, notion: "Client") -> None:
+        """Reconcile the calls an earlier run sent but never saw answered, then compact the log
+
+        Pending pages are looked up in their database by idempotency key. Other pending calls are
+        reported, database creation is reconciled by title when the database is reused and schema
+        and page updates are sent again by the next build.
+
+        Args:
+            notion (Client): Notion Client object
+        """
+        with self.lock:
+            pending = list(self.pending.values())
+
+        recovered = 0
+        for entry in pending:
+            if entry.get("key") and entry.get("database_id"):
+                try:
+                    page = self.find_page(notion, entry["seq"])
+                except APIResponseError as e:
+                    # == The database was deleted or the integration lost access to it
+                    self.logger.warning(
+                        "Could not look up interrupted page %s: %s",
+                        entry.get("title"),
+                        e,
+                    )
+                    self.fail(entry["seq"], f"lookup failed: {e.status}")
+                    continue
+                if page:
+                    self.commit(entry["seq"], page["id"])
+                    recovered += 1
+                    self.logger.info(
+                        "Recovered page %s created before the last run stopped",
+                        entry.get("title"),
+                        extra={
+                            "database_id": entry["database_id"],
+                            "page_id": page["id"],
+                        },
+                    )
+                    continue
+                self.fail(entry["seq"], "not created")
+                continue
+
+            self.logger.warning(
+                "%s was interrupted by the last run, it is sent again when the build is rerun",
+                entry["endpoint"],
+            )
+            self.fail(entry["seq"], "interrupted")
+
+        if pending:
+            self.logger.info(
+                "Reconciled %s interrupted calls, %s pages had been created",
+                len(pending),
+                recovered,
+            )
+        self._compact()
+
+    def find_page(self, notion: "Client", seq: int) -> Union[None, dict]:
+        """Look up the page a pending create may have made, by its idempotency key
+
+        A create that timed out or got a 409 or 5xx may still have been applied, the client
+        checks with this before sending it again.
+
+        Args:
+            notion (Client): Notion Client object
+            seq (int): Sequence number from begin
+
+        Raises:
+            APIResponseError: If the database cannot be queried
+
+        Returns:
+            Union[None, dict]: The page object, or None when the call has no key or made no page
+        """
+        with self.lock:
+            entry = self.pending.get(seq, {})
+        if not entry.get("key") or not entry.get("database_id"):
+            return None
+        response = notion.databases.query(
+            database_id=entry["database_id"],
+            filter={"property": WAL_PROPERTY, "rich_text": {"equals": entry["key"]}},
+            page_size=1,
+        )
+        return response["results"][0] if response["results"] else None
+
+    def forget(self, page_ids: set = (), database_ids: set = ()) -> int:
+        """Drop archived pages from the log so the next build creates them again
+
+        Args:
+            page_ids (set, optional): IDs of archived pages. Defaults to ().
+            database_ids (set, optional): IDs of archived databases, all their pages are dropped. Defaults to ().
+
+        Returns:
+            int: Number of pages dropped
+        """
+        page_ids = set(page_ids)
+        database_ids = set(database_ids)
+        with self.lock:
+            keys = [
+                key
+                for key, page_id in self.pages.items()
+                if page_id in page_ids or self.page_databases.get(key) in database_ids
+            ]
+            for key in keys:
+                del self.pages[key]
+                self.page_databases.pop(key, None)
+                self.hashes.pop(key, None)
+        if keys:
+            self._compact()
+        return len(keys)
+
+    def close(self) -> None:
+        """Close the log file"""
+        with self.lock:
+            self._file.close()
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # == The last line of a log cut short by a crash
+                    continue
+
+                self._seq = max(self._seq, entry["seq"])
+                if entry["state"] == "pending":
+                    self.pending[entry["seq"]] = entry
+                    continue
+
+                started = self.pending.pop(entry["seq"], {})
+                if entry["state"] == "done" and started.get("key") and entry["id"]:
+                    self.pages[started["key"]] = entry["id"]
+                    self.page_databases[started["key"]] = started.get("database_id")
+                    self.hashes[started["key"]] = started.get("hash")
+
+    def _compact(self) -> None:
+        # == Keep one line pair per created page and the calls still pending, dropping the rest
+        with self.lock:
+            temp_path = f"{self.path}.tmp"
+            seq = 0
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for key, page_id in self.pages.items():
+                    seq += 1
+                    started = {
+                        "seq": seq,
+                        "state": "pending",
+                        "key": key,
+                        "database_id": self.page_databases.get(key),
+                        "hash": self.hashes.get(key),
+                    }
+                    f.write(json.dumps(started) + "\n")
+                    f.write(
+                        json.dumps({"seq": seq, "state": "done", "id": page_id}) + "\n"
+                    )
+
+                pending = list(self.pending.values())
+                self.pending = {}
+                for entry in pending:
+                    seq += 1
+                    self.pending[seq] = {**entry, "seq": seq}
+                    f.write(json.dumps(self.pending[seq], ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._file.close()
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._seq = seq
+
+
+def wal_path(parent_id: str) -> str:
+    """The log file for a parent page, each workspace page gets its own log
+
+    Args:
+        parent_id (str): The parent page the databases are built under, --database_id
+
+    Returns:
+        str: Path of the log file
+    """
+    return os.path.join(WAL_DIRECTORY, f"{parent_id}.jsonl")
+
+
+def properties_hash(properties: dict) -> str:
+    """A hash of page properties, to tell whether a page changed since it was last sent
+
+    Args:
+        properties (dict): Page properties, without WAL_PROPERTY
+
+    Returns:
+        str: The hex digest
+    """
+    raw = json.dumps(properties, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def key_property(key: str) -> dict:
+    """The WAL_PROPERTY value holding an idempotency key
+
+    Args:
+        key (str): The key from WriteAheadLog.page_key
+
+    Returns:
+        dict: Rich text property value for pages.create
+    """
+    return {"rich_text": [{"type": "text", "text": {"content": key}}]}
+
+
+def key_from_property(value: dict) -> str:
+    """Read an idempotency key back from a WAL_PROPERTY value
+
+    Args:
+        value (dict): Rich text property value
+
+    Returns:
+        str: The key
+    """
+    return "".join(
+        run.get("plain_text") or (run.get("text") or {}).get("content", "")
+        for run in value.get("rich_text", [])
+    )